@@ -0,0 +1,67 @@
+"""
+Compare the two ways of listing assets as JSON (for GET /v1/):
+- the ORM path: load Asset objects and their relationships, then
+  `Asset.as_json` and `json.dumps`
+- the projected path: `AssetService.find_assets_json` and `orjson.dumps`
+
+It runs against the database configured for the app, so it should have
+a realistic number of assets.
+
+Usage:
+    python benchmarks/listing.py [--runs 20] [--per-page 100]
+"""
+
+import argparse
+import json
+import statistics
+import time
+
+import orjson
+
+from webapp.database import db_session
+from webapp.services import asset_service
+
+
+def orm_listing(per_page: int) -> bytes:
+    assets, total = asset_service.find_all_assets(per_page=per_page)
+    return json.dumps(
+        {"assets": [asset.as_json() for asset in assets], "total": total}
+    ).encode()
+
+
+def projected_listing(per_page: int) -> bytes:
+    assets, total = asset_service.find_assets_json(per_page=per_page)
+    return orjson.dumps({"assets": assets, "total": total})
+
+
+def measure(listing, per_page: int, runs: int) -> list:
+    timings = []
+    for _ in range(runs):
+        # Start each run with an empty session, as a request would
+        db_session.remove()
+        start = time.perf_counter()
+        listing(per_page)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--per-page", type=int, default=100)
+    args = parser.parse_args()
+
+    for name, listing in [
+        ("ORM", orm_listing),
+        ("projected", projected_listing),
+    ]:
+        # Warm up connections and caches
+        listing(args.per_page)
+        timings = measure(listing, args.per_page, args.runs)
+        print(f"{name} ({args.runs} runs, per_page={args.per_page})")
+        print(f"  median: {statistics.median(timings) * 1000:.1f}ms")
+        print(f"  max: {max(timings) * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
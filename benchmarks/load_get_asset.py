@@ -0,0 +1,58 @@
+"""
+Send concurrent requests for an asset and report throughput and latency,
+e.g. to compare the "sync" and "gthread" serving modes.
+
+Usage:
+    python benchmarks/load_get_asset.py \
+        http://localhost:8017/v1/ubuntu.png --concurrency 16 --requests 500
+"""
+
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def fetch(session: requests.Session, url: str):
+    start = time.perf_counter()
+    response = session.get(url, allow_redirects=False)
+    return response.status_code, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("url")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=args.concurrency)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(
+            executor.map(
+                lambda _: fetch(session, args.url), range(args.requests)
+            )
+        )
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for _, latency in results)
+    errors = [status for status, _ in results if status >= 400]
+    percentiles = statistics.quantiles(latencies, n=100)
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}")
+    print(f"  throughput: {args.requests / elapsed:.1f} requests/s")
+    print(f"  p50: {percentiles[49] * 1000:.1f}ms")
+    print(f"  p95: {percentiles[94] * 1000:.1f}ms")
+    print(f"  p99: {percentiles[98] * 1000:.1f}ms")
+    print(f"  errors: {len(errors)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Measure how long it takes to import the WSGI app, i.e. how long a
+freshly forked gunicorn worker takes to become ready, and how much
+memory it uses once imported.
+
+Usage:
+    python benchmarks/startup.py [--runs 10] [--module webapp.app]
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+IMPORT_SNIPPET = """
+import json, resource, time
+start = time.perf_counter()
+import {module}
+print(json.dumps({{
+    "seconds": time.perf_counter() - start,
+    "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+}}))
+"""
+
+
+def measure_import(module: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET.format(module=module)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--module", default="webapp.app")
+    args = parser.parse_args()
+
+    results = [measure_import(args.module) for _ in range(args.runs)]
+    timings = [result["seconds"] for result in results]
+    max_rss = max(result["max_rss_kb"] for result in results)
+
+    print(f"Import of {args.module} over {args.runs} runs:")
+    print(f"  min:    {min(timings) * 1000:.1f}ms")
+    print(f"  median: {statistics.median(timings) * 1000:.1f}ms")
+    print(f"  max:    {max(timings) * 1000:.1f}ms")
+    print(f"  memory: {max_rss / 1024:.1f}MB (max RSS)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Measure the throughput of a storage driver (FLASK_STORAGE_DRIVER, or
+--driver): writing files, reading them, and reading their headers, from
+concurrent threads as the gthread workers would.
+
+With the local driver, reading files into memory (as for transformed
+assets) is compared with sending them to a socket with sendfile (as
+for originals).
+
+Files are created under a "benchmark-" prefix and deleted at the end.
+
+Usage:
+    python benchmarks/storage.py [--driver local] [--size 1048576] \
+        [--count 100] [--concurrency 8]
+"""
+
+import argparse
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from webapp.swift import create_file_manager
+
+
+def measure(name: str, operation, file_paths, size: int, concurrency: int):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(operation, file_paths))
+    elapsed = time.perf_counter() - start
+
+    result = f"{name}: {len(file_paths) / elapsed:.0f} files/s"
+    if size:
+        result += f", {len(file_paths) * size / elapsed / 1048576:.1f}MB/s"
+    print(result)
+
+
+def sendfile_to_sink(local_path: str):
+    """
+    Send a file to a socket read by a thread that discards the data
+    """
+    sender, receiver = socket.socketpair()
+
+    def drain():
+        while receiver.recv(1048576):
+            pass
+
+    drainer = threading.Thread(target=drain)
+    drainer.start()
+    with open(local_path, "rb") as local_file:
+        sender.sendfile(local_file)
+    sender.close()
+    drainer.join()
+    receiver.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--driver", choices=["swift", "s3", "local"])
+    parser.add_argument("--size", type=int, default=1048576)
+    parser.add_argument("--count", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    file_manager = create_file_manager(args.driver)
+    data = os.urandom(args.size)
+    prefix = f"benchmark-{uuid.uuid4().hex[:8]}"
+    file_paths = [f"{prefix}-{index}.bin" for index in range(args.count)]
+
+    print(
+        f"{type(file_manager).__name__} ({args.count} files of "
+        f"{args.size} bytes, concurrency={args.concurrency})"
+    )
+    try:
+        measure(
+            "create",
+            lambda file_path: file_manager.create(data, file_path),
+            file_paths,
+            args.size,
+            args.concurrency,
+        )
+        measure(
+            "fetch",
+            file_manager.fetch,
+            file_paths,
+            args.size,
+            args.concurrency,
+        )
+        measure(
+            "headers",
+            file_manager.headers,
+            file_paths,
+            0,
+            args.concurrency,
+        )
+        if file_manager.local_path(file_paths[0]):
+            measure(
+                "sendfile",
+                lambda file_path: sendfile_to_sink(
+                    file_manager.local_path(file_path)
+                ),
+                file_paths,
+                args.size,
+                args.concurrency,
+            )
+    finally:
+        file_manager.delete_many(file_paths)
+
+
+if __name__ == "__main__":
+    main()
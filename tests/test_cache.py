@@ -0,0 +1,208 @@
+import threading
+import time
+import unittest
+import unittest.mock
+
+from webapp.cache import (
+    MISSING,
+    LocalCache,
+    RedisCache,
+    SingleFlight,
+    cached,
+)
+
+
+class TestLocalCache(unittest.TestCase):
+    def test_entries_expire(self):
+        """
+        Entries should be missing once their TTL has passed
+        """
+        cache = LocalCache()
+        cache.set("key", "value", ttl=0.05)
+
+        self.assertEqual(cache.get("key"), "value")
+        time.sleep(0.1)
+        self.assertIs(cache.get("key"), MISSING)
+
+    def test_least_recently_used_is_evicted(self):
+        """
+        When full, the least recently used entry should be dropped
+        """
+        cache = LocalCache(maxsize=2)
+        cache.set("a", 1, ttl=60)
+        cache.set("b", 2, ttl=60)
+        cache.get("a")
+        cache.set("c", 3, ttl=60)
+
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIs(cache.get("b"), MISSING)
+        self.assertEqual(cache.get("c"), 3)
+
+
+class TestRedisLock(unittest.TestCase):
+    def setUp(self):
+        patcher = unittest.mock.patch("webapp.cache.redis.Redis.from_url")
+        self.client = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.cache = RedisCache("redis://localhost")
+        self.unlock_script = self.client.register_script.return_value
+
+    def test_lock_is_released_with_its_token(self):
+        """
+        Unlocking should only delete the lock if it still holds the token
+        it was taken with
+        """
+        self.client.set.return_value = True
+
+        token = self.cache.lock("key", timeout=10)
+
+        self.assertEqual(self.client.set.call_args.args, ("key:lock", token))
+        self.cache.unlock("key", token)
+        self.unlock_script.assert_called_once_with(
+            keys=["key:lock"], args=[token]
+        )
+
+    def test_lock_held_elsewhere(self):
+        """
+        No token should be returned if another worker holds the lock
+        """
+        self.client.set.return_value = None
+
+        self.assertIsNone(self.cache.lock("key", timeout=10))
+
+    def test_tokens_are_unique(self):
+        self.client.set.return_value = True
+
+        self.assertNotEqual(
+            self.cache.lock("key", timeout=10),
+            self.cache.lock("key", timeout=10),
+        )
+
+
+class TestCached(unittest.TestCase):
+    def test_results_are_cached_by_arguments(self):
+        """
+        The function should only run once per set of arguments
+        """
+        func = unittest.mock.Mock(side_effect=lambda x: x * 2)
+        func.__module__, func.__qualname__ = "tests", "double"
+        double = cached(func, ttl_seconds=60)
+
+        self.assertEqual(double(1), 2)
+        self.assertEqual(double(1), 2)
+        self.assertEqual(double(2), 4)
+        self.assertEqual(func.call_count, 2)
+        self.assertEqual(double.cache_info().hits, 1)
+        self.assertEqual(double.cache_info().misses, 2)
+
+    def test_invalidate(self):
+        """
+        An invalidated result should be computed again
+        """
+        func = unittest.mock.Mock(side_effect=["old", "new"])
+        func.__module__, func.__qualname__ = "tests", "value"
+        value = cached(func, ttl_seconds=60)
+
+        self.assertEqual(value(), "old")
+        value.invalidate()
+        self.assertEqual(value(), "new")
+
+    def test_methods_are_cached_per_class(self):
+        """
+        `self` shouldn't be part of the key, so that methods can be
+        invalidated without an instance
+        """
+
+        class Service:
+            calls = 0
+
+            def extensions(self):
+                Service.calls += 1
+                return {"png"}
+
+            extensions = cached(extensions, ttl_seconds=60)
+
+        service = Service()
+        service.extensions()
+        Service().extensions()
+        self.assertEqual(Service.calls, 1)
+
+        service.extensions.invalidate()
+        service.extensions()
+        self.assertEqual(Service.calls, 2)
+
+    def test_concurrent_misses_compute_once(self):
+        """
+        Concurrent calls for a missing result should wait on a single
+        computation
+        """
+        calls = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.1)
+            return "value"
+
+        slow_cached = cached(slow, ttl_seconds=60)
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(slow_cached()))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, ["value"] * 5)
+        self.assertEqual(len(calls), 1)
+
+
+class TestSingleFlight(unittest.TestCase):
+    def run_concurrently(self, func, count=5):
+        results = []
+
+        def call():
+            try:
+                results.append(func())
+            except Exception as error:
+                results.append(error)
+
+        threads = [threading.Thread(target=call) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_calls_share_errors(self):
+        """
+        Concurrent calls with the same key should all get the error
+        of the single call that ran
+        """
+        single_flight = SingleFlight("test")
+        calls = []
+
+        def failing():
+            calls.append(1)
+            time.sleep(0.1)
+            raise ValueError("Not found")
+
+        results = self.run_concurrently(
+            lambda: single_flight.do("asset.png", failing)
+        )
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+
+    def test_keys_are_independent(self):
+        """
+        Calls with different keys shouldn't wait for each other,
+        and later calls should run again
+        """
+        single_flight = SingleFlight("test")
+
+        self.assertEqual(single_flight.do("a", lambda: 1), 1)
+        self.assertEqual(single_flight.do("a", lambda: 2), 2)
+        self.assertEqual(single_flight.do("b", lambda: 3), 3)
@@ -0,0 +1,40 @@
+import gzip
+import unittest
+
+import brotli
+from werkzeug.http import parse_accept_header
+
+from webapp.lib.compression import best_encoding, compress, is_compressible
+
+
+class TestCompression(unittest.TestCase):
+    def test_compressible_types(self):
+        self.assertTrue(is_compressible("image/svg+xml"))
+        self.assertTrue(is_compressible("text/css"))
+        self.assertFalse(is_compressible("image/png"))
+        self.assertFalse(is_compressible("font/woff2"))
+        self.assertFalse(is_compressible(None))
+
+    def test_best_encoding(self):
+        """
+        Brotli should be preferred, unless the client prefers gzip
+        """
+        for accept_encoding, encoding in [
+            ("gzip, deflate, br", "br"),
+            ("gzip", "gzip"),
+            ("br;q=0.5, gzip", "gzip"),
+            ("identity", None),
+            ("", None),
+        ]:
+            self.assertEqual(
+                best_encoding(parse_accept_header(accept_encoding)),
+                encoding,
+            )
+
+    def test_compress(self):
+        svg = "<svg>" + "<path/>" * 100 + "</svg>"
+
+        self.assertEqual(brotli.decompress(compress(svg, "br")), svg.encode())
+        self.assertEqual(
+            gzip.decompress(compress(svg.encode(), "gzip")), svg.encode()
+        )
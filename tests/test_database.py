@@ -0,0 +1,247 @@
+import itertools
+import unittest
+import unittest.mock
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import QueuePool
+
+from webapp import database
+from webapp.config import config
+from webapp.database import (
+    RoutingSession,
+    apply_statement_timeout,
+    count_checkin,
+    count_checkout,
+    db_session,
+    engine_options,
+    mark_flush_as_write,
+    read_only,
+    statement_timeout,
+)
+from webapp.models import Asset
+
+
+class TestPoolMetrics(unittest.TestCase):
+    def setUp(self):
+        patcher = unittest.mock.patch("webapp.database.metrics")
+        self.metrics = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.engine = create_engine("sqlite://", poolclass=QueuePool)
+        event.listen(self.engine, "checkout", count_checkout)
+        event.listen(self.engine, "checkin", count_checkin)
+
+    def test_checkouts_and_checkins(self):
+        """
+        Checkouts and checkins should be counted, and the time
+        connections are checked out recorded
+        """
+        with self.engine.connect():
+            self.metrics.db_pool_checkouts.inc.assert_called_once()
+            self.metrics.db_pool_checkins.inc.assert_not_called()
+
+        self.metrics.db_pool_checkins.inc.assert_called_once()
+        self.metrics.db_pool_checkout_time.observe.assert_called_once()
+        (milliseconds,) = (
+            self.metrics.db_pool_checkout_time.observe.call_args.args
+        )
+        self.assertGreaterEqual(milliseconds, 0)
+
+
+class TestStatementTimeout(unittest.TestCase):
+    def setUp(self):
+        patcher = unittest.mock.patch("webapp.database.config.db")
+        self.db_config = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.db_config.pgbouncer = False
+        self.db_config.statement_timeout = 30000
+
+        patcher = unittest.mock.patch(
+            "webapp.database._set_local_statement_timeout"
+        )
+        self.set_local = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_default_is_set_when_connecting(self):
+        """
+        The default timeout should be a connection option, rather than
+        set in each transaction
+        """
+        self.assertEqual(
+            engine_options()["connect_args"],
+            {"options": "-c statement_timeout=30000"},
+        )
+
+        apply_statement_timeout(None, None, "connection")
+        self.set_local.assert_not_called()
+
+        self.db_config.statement_timeout = 0
+        self.assertEqual(engine_options()["connect_args"], {})
+
+    def test_override(self):
+        """
+        Views overriding the timeout should set it in their transactions,
+        even to disable it
+        """
+        for milliseconds in [5000, 0]:
+            self.set_local.reset_mock()
+            token = database._statement_timeout.set(milliseconds)
+            try:
+                apply_statement_timeout(None, None, "connection")
+            finally:
+                database._statement_timeout.reset(token)
+
+            self.set_local.assert_called_once_with("connection", milliseconds)
+
+    def test_decorator_in_open_transaction(self):
+        """
+        The override should apply to the connections of a transaction
+        that is already open
+        """
+        with unittest.mock.patch("webapp.database.db_session") as session:
+            session.return_value.info = {"connections": ["primary", "replica"]}
+
+            @statement_timeout(5000)
+            def view():
+                return database._statement_timeout.get()
+
+            self.assertEqual(view(), 5000)
+
+        self.assertEqual(
+            self.set_local.call_args_list,
+            [
+                unittest.mock.call("primary", 5000),
+                unittest.mock.call("replica", 5000),
+            ],
+        )
+        self.assertIsNone(database._statement_timeout.get())
+
+    def test_pgbouncer(self):
+        """
+        PgBouncer doesn't pass connection options on, so the default
+        should be set in each transaction
+        """
+        self.db_config.pgbouncer = True
+
+        self.assertNotIn("connect_args", engine_options())
+        apply_statement_timeout(None, None, "connection")
+        self.set_local.assert_called_once_with("connection", 30000)
+
+        self.set_local.reset_mock()
+        self.db_config.statement_timeout = 0
+        apply_statement_timeout(None, None, "connection")
+        self.set_local.assert_not_called()
+
+
+class TestStatementTimeoutOnReplica(unittest.TestCase):
+    def setUp(self):
+        # The test database, standing in for a replica
+        # (as with FLASK_DB_REPLICA_URLS set)
+        self.replica = create_engine(config.database_url.get_secret_value())
+        self.addCleanup(self.replica.dispose)
+
+        for name, value in [
+            ("replica_engines", [self.replica]),
+            ("_replicas", itertools.cycle([self.replica])),
+            ("_replicas_down_until", {}),
+        ]:
+            patcher = unittest.mock.patch.object(database, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.addCleanup(db_session.remove)
+
+    def test_transaction_opened_before_the_view(self):
+        """
+        The override should apply on the replica, even when checking the
+        API token opened the transaction on it before the view
+        """
+
+        @read_only
+        def query(sql):
+            return db_session.execute(text(sql)).scalar()
+
+        @statement_timeout(1234)
+        def view():
+            return query("SHOW statement_timeout")
+
+        for check_token_first in [False, True]:
+            if check_token_first:
+                query("SELECT 1")
+
+            self.assertEqual(view(), "1234ms", msg=check_token_first)
+            self.assertIs(db_session().info["last_bind"], self.replica)
+            db_session.remove()
+
+
+class TestReadReplicas(unittest.TestCase):
+    def setUp(self):
+        self.primary = create_engine("sqlite://")
+        self.replica = create_engine("sqlite://")
+        # A replica that can't be reached
+        self.broken_replica = create_engine("sqlite:////nonexistent/db")
+
+        self.session = scoped_session(sessionmaker(class_=RoutingSession))
+        event.listen(
+            self.session.session_factory, "after_flush", mark_flush_as_write
+        )
+        self.addCleanup(self.session.remove)
+        self.use_replicas([self.replica])
+
+    def use_replicas(self, replicas):
+        for name, value in [
+            ("db_engine", self.primary),
+            ("replica_engines", replicas),
+            ("_replicas", itertools.cycle(replicas)),
+            ("_replicas_down_until", {}),
+            ("db_session", self.session),
+        ]:
+            patcher = unittest.mock.patch.object(database, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def query(self):
+        self.session.execute(text("SELECT 1"))
+        return self.session.info["last_bind"]
+
+    def test_routing(self):
+        """
+        Only read_only functions should use the replica, until the
+        session writes anything
+        """
+        self.assertIs(self.query(), self.primary)
+        self.assertIs(read_only(self.query)(), self.replica)
+
+        self.session.info["has_written"] = True
+        self.assertIs(read_only(self.query)(), self.primary)
+
+    def test_replica_failure(self):
+        """
+        When the replica fails, it should be set aside, and the function
+        run again on the primary
+        """
+        self.use_replicas([self.broken_replica, self.replica])
+
+        self.assertIs(read_only(self.query)(), self.primary)
+        self.assertIn(self.broken_replica, database._replicas_down_until)
+
+        # The next sessions use the other replica
+        self.session.remove()
+        self.assertIs(read_only(self.query)(), self.replica)
+        self.session.remove()
+        self.assertIs(read_only(self.query)(), self.replica)
+
+    def test_no_retry_with_pending_changes(self):
+        """
+        Retrying would roll back the pending changes of the session,
+        so the error should be raised instead
+        """
+        self.use_replicas([self.broken_replica])
+        self.session.add(Asset(file_path="image.png"))
+
+        with self.assertRaises(OperationalError):
+            read_only(self.query)()
+
+        self.assertEqual(len(self.session.new), 1)
@@ -0,0 +1,109 @@
+import unittest
+import unittest.mock
+
+from werkzeug.exceptions import ServiceUnavailable
+
+from webapp.delivery import app
+
+
+class TestDeliveryRoutes(unittest.TestCase):
+    def setUp(self):
+        """
+        Set up the delivery app for testing
+        """
+        app.testing = True
+        self.client = app.test_client()
+
+    def test_not_found(self):
+        """
+        When given a non-existent URL,
+        we should return a 404 status code, as JSON
+        """
+        response = self.client.get("/image.png", follow_redirects=True)
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json["code"], 404)
+
+    def test_redirect_to_v1(self):
+        """
+        URLs without the /v1 prefix should be redirected to it
+        """
+        response = self.client.get("/image.png")
+
+        self.assertEqual(response.status_code, 302)
+        self.assertIn("/v1/", response.location)
+        self.assertTrue(response.location.endswith("/image.png"))
+
+    def test_no_manager_routes(self):
+        """
+        Only assets are served: the API index and the manager
+        shouldn't exist
+        """
+        for path in ["/v1", "/v1/", "/manager"]:
+            response = self.client.get(path, follow_redirects=True)
+            self.assertEqual(response.status_code, 404, msg=path)
+
+        response = self.client.post("/v1/image.png")
+        self.assertEqual(response.status_code, 405)
+
+    def test_existing_asset(self):
+        """
+        When given an existing asset URL,
+        we should return a 200 status code
+        """
+        with unittest.mock.patch(
+            "webapp.swift.file_manager.fetch"
+        ) as mock_fetch, unittest.mock.patch(
+            "webapp.swift.file_manager.headers"
+        ) as mock_headers:
+            mock_fetch.return_value = b"image data"
+            mock_headers.return_value = {
+                "last-modified": "Mon, 29 Jul 2024 17:29:55 GMT"
+            }
+
+            response = self.client.get("/image.png", follow_redirects=True)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data, b"image data")
+
+            mock_fetch.assert_called_once_with("image.png")
+            mock_headers.assert_called_once_with("image.png")
+
+    def test_invalid_transformation(self):
+        """
+        Invalid transformation options should return a 400, as JSON
+        """
+        response = self.client.get("/v1/image.png?w=abc")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json["code"], 400)
+
+    def test_too_many_transformations(self):
+        """
+        Rate limited clients should get a 429, as JSON, with Retry-After
+        """
+        with unittest.mock.patch("webapp.serving.rate_limiter") as limiter:
+            limiter.take.return_value = 1.5
+            response = self.client.get("/v1/image.png?w=100")
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.json["code"], 429)
+        self.assertEqual(response.headers["Retry-After"], "2")
+
+    def test_busy(self):
+        """
+        Transformations rejected when busy should return a 503, as JSON,
+        with Retry-After
+        """
+        with unittest.mock.patch(
+            "webapp.serving.serve_asset",
+            side_effect=ServiceUnavailable("Busy", retry_after=1),
+        ):
+            response = self.client.get("/v1/image.png")
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json["code"], 503)
+        self.assertEqual(response.headers["Retry-After"], "1")
+
+
+if __name__ == "__main__":
+    unittest.main()
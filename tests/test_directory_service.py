@@ -0,0 +1,182 @@
+import threading
+import unittest
+import unittest.mock
+from concurrent.futures import Future
+
+from webapp.integrations.directory_service import (
+    DirectoryClient,
+    DirectoryUnavailable,
+    EmployeeIndex,
+    fetch_all_employees,
+)
+
+
+def employee(id, first_name, surname):
+    return {
+        "id": id,
+        "firstName": first_name,
+        "surname": surname,
+        "email": f"{first_name}.{surname}@example.com".lower(),
+    }
+
+
+EMPLOYEES = [
+    employee("1", "Ada", "Lovelace"),
+    employee("2", "Alan", "Turing"),
+    employee("3", "Grace", "Hopper"),
+    employee("4", "Alan", "Kay"),
+    employee("5", "Edsger", "Dijkstra"),
+]
+
+
+def paginated(name, limit=None, offset=0):
+    return EMPLOYEES[offset : offset + limit]
+
+
+class TestEmployeeIndex(unittest.TestCase):
+    def setUp(self):
+        patcher = unittest.mock.patch(
+            "webapp.integrations.directory_service.fetch_employees",
+            side_effect=paginated,
+        )
+        self.fetch_employees = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_sync_fetches_all_pages(self):
+        index = EmployeeIndex(sync_interval=60, page_size=2)
+        index.sync()
+
+        self.assertTrue(index.ready)
+        self.assertEqual(
+            [
+                call.kwargs["offset"]
+                for call in self.fetch_employees.mock_calls
+            ],
+            [0, 2, 4],
+        )
+        self.assertEqual(index.search("dijk"), [EMPLOYEES[4]])
+
+    def test_unpaginated_api(self):
+        """
+        If the API ignores the page size, the first page is the whole
+        directory
+        """
+        self.fetch_employees.side_effect = lambda *args, **kwargs: EMPLOYEES
+
+        self.assertEqual(fetch_all_employees(page_size=2), EMPLOYEES)
+        self.assertEqual(self.fetch_employees.call_count, 1)
+
+        self.fetch_employees.reset_mock()
+        self.assertEqual(fetch_all_employees(page_size=5), EMPLOYEES)
+        self.assertEqual(self.fetch_employees.call_count, 2)
+
+    def test_search_by_prefix(self):
+        index = EmployeeIndex(sync_interval=60, limit=2, page_size=10)
+        index.sync()
+
+        self.assertEqual(index.search(" ALAN "), [EMPLOYEES[1], EMPLOYEES[3]])
+        self.assertEqual(index.search("alan t"), [EMPLOYEES[1]])
+        self.assertEqual(index.search("grace.hop"), [EMPLOYEES[2]])
+        self.assertEqual(index.search("lace"), [])
+        self.assertEqual(len(index.search("a")), 2)
+
+
+class TestDirectoryClient(unittest.TestCase):
+    def setUp(self):
+        patcher = unittest.mock.patch(
+            "webapp.integrations.directory_service.fetch_employees",
+            return_value=EMPLOYEES[:1],
+        )
+        self.fetch_employees = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        patcher = unittest.mock.patch(
+            "webapp.integrations.directory_service.time.monotonic",
+            return_value=1000,
+        )
+        self.monotonic = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.client = DirectoryClient(cache_ttl=60, stale_ttl=600)
+
+    def test_results_are_cached(self):
+        self.assertEqual(self.client.search_employees("ada"), EMPLOYEES[:1])
+        self.assertEqual(self.client.search_employees(" ada"), EMPLOYEES[:1])
+        self.fetch_employees.assert_called_once_with("ada")
+
+    def test_identical_searches_are_coalesced(self):
+        """
+        A search for a name that is already being searched for should
+        wait for its results, rather than call the API again
+        """
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_fetch(name):
+            started.set()
+            release.wait(5)
+            return EMPLOYEES[:1]
+
+        waiting = threading.Event()
+
+        class WatchedFuture(Future):
+            def result(self, timeout=None):
+                waiting.set()
+                return super().result(timeout)
+
+        self.fetch_employees.side_effect = slow_fetch
+        patcher = unittest.mock.patch(
+            "webapp.integrations.directory_service.Future", WatchedFuture
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        results = []
+        leader = threading.Thread(
+            target=lambda: results.append(self.client.search_employees("ada"))
+        )
+        leader.start()
+        started.wait(5)
+
+        follower = threading.Thread(
+            target=lambda: results.append(self.client.search_employees("ada"))
+        )
+        follower.start()
+        # Let the follower find the in-flight search before releasing it
+        waiting.wait(5)
+        release.set()
+        leader.join(5)
+        follower.join(5)
+
+        self.assertEqual(results, [EMPLOYEES[:1], EMPLOYEES[:1]])
+        self.fetch_employees.assert_called_once()
+
+    def test_follower_timeout(self):
+        """
+        If the in-flight search takes too long, followers should give up
+        waiting, and use stale results if there are any
+        """
+        self.client._in_flight["ada"] = Future()
+
+        with unittest.mock.patch(
+            "webapp.integrations.directory_service.config.directory_api"
+            ".timeout",
+            0.01,
+        ):
+            with self.assertRaises(DirectoryUnavailable):
+                self.client.search_employees("ada")
+
+            self.client._cache["ada"] = (0, EMPLOYEES[1:2])
+            self.assertEqual(
+                self.client.search_employees("ada"), EMPLOYEES[1:2]
+            )
+
+        self.fetch_employees.assert_not_called()
+
+    def test_stale_results_on_errors(self):
+        self.client.search_employees("ada")
+        self.fetch_employees.side_effect = ConnectionError()
+        self.monotonic.return_value = 2000
+
+        self.assertEqual(self.client.search_employees("ada"), EMPLOYEES[:1])
+        with self.assertRaises(DirectoryUnavailable):
+            self.client.search_employees("alan")
@@ -0,0 +1,113 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from webapp.disk_cache import DiskCache
+
+
+class TestDiskCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_put_and_get(self):
+        """
+        Files should be cached by ETag
+        """
+        cache = DiskCache(self.directory.name, 1000)
+
+        self.assertIsNone(cache.get("abc123"))
+        path = cache.put("abc123", b"logo")
+
+        self.assertEqual(cache.get("abc123"), path)
+        with open(path, "rb") as cached_file:
+            self.assertEqual(cached_file.read(), b"logo")
+
+    def test_files_are_readable_by_others(self):
+        """
+        Cached files should be readable by the web server, which may
+        run as another user
+        """
+        cache = DiskCache(self.directory.name, 1000)
+
+        path = cache.put("abc123", b"logo")
+
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o644)
+
+    def test_evicts_least_recently_used(self):
+        """
+        The least recently used files should be deleted when the cache
+        is over its size
+        """
+        cache = DiskCache(self.directory.name, 10)
+        cache.put("aaa", b"1234")
+        cache.put("bbb", b"1234")
+        # Make "aaa" the most recently used, although it's older
+        past = time.time() - 600
+        os.utime(cache.path("aaa"), (past, past))
+        os.utime(cache.path("bbb"), (past - 60, past - 60))
+        cache.get("aaa")
+
+        cache.put("ccc", b"1234")
+
+        self.assertIsNotNone(cache.get("aaa"))
+        self.assertIsNone(cache.get("bbb"))
+        self.assertIsNotNone(cache.get("ccc"))
+
+    def test_stale_temporary_files_are_removed(self):
+        """
+        Temporary files left by dead workers should be removed, but not
+        those being written
+        """
+        cache = DiskCache(self.directory.name, 1000)
+        stale = os.path.join(self.directory.name, ".tmp-stale")
+        recent = os.path.join(self.directory.name, ".tmp-recent")
+        for path in [stale, recent]:
+            with open(path, "wb") as tmp_file:
+                tmp_file.write(b"data")
+        past = time.time() - cache.stale_tmp_age - 60
+        os.utime(stale, (past, past))
+
+        cache.evict()
+
+        self.assertFalse(os.path.exists(stale))
+        self.assertTrue(os.path.exists(recent))
+
+    def test_lock(self):
+        """
+        Only one holder of the lock on an ETag at a time, whatever their
+        process (separate lock file handles conflict as processes would)
+        """
+        cache = DiskCache(self.directory.name, 1000)
+        events = []
+
+        def hold(name):
+            with cache.lock("abc123", timeout=5):
+                events.append(f"{name} in")
+                time.sleep(0.1)
+                events.append(f"{name} out")
+
+        threads = [
+            threading.Thread(target=hold, args=(name,)) for name in "ab"
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(events[1], events[0].replace("in", "out"))
+
+    def test_lock_timeout(self):
+        """
+        After the timeout, callers should go ahead without the lock
+        """
+        cache = DiskCache(self.directory.name, 1000)
+
+        with cache.lock("abc123", timeout=5):
+            with self.assertLogs("webapp.disk_cache", level="WARNING"):
+                with cache.lock("abc123", timeout=0.1):
+                    pass
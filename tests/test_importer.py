@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+from webapp.importer import (
+    CheckpointNotFound,
+    entries_after,
+    parse_entry,
+    read_checkpoint,
+    write_checkpoint,
+)
+
+
+class TestParseEntry(unittest.TestCase):
+    def test_exported_asset(self):
+        """
+        Columns, names and data should be split out of an exported asset
+        """
+        values, names = parse_entry(
+            {
+                "file_path": "3b1b4e6c-Ubuntu.PNG",
+                "created": "Mon, 02 Jan 2023 10:00:00",
+                "tags": "Ubuntu, logo, dark mode,",
+                "products": "ubuntu-pro",
+                "categories": "",
+                "name": "Ubuntu logo",
+                "author": None,
+                "width": 100,
+                "optimized": True,
+            }
+        )
+
+        self.assertEqual(values["created"], datetime(2023, 1, 2, 10, 0))
+        self.assertEqual(values["name"], "Ubuntu logo")
+        self.assertEqual(values["file_type"], "png")
+        self.assertEqual(
+            values["data"],
+            {"width": 100, "optimized": True, "optimize": True, "image": True},
+        )
+        # Tags are split on whitespace too
+        self.assertEqual(names["tags"], ["dark", "logo", "mode", "ubuntu"])
+        self.assertEqual(names["products"], ["ubuntu-pro"])
+        self.assertEqual(names["categories"], [])
+
+    def test_previous_date_format(self):
+        """
+        Dates from the previous API should still be understood
+        """
+        values, _ = parse_entry(
+            {"file_path": "a.pdf", "created": "Mon Jan 02 10:00:00 2023"}
+        )
+
+        self.assertEqual(values["created"], datetime(2023, 1, 2, 10, 0))
+        self.assertFalse(values["data"]["image"])
+
+
+class TestCheckpoint(unittest.TestCase):
+    def test_checkpoint_is_per_source(self):
+        """
+        Progress should only be resumed for the same source
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "checkpoint.json")
+
+            self.assertIsNone(read_checkpoint(path, "https://a"))
+            write_checkpoint(path, "https://a", 2000, "b.png")
+            self.assertEqual(
+                read_checkpoint(path, "https://a"),
+                {
+                    "source": "https://a",
+                    "imported": 2000,
+                    "last_file_path": "b.png",
+                },
+            )
+            self.assertIsNone(read_checkpoint(path, "https://b"))
+
+    def test_resume_after_last_file_path(self):
+        """
+        The import should resume after the last asset imported, wherever
+        it now is in the export
+        """
+        entries = [{"file_path": path} for path in ["a", "c", "b", "d"]]
+
+        self.assertEqual(
+            list(entries_after(entries, "c")),
+            [{"file_path": "b"}, {"file_path": "d"}],
+        )
+        self.assertEqual(list(entries_after(entries, "d")), [])
+        with self.assertRaises(CheckpointNotFound):
+            entries_after(entries, "e")
@@ -0,0 +1,70 @@
+import unittest
+import unittest.mock
+
+from webapp.object_cache import ObjectCache
+
+
+class TestObjectCache(unittest.TestCase):
+    def setUp(self):
+        self.file_manager = unittest.mock.Mock()
+        self.file_manager.headers.return_value = {"etag": "v1"}
+        self.file_manager.fetch.return_value = b"logo"
+        self.cache = ObjectCache(
+            self.file_manager, max_bytes=10, max_object_bytes=5, ttl=60
+        )
+
+    def test_hit(self):
+        """
+        Small files should be served from memory until their TTL
+        """
+        self.assertEqual(
+            self.cache.fetch("logo.svg"), (b"logo", {"etag": "v1"})
+        )
+        self.assertEqual(
+            self.cache.fetch("logo.svg"), (b"logo", {"etag": "v1"})
+        )
+
+        self.assertEqual(self.file_manager.fetch.call_count, 1)
+        self.assertEqual(self.file_manager.headers.call_count, 1)
+        self.assertEqual(self.cache.info().hits, 1)
+
+    def test_revalidation(self):
+        """
+        After their TTL, files should only be fetched again if their
+        ETag changed
+        """
+        self.cache.ttl = 0
+        self.cache.fetch("logo.svg")
+        self.cache.fetch("logo.svg")
+        self.assertEqual(self.file_manager.fetch.call_count, 1)
+        self.assertEqual(self.cache.info().revalidations, 1)
+
+        self.file_manager.headers.return_value = {"etag": "v2"}
+        self.file_manager.fetch.return_value = b"logo2"
+        self.assertEqual(self.cache.fetch("logo.svg")[0], b"logo2")
+        self.assertEqual(self.file_manager.fetch.call_count, 2)
+
+    def test_admission_and_eviction(self):
+        """
+        Large files shouldn't be cached, and the least recently used
+        files should be dropped to stay under the size limit
+        """
+        self.file_manager.fetch.return_value = b"too large"
+        self.cache.fetch("video.mp4")
+        self.assertEqual(self.cache.info().objects, 0)
+
+        self.file_manager.fetch.return_value = b"1234"
+        for file_path in ["a.svg", "b.svg", "a.svg", "c.svg"]:
+            self.cache.fetch(file_path)
+
+        self.assertEqual(self.cache.info().bytes, 8)
+        self.cache.fetch("a.svg")
+        self.assertEqual(self.cache.info().hits, 2)
+        self.cache.fetch("b.svg")
+        self.assertEqual(self.cache.info().misses, 5)
+
+    def test_missing(self):
+        self.file_manager.headers.return_value = None
+
+        self.assertEqual(self.cache.fetch("missing.svg"), (None, None))
+        self.file_manager.fetch.assert_not_called()
@@ -0,0 +1,42 @@
+import unittest
+
+from flask import Flask
+
+from webapp.param_parser import parse_asset_search_filters
+
+
+class TestParseAssetSearchFilters(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+
+    def test_filters(self):
+        query = (
+            "name=logo&asset_type=image&type=png&include_deprecated=true"
+            "&product_types=ubuntu-pro&product_types=&categories=cloud"
+        )
+        with self.app.test_request_context(f"/v1/?{query}"):
+            filters = parse_asset_search_filters()
+
+        self.assertEqual(
+            filters,
+            {
+                "tag": "logo",
+                "asset_type": "image",
+                "product_types": ["ubuntu-pro"],
+                "categories": ["cloud"],
+                "author_email": "",
+                "start_date": None,
+                "end_date": None,
+                "language": "",
+                "file_types": ["png"],
+                "include_deprecated": True,
+            },
+        )
+
+    def test_tag_takes_precedence_over_name(self):
+        with self.app.test_request_context("/v1/?tag=ubuntu&name=logo"):
+            filters = parse_asset_search_filters()
+
+        self.assertEqual(filters["tag"], "ubuntu")
+        self.assertEqual(filters["file_types"], [])
+        self.assertFalse(filters["include_deprecated"])
@@ -0,0 +1,106 @@
+import tempfile
+import threading
+import unittest
+import unittest.mock
+
+import redis
+
+from webapp.rate_limit import (
+    ConcurrencyLimit,
+    NoSlotAvailable,
+    RedisTokenBucket,
+    TokenBucket,
+)
+
+
+class TestTokenBucket(unittest.TestCase):
+    @unittest.mock.patch("webapp.rate_limit.time.monotonic")
+    def test_burst_then_rate(self, monotonic):
+        """
+        A client should get `burst` tokens at once, then `rate` per
+        second, and clients should have their own buckets
+        """
+        monotonic.return_value = 100
+        bucket = TokenBucket(rate=2, burst=3)
+
+        self.assertEqual([bucket.take("a") for _ in range(3)], [0, 0, 0])
+        self.assertEqual(bucket.take("a"), 0.5)
+        self.assertEqual(bucket.take("b"), 0)
+
+        monotonic.return_value = 100.5
+        self.assertEqual(bucket.take("a"), 0)
+        self.assertEqual(bucket.take("a"), 0.5)
+
+        # Buckets don't fill up past `burst`
+        monotonic.return_value = 1000
+        self.assertEqual([bucket.take("a") for _ in range(3)], [0, 0, 0])
+        self.assertGreater(bucket.take("a"), 0)
+
+    def test_least_recent_clients_are_forgotten(self):
+        bucket = TokenBucket(rate=1, burst=1, max_clients=2)
+        bucket.take("a")
+        bucket.take("b")
+        bucket.take("c")
+
+        self.assertEqual(list(bucket._buckets), ["b", "c"])
+
+    def test_redis_failure(self):
+        """
+        If Redis fails, clients should be limited by each process
+        """
+        client = unittest.mock.Mock()
+        client.register_script.return_value.side_effect = (
+            redis.ConnectionError("Connection refused")
+        )
+        bucket = RedisTokenBucket(client, rate=1, burst=1)
+
+        self.assertEqual(bucket.take("a"), 0)
+        self.assertGreater(bucket.take("a"), 0)
+        # Redis isn't retried until `retry_after`
+        self.assertEqual(client.register_script.return_value.call_count, 1)
+
+
+class TestConcurrencyLimit(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.limit = ConcurrencyLimit(directory.name, slots=2)
+
+    def test_slots(self):
+        """
+        Holders beyond the number of slots should wait, then give up
+        """
+        with self.limit.hold(timeout=0):
+            with self.limit.hold(timeout=0):
+                with self.assertRaises(NoSlotAvailable):
+                    with self.limit.hold(timeout=0.1):
+                        pass
+            # A slot is free again
+            with self.limit.hold(timeout=0):
+                pass
+
+    def test_wait_for_slot(self):
+        """
+        A holder should get the slot released while it waits
+        """
+        released = threading.Event()
+
+        def hold_briefly(entered):
+            with self.limit.hold(timeout=0):
+                entered.set()
+                released.wait()
+
+        threads = []
+        for _ in range(2):
+            entered = threading.Event()
+            thread = threading.Thread(target=hold_briefly, args=(entered,))
+            thread.start()
+            entered.wait()
+            threads.append(thread)
+
+        threading.Timer(0.1, released.set).start()
+        with self.limit.hold(timeout=5):
+            pass
+
+        for thread in threads:
+            thread.join()
@@ -1,7 +1,9 @@
+import gzip
 import unittest
 import unittest.mock
 
 from webapp.app import app
+from webapp.swift import InvalidSegments
 
 
 class TestRoutes(unittest.TestCase):
@@ -53,6 +55,308 @@ class TestRoutes(unittest.TestCase):
             mock_fetch.assert_called_once_with("image.png")
             mock_headers.assert_called_once_with("image.png")
 
+    def test_api_actions_need_a_token(self):
+        """
+        The API endpoints under /v1/-/ should need a token
+        """
+        for method, path in [
+            ("GET", "/v1/-/facets"),
+            ("GET", "/v1/-/export"),
+            ("POST", "/v1/-/bulk-update"),
+            ("POST", "/v1/-/bulk-delete"),
+            ("PUT", "/v1/-/upload"),
+            ("POST", "/v1/-/uploads"),
+        ]:
+            response = self.client.open(path, method=method)
+            self.assertEqual(response.status_code, 401, msg=path)
+
+    def test_api_actions_dont_hide_assets(self):
+        """
+        Assets named like the API endpoints should be served
+        """
+        with unittest.mock.patch(
+            "webapp.swift.file_manager.fetch"
+        ) as mock_fetch, unittest.mock.patch(
+            "webapp.swift.file_manager.headers"
+        ) as mock_headers:
+            mock_fetch.return_value = b"data"
+            mock_headers.return_value = {
+                "last-modified": "Mon, 29 Jul 2024 17:29:55 GMT"
+            }
+
+            for path in ["facets", "export", "uploads"]:
+                response = self.client.get(f"/v1/{path}")
+                self.assertEqual(response.status_code, 200, msg=path)
+
+    def test_too_many_transformations(self):
+        """
+        Rate limited clients should get a 429, as JSON, with Retry-After
+        """
+        with unittest.mock.patch("webapp.serving.rate_limiter") as limiter:
+            limiter.take.return_value = 1.5
+            response = self.client.get("/v1/image.png?w=100")
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.json["code"], 429)
+        self.assertEqual(response.headers["Retry-After"], "2")
+
+
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        app.testing = True
+        self.client = app.test_client()
+
+        patcher = unittest.mock.patch(
+            "webapp.decorators.authenticate", return_value=True
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        patcher = unittest.mock.patch(
+            "webapp.views.asset_service.export_assets_json"
+        )
+        self.export = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.export.return_value = iter(
+            [{"file_path": "a.png"}, {"file_path": "b.png"}]
+        )
+
+    def export_assets(self, accept_encoding):
+        return self.client.get(
+            "/v1/-/export?token=abc&tag=logo",
+            headers={"Accept-Encoding": accept_encoding},
+        )
+
+    def test_ndjson(self):
+        """
+        Assets should be exported as one JSON object per line
+        """
+        response = self.export_assets("identity")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+        self.assertIsNone(response.content_encoding)
+        self.assertEqual(
+            response.data,
+            b'{"file_path":"a.png"}\n{"file_path":"b.png"}\n',
+        )
+        self.assertEqual(self.export.call_args.kwargs["tag"], "logo")
+
+    def test_gzip(self):
+        """
+        The export should be gzipped, only if the client accepts it
+        """
+        response = self.export_assets("gzip, deflate")
+
+        self.assertEqual(response.content_encoding, "gzip")
+        self.assertIn("Accept-Encoding", response.vary)
+        self.assertEqual(
+            gzip.decompress(response.data),
+            b'{"file_path":"a.png"}\n{"file_path":"b.png"}\n',
+        )
+
+        response = self.export_assets("gzip;q=0, identity")
+        self.assertIsNone(response.content_encoding)
+
+
+class TestBulkUpdate(unittest.TestCase):
+    def setUp(self):
+        app.testing = True
+        self.client = app.test_client()
+
+        patcher = unittest.mock.patch(
+            "webapp.decorators.authenticate", return_value=True
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def bulk_update(self, body):
+        return self.client.post("/v1/-/bulk-update?token=abc", json=body)
+
+    def test_invalid_bodies(self):
+        """
+        Invalid bodies should be rejected with a 400, before anything
+        is updated
+        """
+        with unittest.mock.patch(
+            "webapp.views.asset_service.bulk_update_assets"
+        ) as bulk_update_assets:
+            for body in [
+                ["a.png"],
+                {},
+                {"file_paths": "a.png"},
+                {"file_paths": [1]},
+                {"search": {"unknown": "value"}},
+                {"search": {"tag": 1}},
+                {"search": {"file_types": "png"}},
+                {"search": {"include_deprecated": "yes"}},
+                {"file_paths": ["a.png"], "add_tags": "foo"},
+                {"file_paths": ["a.png"], "remove_products": [None]},
+                {"file_paths": ["a.png"], "deprecated": "true"},
+            ]:
+                response = self.bulk_update(body)
+                self.assertEqual(response.status_code, 400, msg=body)
+
+            bulk_update_assets.assert_not_called()
+
+    def test_search_without_filters(self):
+        """
+        A search that doesn't filter anything shouldn't update every asset
+        """
+        for search in [
+            {"tag": ""},
+            {"include_deprecated": True},
+            {"start_date": "2024-01-01"},
+        ]:
+            response = self.bulk_update({"search": search, "add_tags": ["a"]})
+            self.assertEqual(response.status_code, 400, msg=search)
+
+    def test_valid_body(self):
+        with unittest.mock.patch(
+            "webapp.views.asset_service.bulk_update_assets"
+        ) as bulk_update_assets:
+            bulk_update_assets.return_value = {"a.png": "updated"}
+
+            response = self.bulk_update(
+                {
+                    "search": {"tag": "logo", "file_types": ["png"]},
+                    "add_tags": ["new"],
+                }
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json["updated"], 1)
+        self.assertEqual(
+            bulk_update_assets.call_args.kwargs["add"],
+            {"tags": ["new"], "products": [], "categories": []},
+        )
+
+
+class TestBulkDelete(unittest.TestCase):
+    def setUp(self):
+        app.testing = True
+        self.client = app.test_client()
+
+        patcher = unittest.mock.patch(
+            "webapp.decorators.authenticate", return_value=True
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_invalid_bodies(self):
+        """
+        Bodies without a list of file paths should be rejected with
+        a 400, before anything is deleted
+        """
+        with unittest.mock.patch(
+            "webapp.views.asset_service.delete_assets"
+        ) as delete_assets:
+            for body in [
+                {},
+                {"file_paths": []},
+                {"file_paths": "a.png"},
+                {"file_paths": [1, {"a": 2}]},
+                {"file_paths": ["a.png", None]},
+            ]:
+                response = self.client.post(
+                    "/v1/-/bulk-delete?token=abc", json=body
+                )
+                self.assertEqual(response.status_code, 400, msg=body)
+                self.assertEqual(response.json["code"], 400)
+
+            delete_assets.assert_not_called()
+
+
+class TestUploadLargeAsset(unittest.TestCase):
+    def setUp(self):
+        app.testing = True
+        self.client = app.test_client()
+
+        patcher = unittest.mock.patch(
+            "webapp.decorators.authenticate", return_value=True
+        )
+        self.authenticate = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_body_is_not_read_for_the_token(self):
+        """
+        A body sent as a form (as curl --data-binary does) should reach
+        the view, rather than be parsed for the token
+        """
+        bodies = []
+
+        def create_large_asset(stream, **options):
+            bodies.append(stream.read())
+            return unittest.mock.Mock(as_json=dict)
+
+        with unittest.mock.patch(
+            "webapp.views.asset_service.create_large_asset",
+            side_effect=create_large_asset,
+        ):
+            for headers, status_code in [
+                ({}, 401),
+                ({"Authorization": "token abc"}, 201),
+            ]:
+                response = self.client.put(
+                    "/v1/-/upload?friendly-name=a.txt",
+                    data=b"token=abc&a=b",
+                    content_type="application/x-www-form-urlencoded",
+                    headers=headers,
+                )
+                self.assertEqual(response.status_code, status_code)
+
+        self.assertEqual(bodies, [b"token=abc&a=b"])
+
+    def test_empty_body(self):
+        response = self.client.put("/v1/-/upload?token=abc&friendly-name=a")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("The body is empty", response.json["message"])
+
+    def test_invalid_segments(self):
+        with unittest.mock.patch(
+            "webapp.views.asset_service.create_large_asset",
+            side_effect=InvalidSegments("Missing segment"),
+        ):
+            response = self.client.put(
+                "/v1/-/upload?token=abc&friendly-name=a", data=b"data"
+            )
+
+        self.assertEqual(response.status_code, 400)
+
+
+class TestCompleteUpload(unittest.TestCase):
+    def setUp(self):
+        app.testing = True
+        self.client = app.test_client()
+
+        patcher = unittest.mock.patch(
+            "webapp.decorators.authenticate", return_value=True
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_invalid_parts(self):
+        """
+        Invalid parts, and parts that don't match their segments,
+        should be rejected with a 400
+        """
+        for error in [
+            ValueError("Missing parts: 2"),
+            InvalidSegments("Wrong etag"),
+        ]:
+            with unittest.mock.patch(
+                "webapp.views.asset_service.complete_upload",
+                side_effect=error,
+            ):
+                response = self.client.post(
+                    "/v1/-/uploads/abc/complete?token=abc",
+                    json={"parts": [{"part_number": 1, "etag": "a"}]},
+                )
+
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(str(error), response.json["message"])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,418 @@
+import datetime
+import importlib.util
+import io
+import itertools
+import os
+import pathlib
+import tempfile
+from hashlib import md5, sha1
+import unittest
+import unittest.mock
+
+from sqlalchemy import text
+
+from webapp import database
+from webapp.database import db_engine, db_session
+from webapp.models import (
+    Asset,
+    Author,
+    Category,
+    Product,
+    Salesforce_Campaign,
+    Tag,
+)
+from webapp.services import UploadSessionNotFound, asset_service
+from webapp.storage import LocalFileManager
+
+MIGRATIONS = pathlib.Path(__file__).parent.parent / "webapp/alembic/versions"
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """
+    Tests against the database, in a transaction rolled back at the end
+    """
+
+    def setUp(self):
+        self.addCleanup(db_session.remove)
+        self.addCleanup(db_session.rollback)
+
+    def add_asset(self, file_path, data={}, **kwargs):
+        asset = Asset(file_path=file_path, data=data, **kwargs)
+        db_session.add(asset)
+        db_session.flush()
+        return asset
+
+
+class TestFacetCounts(unittest.TestCase):
+    def setUp(self):
+        asset_service.facet_counts.cache_clear()
+        self.addCleanup(asset_service.facet_counts.cache_clear)
+
+        patcher = unittest.mock.patch("webapp.services.db_session")
+        self.db_session = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.db_session.execute.return_value.all.return_value = [("png", 3)]
+
+        patcher = unittest.mock.patch.object(
+            asset_service, "search_conditions", return_value=[]
+        )
+        self.search_conditions = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_facets_ignore_their_own_filter(self):
+        """
+        Each facet should be counted with all the filters but its own
+        """
+        filters = {
+            "tag": "ubuntu",
+            "asset_type": "image",
+            "file_types": ["png"],
+            "categories": ["cloud"],
+            "product_types": ["ubuntu-pro"],
+        }
+
+        facets = asset_service.facet_counts(**filters)
+
+        self.assertEqual(facets["file_types"], {"png": 3})
+        ignored = [
+            set(filters) - set(call.kwargs)
+            for call in self.search_conditions.mock_calls
+        ]
+        self.assertEqual(
+            ignored,
+            [
+                {"asset_type"},
+                {"file_types"},
+                {"categories"},
+                {"product_types"},
+                # Tags are searched for, rather than filtered on
+                set(),
+            ],
+        )
+
+    def test_counts_are_cached(self):
+        asset_service.facet_counts(asset_type="image")
+        asset_service.facet_counts(asset_type="image")
+        self.assertEqual(self.db_session.execute.call_count, 5)
+
+        asset_service.facet_counts(asset_type="pdf")
+        self.assertEqual(self.db_session.execute.call_count, 10)
+
+
+class TestAvailableExtensions(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        asset_service.available_extensions.cache_clear()
+        self.addCleanup(asset_service.available_extensions.cache_clear)
+
+    def test_extensions(self):
+        """
+        The file types of 3 to 6 characters should be listed, once
+        """
+        for index, file_type in enumerate(
+            ["qzx", "qzx", "qzxqzx", "qz", "qzxqzxq"]
+        ):
+            self.add_asset(f"test-{index}.{file_type}", file_type=file_type)
+
+        extensions = asset_service.available_extensions()
+
+        self.assertIn("qzx", extensions)
+        self.assertIn("qzxqzx", extensions)
+        self.assertNotIn("qz", extensions)
+        self.assertNotIn("qzxqzxq", extensions)
+
+    def test_file_type_migration(self):
+        """
+        The migration should give older assets the file type
+        create_asset would have given them
+        """
+        spec = importlib.util.spec_from_file_location(
+            "migration", MIGRATIONS / "3c5d8e1f7a92_index_asset_file_type.py"
+        )
+        migration = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(migration)
+
+        file_paths = ["abc-Logo.PNG", "abc-logo.final.svg", "abc-README"]
+        assets = [self.add_asset(file_path) for file_path in file_paths]
+
+        with unittest.mock.patch.object(migration, "op") as op:
+            op.execute.side_effect = lambda sql: db_session.execute(text(sql))
+            migration.upgrade()
+
+        for asset in assets:
+            db_session.refresh(asset)
+        self.assertEqual(
+            [asset.file_type for asset in assets],
+            [file_path.split(".")[-1].lower() for file_path in file_paths],
+        )
+
+
+class TestAssetsJson(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        author = Author(
+            first_name="Test", last_name="Author", email="qzx@example.com"
+        )
+        db_session.add(author)
+        self.asset = self.add_asset(
+            "qzxjson-logo.png",
+            name="Logo",
+            asset_type="image",
+            file_type="png",
+            language="English",
+            author=author,
+            tags=[Tag(name="qzx-tag")],
+            products=[Product(name="qzx-product")],
+            categories=[Category(name="qzx-category")],
+            salesforce_campaigns=[
+                Salesforce_Campaign(id="qzx-campaign", name="Campaign")
+            ],
+            # Single digit day and hour, to check the padding
+            created=datetime.datetime(2024, 7, 2, 5, 3, 9, 123456),
+        )
+        self.bare_asset = self.add_asset(
+            "qzxjson-bare.txt", created=datetime.datetime(2024, 12, 31, 23)
+        )
+
+    def test_same_as_asset_json(self):
+        """
+        The projection should give the same dicts as Asset.as_json,
+        with or without relationships
+        """
+        assets, total = asset_service.find_assets_json(
+            tag="qzxjson", order_by=Asset.file_path, desc_order=False
+        )
+
+        self.assertEqual(total, 2)
+        self.assertEqual(
+            assets, [self.bare_asset.as_json(), self.asset.as_json()]
+        )
+
+    def test_export(self):
+        """
+        The export should give the same dicts as the search
+        """
+        assets, _ = asset_service.find_assets_json(
+            tag="qzxjson", order_by=Asset.id, desc_order=False
+        )
+
+        self.assertEqual(
+            list(asset_service.export_assets_json(tag="qzxjson")), assets
+        )
+
+    def test_date_format(self):
+        assets, _ = asset_service.find_assets_json(
+            tag="qzxjson-logo", order_by=Asset.file_path
+        )
+
+        self.assertEqual(assets[0]["created"], "Tue, 02 Jul 2024 05:03:09")
+
+
+class TestExportAssetsJson(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(db_session.remove)
+        # Use the primary as a replica
+        for name, value in [
+            ("replica_engines", [db_engine]),
+            ("_replicas", itertools.cycle([db_engine])),
+        ]:
+            patcher = unittest.mock.patch.object(database, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_runs_on_a_replica(self):
+        """
+        The export query should run on a replica, even though the
+        assets are only read later
+        """
+        assets = asset_service.export_assets_json(tag="qzxjson")
+
+        self.assertIs(db_session.info.get("replica"), db_engine)
+        self.assertEqual(list(assets), [])
+
+
+class TestDeleteAssets(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        # Keep the changes in the transaction that's rolled back
+        patcher = unittest.mock.patch.object(db_session, "commit")
+        self.commit = patcher.start()
+        self.commit.side_effect = db_session.flush
+        self.addCleanup(patcher.stop)
+
+        patcher = unittest.mock.patch("webapp.services.file_manager")
+        self.file_manager = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.add_asset("qzx-a.png", tags=[Tag(name="qzx-tag")])
+        self.add_asset("qzx-b.png")
+        self.add_asset("qzx-large.iso", data={"large_object": True})
+
+    def file_paths(self):
+        return {
+            file_path
+            for (file_path,) in db_session.query(Asset.file_path).filter(
+                Asset.file_path.like("qzx-%")
+            )
+        }
+
+    def test_rows_are_deleted_before_files(self):
+        """
+        The assets should be deleted before their files, so a failure
+        leaves orphaned files rather than assets without their file
+        """
+        self.file_manager.delete_many.side_effect = lambda paths: (
+            self.commit.assert_called_once() or ["qzx-b.png"]
+        )
+
+        with self.assertLogs("webapp.services", level="WARNING"):
+            results = asset_service.delete_assets(
+                ["qzx-a.png", "qzx-b.png", "qzx-large.iso", "qzx-missing.png"]
+            )
+
+        self.assertEqual(
+            results,
+            {
+                "qzx-a.png": "deleted",
+                "qzx-b.png": "orphaned",
+                "qzx-large.iso": "deleted",
+                "qzx-missing.png": "not_found",
+            },
+        )
+        self.assertEqual(self.file_paths(), set())
+        self.file_manager.delete_many.assert_called_once_with(
+            ["qzx-a.png", "qzx-b.png"]
+        )
+        self.file_manager.delete.assert_called_once_with(
+            "qzx-large.iso", large_object=True
+        )
+
+    def test_storage_failure(self):
+        """
+        If the storage fails, the assets should still be deleted, and
+        their files reported as orphaned
+        """
+        self.file_manager.delete_many.side_effect = OSError("Unavailable")
+        self.file_manager.delete.side_effect = OSError("Unavailable")
+
+        with self.assertLogs("webapp.services", level="WARNING"):
+            results = asset_service.delete_assets(
+                ["qzx-a.png", "qzx-large.iso"]
+            )
+
+        self.assertEqual(
+            results, {"qzx-a.png": "orphaned", "qzx-large.iso": "orphaned"}
+        )
+        self.assertEqual(self.file_paths(), {"qzx-b.png"})
+
+
+class TestUploadSessions(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = unittest.mock.patch.object(db_session, "commit")
+        patcher.start().side_effect = db_session.flush
+        self.addCleanup(patcher.stop)
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.file_manager = LocalFileManager(directory.name)
+        patcher = unittest.mock.patch(
+            "webapp.services.file_manager", self.file_manager
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.upload_session = asset_service.create_upload_session(
+            "video.mp4", tags=["qzx-video"], asset_type="video"
+        )
+
+    def upload_part(self, part_number, contents):
+        return asset_service.upload_part(
+            self.upload_session.id, part_number, io.BytesIO(contents)
+        )
+
+    def test_parts_are_assembled(self):
+        """
+        Parts uploaded in any order, and sent again, should be assembled
+        in order into the asset, and the session deleted
+        """
+        second = self.upload_part(2, b"second")
+        self.upload_part(1, b"wrong")
+        first = self.upload_part(1, b"first-")
+
+        asset = asset_service.complete_upload(
+            self.upload_session.id,
+            [
+                {"part_number": 2, "etag": second},
+                {"part_number": "1", "etag": first},
+            ],
+        )
+
+        # Without a url-path, the path comes from the ETags of the parts
+        self.assertEqual(
+            asset.file_path,
+            sha1((first + second).encode()).hexdigest()[:8] + "-video.mp4",
+        )
+        self.assertEqual(
+            self.file_manager.fetch(asset.file_path), b"first-second"
+        )
+        self.assertEqual([tag.name for tag in asset.tags], ["qzx-video"])
+        self.assertEqual(asset.asset_type, "video")
+        self.assertTrue(asset.data["large_object"])
+        with self.assertRaises(UploadSessionNotFound):
+            asset_service.find_upload_session(self.upload_session.id)
+
+    def test_invalid_parts(self):
+        """
+        Parts that are missing, listed twice, or don't match their ETags
+        shouldn't make an asset
+        """
+        etag = md5(b"first").hexdigest()
+
+        for parts in [
+            [],
+            [{"part_number": 1}],
+            [{"part_number": "one", "etag": etag}],
+            [{"part_number": 1, "etag": etag}] * 2,
+            [{"part_number": 1, "etag": "0" * 32}],
+            [
+                {"part_number": 1, "etag": etag},
+                {"part_number": 2, "etag": etag},
+            ],
+        ]:
+            # A failure rolls back the test transaction, session included
+            self.upload_session = asset_service.create_upload_session(
+                "video.mp4"
+            )
+            self.assertEqual(self.upload_part(1, b"first"), etag)
+
+            with self.assertRaises(ValueError, msg=parts):
+                asset_service.complete_upload(self.upload_session.id, parts)
+
+    def test_part_numbers(self):
+        for part_number in [0, 1001]:
+            with self.assertRaises(ValueError):
+                self.upload_part(part_number, b"data")
+
+        with self.assertRaises(UploadSessionNotFound):
+            asset_service.upload_part("unknown", 1, io.BytesIO(b"data"))
+
+    def test_abort(self):
+        """
+        Aborting should delete the session and its parts
+        """
+        self.upload_part(1, b"first")
+
+        asset_service.abort_upload(self.upload_session.id)
+
+        with self.assertRaises(UploadSessionNotFound):
+            asset_service.find_upload_session(self.upload_session.id)
+        self.assertEqual(
+            os.listdir(
+                os.path.join(
+                    self.file_manager.root,
+                    self.file_manager.segments_container_name,
+                )
+            ),
+            [],
+        )
@@ -0,0 +1,212 @@
+import tempfile
+import threading
+import unittest
+import unittest.mock
+
+from webapp.delivery import app
+from webapp.disk_cache import DiskCache
+from webapp.serving import (
+    client_key,
+    disk_cache_headers,
+    is_valid_token,
+    send_cached_original,
+)
+
+
+class TestSendCachedOriginal(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = unittest.mock.patch(
+            "webapp.serving.disk_cache", DiskCache(directory.name, 1000)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        patcher = unittest.mock.patch("webapp.serving.file_manager")
+        self.file_manager = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.file_manager.fetch.return_value = b"logo"
+        self.set_etag("abc123")
+
+        disk_cache_headers.clear()
+        self.addCleanup(disk_cache_headers.clear)
+
+    def set_etag(self, etag):
+        self.file_manager.headers.return_value = {
+            "etag": etag,
+            "content-length": "4",
+            "last-modified": "Mon, 29 Jul 2024 17:29:55 GMT",
+        }
+
+    def send(self):
+        with app.test_request_context("/v1/logo.png"):
+            response = send_cached_original("logo.png")
+            response.direct_passthrough = False
+            data = response.get_data()
+            response.close()
+            return data
+
+    def test_hits_dont_ask_the_storage(self):
+        """
+        Within the TTL of its headers, a cached asset should be served
+        without any request to the storage
+        """
+        self.assertEqual(self.send(), b"logo")
+        self.file_manager.fetch.assert_called_once_with("logo.png")
+
+        self.file_manager.reset_mock()
+        self.assertEqual(self.send(), b"logo")
+        self.file_manager.headers.assert_not_called()
+        self.file_manager.fetch.assert_not_called()
+
+    def test_headers_expire(self):
+        """
+        A new version should be served once the headers have expired
+        """
+        with unittest.mock.patch(
+            "webapp.serving.config.disk_cache.headers_ttl", 0
+        ):
+            self.send()
+            self.set_etag("def456")
+            self.file_manager.fetch.return_value = b"new logo"
+
+            self.assertEqual(self.send(), b"new logo")
+
+    def test_miss_refreshes_the_headers(self):
+        """
+        Before fetching a file to cache it, its headers should be asked
+        again, so it isn't cached under an old ETag
+        """
+        self.send()
+        # The file was evicted, and the asset changed
+        disk_cache_headers.set(
+            "logo.png",
+            {"etag": "evicted", "last-modified": "x"},
+            60,
+        )
+        self.set_etag("def456")
+        self.file_manager.fetch.return_value = b"new logo"
+
+        self.assertEqual(self.send(), b"new logo")
+        self.assertEqual(disk_cache_headers.get("logo.png")["etag"], "def456")
+
+
+class TestRequestCoalescing(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+
+        patcher = unittest.mock.patch("webapp.serving.file_manager")
+        self.file_manager = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.file_manager.local_path.return_value = None
+        self.file_manager.headers.return_value = {
+            "last-modified": "Mon, 29 Jul 2024 17:29:55 GMT"
+        }
+
+        patcher = unittest.mock.patch("webapp.serving.object_cache", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        # Set when a request waits for another one's result
+        self.follower_waiting = threading.Event()
+        patcher = unittest.mock.patch("webapp.cache.single_flight_waits")
+        patcher.start().inc.side_effect = (
+            lambda **labels: self.follower_waiting.set()
+        )
+        self.addCleanup(patcher.stop)
+
+    def test_followers_share_the_fetch(self):
+        """
+        A request for an asset that's being fetched should wait for that
+        fetch, rather than fetch it again
+        """
+
+        def fetch(file_path):
+            # Hold the fetch until the other request is waiting for it
+            self.assertTrue(self.follower_waiting.wait(timeout=5))
+            return b"logo"
+
+        self.file_manager.fetch.side_effect = fetch
+        responses = []
+
+        def get():
+            responses.append(self.client.get("/v1/coalesced-logo.png"))
+
+        threads = [threading.Thread(target=get) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.file_manager.fetch.assert_called_once_with("coalesced-logo.png")
+        self.assertEqual(
+            [response.status_code for response in responses], [200, 200]
+        )
+        self.assertEqual(
+            [response.data for response in responses], [b"logo"] * 2
+        )
+
+    def test_followers_share_not_found(self):
+        """
+        Followers should get the 404 of the fetch they waited for
+        """
+
+        def fetch(file_path):
+            self.assertTrue(self.follower_waiting.wait(timeout=5))
+            return None
+
+        self.file_manager.fetch.side_effect = fetch
+        responses = []
+
+        def get():
+            responses.append(self.client.get("/v1/coalesced-missing.png"))
+
+        threads = [threading.Thread(target=get) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.file_manager.fetch.assert_called_once()
+        self.assertEqual(
+            [response.status_code for response in responses], [404, 404]
+        )
+
+
+class TestClientKey(unittest.TestCase):
+    def setUp(self):
+        patcher = unittest.mock.patch("webapp.serving.authenticate")
+        self.authenticate = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        is_valid_token.cache_clear()
+        self.addCleanup(is_valid_token.cache_clear)
+
+    def key_for(self, token):
+        with app.test_request_context(
+            "/v1/logo.png?w=100",
+            headers={"Authorization": f"token {token}"},
+            environ_base={"REMOTE_ADDR": "10.0.0.1"},
+        ):
+            return client_key()
+
+    def test_tokens_are_checked_once(self):
+        """
+        Repeated requests with the same token, valid or not, shouldn't
+        each check it in the database
+        """
+        self.authenticate.side_effect = lambda token: token == "valid"
+
+        for _ in range(3):
+            self.assertTrue(self.key_for("valid").startswith("token:"))
+            self.assertEqual(self.key_for("invalid"), "ip:10.0.0.1")
+
+        self.assertEqual(
+            [call.args for call in self.authenticate.call_args_list],
+            [("valid",), ("invalid",)],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
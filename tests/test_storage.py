@@ -0,0 +1,124 @@
+import os
+import tempfile
+import unittest
+import unittest.mock
+from hashlib import md5
+
+from webapp.storage import LocalFileManager, S3FileManager
+from webapp.storage_base import BaseFileManager, InvalidSegments
+from webapp.swift import FileManager
+
+
+class TestLocalFileManager(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.file_manager = LocalFileManager(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_create_fetch_delete(self):
+        """
+        Files should be stored under their normalized path, served from
+        the local filesystem, and deleted
+        """
+        self.file_manager.create(b"logo", "a1b2c3d4-ubuntu logo.png")
+
+        self.assertTrue(self.file_manager.exists("a1b2c3d4-ubuntu logo.png"))
+        self.assertEqual(
+            self.file_manager.fetch("a1b2c3d4-ubuntu logo.png"), b"logo"
+        )
+        self.assertEqual(
+            self.file_manager.local_path("a1b2c3d4-ubuntu logo.png"),
+            os.path.join(
+                self.directory.name, "assets", "a1b2c3d4-ubuntu+logo.png"
+            ),
+        )
+        self.assertEqual(
+            self.file_manager.headers("a1b2c3d4-ubuntu logo.png")[
+                "content-length"
+            ],
+            "4",
+        )
+
+        self.assertEqual(self.file_manager.delete_many(["missing.png"]), [])
+        self.assertTrue(self.file_manager.delete("a1b2c3d4-ubuntu logo.png"))
+        self.assertIsNone(self.file_manager.fetch("a1b2c3d4-ubuntu logo.png"))
+        self.assertIsNone(self.file_manager.local_path(".."))
+
+    def test_large_object(self):
+        """
+        Segments should be concatenated into the file, then deleted
+        """
+        manifest, _ = self.file_manager.upload_segments([b"abc", b"defgh"], 3)
+
+        self.assertEqual(manifest[0]["etag"], md5(b"abc").hexdigest())
+        self.file_manager.create_large(manifest, "video.mp4")
+
+        self.assertEqual(self.file_manager.fetch("video.mp4"), b"abcdefgh")
+        self.assertEqual(
+            os.listdir(os.path.join(self.directory.name, "assets_segments")),
+            [],
+        )
+
+    def test_invalid_segments(self):
+        """
+        The file shouldn't be created if a segment doesn't match
+        the manifest
+        """
+        etag = self.file_manager.put_segment("upload/00000001", b"abc")
+        manifest = [
+            self.file_manager.manifest_entry("upload/00000001", etag),
+            self.file_manager.manifest_entry("upload/00000002", "missing"),
+        ]
+
+        with self.assertRaises(InvalidSegments):
+            self.file_manager.create_large(manifest, "video.mp4")
+
+        self.assertFalse(self.file_manager.exists("video.mp4"))
+        self.assertEqual(
+            os.listdir(os.path.join(self.directory.name, "assets")), []
+        )
+
+
+class TestS3FileManager(unittest.TestCase):
+    def setUp(self):
+        self.connection = unittest.mock.Mock()
+        self.file_manager = S3FileManager(
+            unittest.mock.Mock(get=lambda: self.connection), "bucket"
+        )
+
+    def test_headers_etag_is_unquoted(self):
+        """
+        ETags should be unquoted, as those of the other drivers
+        """
+        self.connection.head_object.return_value = {
+            "ResponseMetadata": {
+                "HTTPHeaders": {
+                    "etag": '"5d41402abc4b2a76b9719d911017c592"',
+                    "content-length": "5",
+                }
+            }
+        }
+
+        self.assertEqual(
+            self.file_manager.headers("hello.txt"),
+            {
+                "etag": "5d41402abc4b2a76b9719d911017c592",
+                "content-length": "5",
+            },
+        )
+        self.connection.head_object.assert_called_once_with(
+            Bucket="bucket", Key="assets/hello.txt"
+        )
+
+
+class TestDrivers(unittest.TestCase):
+    def test_drivers_implement_the_base(self):
+        for driver in [FileManager, LocalFileManager, S3FileManager]:
+            self.assertTrue(issubclass(driver, BaseFileManager))
+            self.assertEqual(driver.__abstractmethods__, frozenset())
+
+    def test_base_is_abstract(self):
+        with self.assertRaises(TypeError):
+            BaseFileManager()
@@ -0,0 +1,160 @@
+import json
+import unittest
+import unittest.mock
+from hashlib import sha1
+
+from swiftclient.exceptions import ClientException as SwiftException
+
+from webapp.swift import (
+    FileManager,
+    authenticate_swift_connection,
+    share_swift_auth,
+    swift_auth,
+    use_swift_auth,
+)
+from webapp.utils import ClientPool, LazyClient
+
+
+class TestDeleteMany(unittest.TestCase):
+    def setUp(self):
+        self.connection = unittest.mock.Mock()
+        self.file_manager = FileManager(LazyClient(lambda: self.connection))
+
+    def test_bulk_delete(self):
+        """
+        With the bulk-delete middleware, files should be deleted in
+        batches, and the files that failed returned
+        """
+        self.connection.get_capabilities.return_value = {
+            "bulk_delete": {"max_deletes_per_request": 2}
+        }
+        self.connection.post_account.side_effect = [
+            ({}, json.dumps({"Response Status": "200 OK", "Errors": []})),
+            (
+                {},
+                json.dumps(
+                    {
+                        "Response Status": "400 Bad Request",
+                        "Errors": [["/assets/c.png", "409 Conflict"]],
+                    }
+                ),
+            ),
+        ]
+
+        failed = self.file_manager.delete_many(["a.png", "b.png", "c.png"])
+
+        self.assertEqual(failed, ["c.png"])
+        self.assertEqual(self.connection.post_account.call_count, 2)
+        first_call = self.connection.post_account.call_args_list[0]
+        self.assertEqual(first_call.kwargs["query_string"], "bulk-delete")
+        self.assertEqual(
+            first_call.kwargs["data"], "/assets/a.png\n/assets/b.png"
+        )
+
+    def test_concurrent_deletes(self):
+        """
+        Without the bulk-delete middleware, each file should be deleted,
+        and missing files ignored
+        """
+        self.connection.get_capabilities.return_value = {}
+
+        def delete_object(container, name):
+            if name == "missing.png":
+                raise SwiftException("Not found", http_status=404)
+            if name == "locked.png":
+                raise SwiftException("Conflict", http_status=409)
+
+        self.connection.delete_object.side_effect = delete_object
+
+        failed = self.file_manager.delete_many(
+            ["a.png", "missing.png", "locked.png"]
+        )
+
+        self.assertEqual(failed, ["locked.png"])
+        self.assertEqual(self.connection.delete_object.call_count, 3)
+
+
+class TestUploadSegments(unittest.TestCase):
+    def setUp(self):
+        self.connection = unittest.mock.Mock()
+        self.file_manager = FileManager(LazyClient(lambda: self.connection))
+        self.segments = []
+
+        def put_object(container, name, contents, **kwargs):
+            self.segments.append(b"".join(contents))
+            return f"etag-{len(self.segments)}"
+
+        self.connection.put_object.side_effect = put_object
+
+    def test_segments_and_hash(self):
+        """
+        Chunks should be regrouped into segments of the given size,
+        and the file hashed as a whole
+        """
+        chunks = [b"abc", b"defgh", b"", b"ij"]
+
+        manifest, file_hash = self.file_manager.upload_segments(chunks, 4)
+
+        self.assertEqual(self.segments, [b"abcd", b"efgh", b"ij"])
+        self.assertEqual(file_hash, sha1(b"abcdefghij").hexdigest())
+        self.assertEqual([s["size_bytes"] for s in manifest], [4, 4, 2])
+        self.assertEqual(manifest[0]["etag"], "etag-1")
+        self.assertTrue(manifest[0]["path"].startswith("/assets_segments/"))
+
+    def test_failed_upload_deletes_segments(self):
+        """
+        Segments already stored should be deleted if the upload fails
+        """
+
+        def chunks():
+            yield b"abcd"
+            raise IOError("Connection reset")
+
+        with self.assertRaises(IOError):
+            self.file_manager.upload_segments(chunks(), 4)
+
+        self.assertEqual(self.connection.delete_object.call_count, 1)
+        container, name = self.connection.delete_object.call_args.args
+        self.assertEqual(container, "assets_segments")
+        # The name the segment was stored under
+        self.assertEqual(
+            name, self.connection.put_object.call_args_list[-1].args[1]
+        )
+        self.assertRegex(name, r"^[0-9a-f]{32}/00000000$")
+
+
+class TestSharedAuth(unittest.TestCase):
+    def setUp(self):
+        patcher = unittest.mock.patch.dict(
+            "webapp.swift.swift_auth", clear=True
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_connections_share_new_tokens(self):
+        """
+        When a pooled connection authenticates again, the others should
+        get its token when they're next checked out
+        """
+        pool = ClientPool(
+            lambda: unittest.mock.Mock(url="swift", token="token-1"),
+            size=2,
+            warm_up=authenticate_swift_connection,
+            on_checkout=use_swift_auth,
+            on_checkin=share_swift_auth,
+        )
+
+        with pool.connection() as first:
+            first.get_auth.return_value = ("swift", "token-1")
+            authenticate_swift_connection(first)
+            with pool.connection() as second:
+                # The token expired, and the connection authenticated again
+                second.token = "token-2"
+            # Connections checked out with the old token don't share it
+            self.assertEqual(first.token, "token-1")
+        self.assertEqual(swift_auth["token"], "token-2")
+
+        with pool.connection() as connection:
+            with pool.connection() as other:
+                self.assertEqual(connection.token, "token-2")
+                self.assertEqual(other.token, "token-2")
@@ -0,0 +1,106 @@
+import unittest
+
+from werkzeug.datastructures import MultiDict
+
+from webapp.lib.transforms import (
+    InvalidTransform,
+    canonical_options,
+    canonical_query,
+    parse_query,
+    sign,
+    signed_query,
+)
+
+
+def canonical(query_string, **kwargs):
+    args = MultiDict(
+        part.split("=", 1) if "=" in part else (part, "")
+        for part in query_string.split("&")
+        if part
+    )
+    return canonical_query(canonical_options(args, **kwargs))
+
+
+class TestCanonicalOptions(unittest.TestCase):
+    def test_equivalent_queries(self):
+        """
+        Equivalent queries should have the same canonical form
+        """
+        for query_string in [
+            "w=300",
+            "h=&w=300",
+            "w=300&h=0",
+            "w=0300&token=abc&_=12345",
+            "op=resize&w=300",
+            "w=300&w=400",
+        ]:
+            self.assertEqual(canonical(query_string), "w=300")
+
+    def test_originals(self):
+        """
+        Queries without transformations should have no options
+        """
+        for query_string in ["", "token=abc", "q=80", "deg=90", "rect=1"]:
+            self.assertEqual(canonical(query_string), "")
+
+    def test_irrelevant_options(self):
+        """
+        Options of operations that aren't applied should be dropped, as
+        should rotations by 0 degrees
+        """
+        self.assertEqual(
+            canonical("op=region&rect=0,0,5,5&deg=9"), "op=region&rect=0,0,5,5"
+        )
+        self.assertEqual(canonical("op=rotate&deg=360&w=30"), "")
+        self.assertEqual(
+            canonical("op=resize,rotate,resize&deg=-90&expand=yes&w=30"),
+            "deg=270&expand=1&op=resize,rotate&w=30",
+        )
+        self.assertEqual(canonical("opt=1&fmt=JPEG"), "fmt=jpg&opt=")
+
+    def test_size_buckets(self):
+        """
+        Sizes should be rounded down to the allowed sizes, and sizes
+        below the smallest one kept, so they're never larger than asked
+        """
+        buckets = [320, 640, 1280]
+        self.assertEqual(canonical("w=700", size_buckets=buckets), "w=640")
+        self.assertEqual(
+            canonical("max-width=5000", size_buckets=buckets),
+            "max-width=1280",
+        )
+        self.assertEqual(canonical("h=100", size_buckets=buckets), "h=100")
+        self.assertEqual(canonical("h=100"), "h=100")
+
+    def test_invalid_options(self):
+        for query_string in [
+            "w=abc",
+            "w=-1",
+            "fmt=bmp",
+            "op=blur",
+            "op=region",
+            "op=region&rect=1,2,3",
+            "op=rotate",
+            "w=30&q=101",
+        ]:
+            with self.assertRaises(InvalidTransform, msg=query_string):
+                canonical(query_string)
+
+
+class TestSignatures(unittest.TestCase):
+    def test_signed_query(self):
+        """
+        The signature should depend on the asset, the canonical query
+        and the key, and originals shouldn't be signed
+        """
+        query = parse_query("w=300&h=&token=abc")
+        signature = sign("logo.png", "w=300", "key")
+
+        self.assertEqual(
+            signed_query("logo.png", query, "key"), f"w=300&sig={signature}"
+        )
+        self.assertEqual(len(signature), 32)
+        self.assertNotEqual(signature, sign("logo.png", "w=301", "key"))
+        self.assertNotEqual(signature, sign("icon.png", "w=300", "key"))
+        self.assertNotEqual(signature, sign("logo.png", "w=300", "other"))
+        self.assertEqual(signed_query("logo.png", "", "key"), "")
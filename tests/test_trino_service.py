@@ -0,0 +1,195 @@
+import unittest
+import unittest.mock
+
+from webapp.integrations import trino_service
+from webapp.integrations.trino_service import (
+    CAMPAIGN_SEARCH_LIMIT,
+    CampaignSearchCache,
+    TrinoClient,
+    TrinoUnavailable,
+)
+
+
+def campaigns(*names):
+    return [
+        {"id": str(index), "name": name} for index, name in enumerate(names)
+    ]
+
+
+class TestCampaignSearchCache(unittest.TestCase):
+    def setUp(self):
+        patcher = unittest.mock.patch(
+            "webapp.integrations.trino_service.time.monotonic",
+            return_value=100,
+        )
+        self.monotonic = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache = CampaignSearchCache(ttl_seconds=60)
+
+    def test_exact_query(self):
+        self.cache.set("ubuntu", campaigns("ubuntu pro"))
+
+        self.assertEqual(self.cache.get("ubuntu"), campaigns("ubuntu pro"))
+        self.assertIsNone(self.cache.get("kubernetes"))
+
+    def test_longer_query_is_narrowed_from_complete_results(self):
+        """
+        The complete results for a query should answer the queries that
+        contain it, filtered locally
+        """
+        self.cache.set("ubu", campaigns("ubuntu pro", "ubuntu core", "ubu"))
+
+        self.assertEqual(
+            [c["name"] for c in self.cache.get("ubuntu")],
+            ["ubuntu pro", "ubuntu core"],
+        )
+        self.assertEqual(self.cache.get("ubuntu desktop"), [])
+        # Matches are case-sensitive, as with LIKE in Trino
+        self.assertEqual(self.cache.get("Ubuntu"), None)
+
+    def test_truncated_results_are_not_narrowed(self):
+        """
+        Results with CAMPAIGN_SEARCH_LIMIT rows may be missing campaigns,
+        so they only answer the exact same query
+        """
+        names = [f"ubuntu {index}" for index in range(CAMPAIGN_SEARCH_LIMIT)]
+        self.cache.set("ubu", campaigns(*names))
+
+        self.assertIsNone(self.cache.get("ubuntu"))
+        self.assertEqual(len(self.cache.get("ubu")), CAMPAIGN_SEARCH_LIMIT)
+
+    def test_entries_expire(self):
+        self.cache.set("ubu", campaigns("ubuntu pro"))
+        self.monotonic.return_value = 161
+
+        self.assertIsNone(self.cache.get("ubu"))
+        self.assertIsNone(self.cache.get("ubuntu"))
+
+
+class TestTrinoClient(unittest.TestCase):
+    def setUp(self):
+        self.credentials = unittest.mock.Mock(valid=True, token="token-1")
+        patcher = unittest.mock.patch(
+            "webapp.integrations.trino_service.service_account.Credentials"
+            ".from_service_account_info",
+            return_value=self.credentials,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        patcher = unittest.mock.patch(
+            "webapp.integrations.trino_service.connect",
+            side_effect=lambda **kwargs: unittest.mock.Mock(),
+        )
+        self.connect = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.client = TrinoClient(pool_size=2)
+
+    def test_connections_are_reused(self):
+        with self.client.cursor():
+            pass
+        with self.client.cursor():
+            pass
+
+        self.assertEqual(self.connect.call_count, 1)
+
+    def test_concurrent_cursors_use_their_own_connections(self):
+        with self.client.cursor() as first:
+            with self.client.cursor() as second:
+                self.assertIsNot(first, second)
+            with self.client.cursor():
+                pass
+
+        self.assertEqual(self.connect.call_count, 2)
+
+    def test_expired_token_is_refreshed(self):
+        """
+        An expired token should be refreshed, and the connections made
+        with the old token closed
+        """
+        with self.client.cursor():
+            pass
+        old_token, old_connection = self.client._pool.queue[0]
+        self.assertEqual(old_token, "token-1")
+
+        def refresh(request):
+            self.credentials.valid = True
+            self.credentials.token = "token-2"
+
+        self.credentials.valid = False
+        self.credentials.refresh.side_effect = refresh
+
+        with self.client.cursor():
+            pass
+
+        self.credentials.refresh.assert_called_once()
+        old_connection.close.assert_called_once()
+        self.assertEqual(self.connect.call_count, 2)
+        self.assertEqual(self.client._pool.queue[0][0], "token-2")
+
+    def test_token_failure(self):
+        """
+        If we can't get a token, the client should be unavailable, and
+        try again on the next call
+        """
+        self.credentials.valid = False
+        self.credentials.refresh.side_effect = Exception("Invalid grant")
+
+        with self.assertRaises(TrinoUnavailable):
+            with self.client.cursor():
+                pass
+        self.connect.assert_not_called()
+
+        self.credentials.refresh.side_effect = None
+        self.credentials.valid = True
+        with self.client.cursor():
+            pass
+        self.connect.assert_called_once()
+
+    def test_failed_query_discards_connection(self):
+        with self.assertRaises(ValueError):
+            with self.client.cursor():
+                raise ValueError("Query failed")
+
+        self.assertTrue(self.client._pool.empty())
+
+    def test_full_pool_closes_connections(self):
+        with self.client.cursor():
+            with self.client.cursor():
+                with self.client.cursor():
+                    pass
+
+        self.assertEqual(self.connect.call_count, 3)
+        self.assertEqual(self.client._pool.qsize(), 2)
+
+
+class TestSearchCampaigns(unittest.TestCase):
+    def setUp(self):
+        self.client = unittest.mock.MagicMock()
+        self.cursor = self.client.cursor.return_value.__enter__.return_value
+        self.cursor.fetchall.return_value = [("1", "ubuntu pro")]
+
+        for name, value in [
+            ("trino_client", self.client),
+            ("campaign_search_cache", CampaignSearchCache(ttl_seconds=60)),
+        ]:
+            patcher = unittest.mock.patch.object(trino_service, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_results_are_cached(self):
+        first = trino_service.search_campaigns(" ubu ")
+        second = trino_service.search_campaigns("ubuntu")
+
+        self.assertEqual(first, [{"id": "1", "name": "ubuntu pro"}])
+        self.assertEqual(second, first)
+        self.cursor.execute.assert_called_once()
+        self.assertIn("LIKE '%ubu%'", self.cursor.execute.call_args.args[0])
+
+    def test_like_wildcards_are_escaped(self):
+        trino_service.search_campaigns("100%_off")
+
+        self.assertIn(
+            "LIKE '%100\\%\\_off%'", self.cursor.execute.call_args.args[0]
+        )
@@ -0,0 +1,142 @@
+import threading
+import unittest
+import unittest.mock
+from unittest.mock import call
+
+from webapp.utils import (
+    ClientPool,
+    LazyClient,
+    NoClientAvailable,
+    serving_with_gunicorn,
+)
+
+
+class TestLazyClient(unittest.TestCase):
+    def test_client_is_created_on_first_use(self):
+        """
+        The factory should only be called when the client is first needed,
+        and the same client should be returned afterwards
+        """
+        factory = unittest.mock.Mock(return_value="client")
+        lazy_client = LazyClient(factory)
+
+        factory.assert_not_called()
+        self.assertEqual(lazy_client.get(), "client")
+        self.assertEqual(lazy_client.get(), "client")
+        factory.assert_called_once()
+
+    def test_failed_creation_is_retried(self):
+        """
+        When the factory returns None, the next call should try again
+        """
+        factory = unittest.mock.Mock(side_effect=[None, "client"])
+        lazy_client = LazyClient(factory)
+
+        self.assertIsNone(lazy_client.get())
+        self.assertEqual(lazy_client.get(), "client")
+
+    def test_warm_up(self):
+        """
+        Warming up should build the client and run the warm-up hook
+        in the background
+        """
+        warm_up = unittest.mock.Mock()
+        lazy_client = LazyClient(lambda: "client", warm_up=warm_up)
+
+        lazy_client.warm_up().join()
+
+        warm_up.assert_called_once_with("client")
+
+
+class TestClientPool(unittest.TestCase):
+    def test_clients_are_reused(self):
+        """
+        Clients should be built on first use, and reused afterwards,
+        most recently used first
+        """
+        factory = unittest.mock.Mock(side_effect=lambda: object())
+        pool = ClientPool(factory, size=2)
+
+        with pool.connection() as first:
+            with pool.connection() as second:
+                self.assertIsNot(first, second)
+        with pool.connection() as client:
+            self.assertIs(client, first)
+
+        self.assertEqual(factory.call_count, 2)
+
+    def test_pool_is_bounded(self):
+        """
+        When all the clients are in use, others should wait for one to
+        be returned, up to the timeout
+        """
+        pool = ClientPool(object, size=1, timeout=0.01)
+
+        with pool.connection() as client:
+            with self.assertRaises(NoClientAvailable):
+                with pool.connection():
+                    pass
+
+            clients = []
+            thread = threading.Thread(
+                target=lambda: clients.append(pool.connection().__enter__())
+            )
+            pool.timeout = 5
+            thread.start()
+        thread.join()
+
+        self.assertEqual(clients, [client])
+
+    def test_failed_creation_is_retried(self):
+        factory = unittest.mock.Mock(side_effect=[Exception(), "client"])
+        pool = ClientPool(factory, size=1)
+
+        with self.assertRaises(Exception):
+            with pool.connection():
+                pass
+        with pool.connection() as client:
+            self.assertEqual(client, "client")
+
+    def test_hooks(self):
+        on_checkout = unittest.mock.Mock()
+        on_checkin = unittest.mock.Mock()
+        pool = ClientPool(
+            lambda: "client",
+            size=1,
+            on_checkout=on_checkout,
+            on_checkin=on_checkin,
+        )
+
+        with pool.connection():
+            pass
+        with pool.connection():
+            pass
+
+        self.assertEqual(on_checkout.mock_calls, 2 * [call("client")])
+        self.assertEqual(on_checkin.mock_calls, 2 * [call("client")])
+
+    def test_warm_up(self):
+        warm_up = unittest.mock.Mock()
+        pool = ClientPool(lambda: "client", size=1, warm_up=warm_up)
+
+        pool.warm_up().join()
+
+        warm_up.assert_called_once_with("client")
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+
+class TestServingWithGunicorn(unittest.TestCase):
+    def test_gunicorn_worker(self):
+        """
+        Only gunicorn (not flask commands or the tests) should be
+        considered as serving
+        """
+        with unittest.mock.patch.dict(
+            "os.environ", {"SERVER_SOFTWARE": "gunicorn/23.0.0"}
+        ):
+            self.assertTrue(serving_with_gunicorn())
+        with unittest.mock.patch.dict("os.environ", clear=True):
+            self.assertFalse(serving_with_gunicorn())
@@ -0,0 +1,32 @@
+"""index asset file type
+
+Revision ID: 3c5d8e1f7a92
+Revises: def1b50e89fa
+Create Date: 2026-10-19 10:12:41.532907
+
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "3c5d8e1f7a92"
+down_revision = "def1b50e89fa"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Assets created before file_type was added don't have one
+    op.execute(
+        "UPDATE asset "
+        "SET file_type = lower(regexp_replace(file_path, '^.*\\.', '')) "
+        "WHERE file_type IS NULL"
+    )
+    op.create_index(
+        op.f("ix_asset_file_type"), "asset", ["file_type"], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index(op.f("ix_asset_file_type"), table_name="asset")
@@ -0,0 +1,32 @@
+"""add upload sessions
+
+Revision ID: 9d4b2f6e1c38
+Revises: 3c5d8e1f7a92
+Create Date: 2026-10-19 14:05:12.218734
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "9d4b2f6e1c38"
+down_revision = "3c5d8e1f7a92"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "upload_session",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("options", sa.JSON(), nullable=False),
+        sa.Column("created", sa.DateTime(), nullable=False),
+        sa.Column("updated", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+
+def downgrade():
+    op.drop_table("upload_session")
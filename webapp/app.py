@@ -1,4 +1,3 @@
-import errno
 import http.client
 from typing import Optional
 
@@ -7,14 +6,22 @@ from canonicalwebteam.flask_base.app import FlaskBase
 from flask import redirect
 from flask.globals import request
 from flask_wtf.csrf import CSRFProtect
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from swiftclient.exceptions import ClientException as SwiftException
 from werkzeug.exceptions import NotFound
 
-from webapp.commands import db_group, token_group
+from webapp import metrics
+from webapp.commands import db_group, token_group, url_group
+from webapp.config import config
 from webapp.database import db_session
+from webapp.decorators import RawBodyRequest
+from webapp.integrations.trino_service import trino_client
+from webapp.lib.http_helpers import os_error_status, swift_error_status
 from webapp.lib.processors import ImageProcessingError
 from webapp.routes import api_blueprint, ui_blueprint
 from webapp.sso import init_sso
+from webapp.swift import file_manager
+from webapp.utils import serving_with_gunicorn
 
 app = FlaskBase(
     __name__,
@@ -22,6 +29,7 @@ app = FlaskBase(
     static_folder="../static",
     template_folder="../templates",
 )
+app.request_class = RawBodyRequest
 
 
 csrf = CSRFProtect()
@@ -56,6 +64,19 @@ def error_handler(error=None):
     return render_error(code, str(error))
 
 
+@app.errorhandler(429)
+@app.errorhandler(503)
+def error_retry_later(error=None):
+    # Keep the Retry-After header, so clients know when to try again
+    body, code = render_error(error.code, str(error))
+    headers = {
+        name: value
+        for name, value in error.get_headers()
+        if name == "Retry-After"
+    }
+    return body, code, headers
+
+
 @app.errorhandler(500)
 def error_500(error=None):
     app.extensions["sentry"].captureException()
@@ -66,17 +87,7 @@ def error_500(error=None):
 def error_os(error=None):
     app.extensions["sentry"].captureException()
 
-    status = 500
-
-    if error.errno in [errno.EPERM, errno.EACCES]:
-        status = 403  # Forbidden
-    if error.errno in [errno.ENOENT, errno.ENXIO]:
-        status = 404  # Not found
-    if error.errno in [errno.EEXIST]:
-        status = 409  # Conflict
-    if error.errno in [errno.E2BIG]:
-        status = 413  # Request Entity Too Large
-
+    status = os_error_status(error)
     return render_error(status, str(error.strerror))
 
 
@@ -92,15 +103,17 @@ def error_pillbox(error=None):
 def error_swift(error=None):
     app.extensions["sentry"].captureException()
 
-    status = 500
-    if error.http_status > 99:
-        status = error.http_status
-    elif error.msg[:12] == "Unauthorised":
-        # Special case for swiftclient.exceptions.ClientException
-        status = 511
+    status = swift_error_status(error)
     return render_error(status, f"Swift Error: {error.msg}")
 
 
+@app.errorhandler(PoolTimeoutError)
+def error_db_pool_timeout(error=None):
+    # All the database connections of this process are in use
+    metrics.db_pool_timeouts.inc()
+    return render_error(503, "The database is busy, please try again")
+
+
 # Apply blueprints
 # ===
 @app.route("/")
@@ -136,3 +149,14 @@ def remove_db_session(response):
 # ===
 app.cli.add_command(token_group)
 app.cli.add_command(db_group)
+app.cli.add_command(url_group)
+
+
+# External clients
+# ===
+# Only warm up the clients in gunicorn workers, which import the app after
+# they're forked (the app isn't preloaded), so flask commands and the tests
+# don't connect to anything
+if config.warm_up_clients and serving_with_gunicorn():
+    file_manager.warm_up()
+    trino_client.warm_up()
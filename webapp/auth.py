@@ -1,7 +1,8 @@
-from webapp.database import db_session
+from webapp.database import db_session, read_only
 from webapp.models import Token
 
 
+@read_only
 def authenticate(token):
     """Check if this authentication token is valid (i.e. exists)"""
 
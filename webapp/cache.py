@@ -0,0 +1,374 @@
+"""
+Caching of function results.
+
+Results are kept in each process, in an LRU where each entry has its own
+expiry. When Redis is configured (the charm's redis relation sets
+REDIS_DB_CONNECT_STRING), they're also stored in Redis, so all the
+workers and pods share them and only one of them recomputes an expired
+result at a time.
+"""
+
+import functools
+import hashlib
+import inspect
+import logging
+import pickle
+import random
+import secrets
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import Future
+from typing import Optional
+
+import redis
+
+from webapp.config import config
+from webapp.metrics import cache_hits, cache_misses, single_flight_waits
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "assets:cache:"
+
+# Returned by the caches on a miss, as None is a valid result
+MISSING = object()
+
+# Delete a lock only if it's still the one we took, so a lock that expired
+# and was taken by another worker isn't released by the previous holder
+UNLOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+class LocalCache:
+    """
+    An in-process LRU cache, where each entry has its own expiry
+    """
+
+    def __init__(self, maxsize: int = 128):
+        self.maxsize = maxsize
+        # key -> (expires, value)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return MISSING
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class BytesCache:
+    """
+    An in-process LRU of bytes, limited by their total size
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._entries[key] = value
+            self._bytes += len(value)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+
+class RedisCache:
+    """
+    Pickled values shared through Redis.
+
+    Redis errors are logged and treated as misses, and Redis is then left
+    aside for `retry_after` seconds, so the app keeps working (uncached)
+    while it's down.
+    """
+
+    def __init__(self, url: str, timeout: float = 0.5, retry_after: int = 30):
+        # Doesn't connect until the first command
+        self.client = redis.Redis.from_url(
+            url, socket_timeout=timeout, socket_connect_timeout=timeout
+        )
+        self._unlock_script = self.client.register_script(UNLOCK_SCRIPT)
+        self.retry_after = retry_after
+        self._down_until = 0
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self._down_until
+
+    def _failed(self, error: Exception):
+        logger.warning("Unable to use the Redis cache: %s", error)
+        self._down_until = time.monotonic() + self.retry_after
+
+    def get(self, key: str):
+        if not self.available:
+            return MISSING
+        try:
+            value = self.client.get(key)
+        except redis.RedisError as error:
+            self._failed(error)
+            return MISSING
+        return MISSING if value is None else pickle.loads(value)
+
+    def set(self, key: str, value, ttl: float):
+        if not self.available:
+            return
+        try:
+            self.client.set(key, pickle.dumps(value), px=int(ttl * 1000))
+        except redis.RedisError as error:
+            self._failed(error)
+
+    def delete(self, *keys: str):
+        if not self.available:
+            return
+        try:
+            self.client.delete(*keys)
+        except redis.RedisError as error:
+            self._failed(error)
+
+    def delete_prefix(self, prefix: str):
+        if not self.available:
+            return
+        try:
+            keys = list(self.client.scan_iter(match=prefix + "*"))
+            if keys:
+                self.client.delete(*keys)
+        except redis.RedisError as error:
+            self._failed(error)
+
+    def lock(self, key: str, timeout: float) -> Optional[str]:
+        """
+        Take a lock on `key` for up to `timeout` seconds, and return the
+        token to release it with, or None if another worker holds it.
+        If Redis is unavailable, we don't wait on other workers.
+        """
+        token = secrets.token_hex(16)
+        if not self.available:
+            return token
+        try:
+            taken = self.client.set(
+                key + ":lock", token, nx=True, px=int(timeout * 1000)
+            )
+        except redis.RedisError as error:
+            self._failed(error)
+            return token
+        return token if taken else None
+
+    def unlock(self, key: str, token: str):
+        if not self.available:
+            return
+        try:
+            self._unlock_script(keys=[key + ":lock"], args=[token])
+        except redis.RedisError as error:
+            self._failed(error)
+
+
+def create_redis_cache() -> Optional[RedisCache]:
+    url = config.cache.redis_url.get_secret_value()
+    if not url:
+        return None
+    return RedisCache(
+        url,
+        timeout=config.cache.redis_timeout,
+        retry_after=config.cache.redis_retry_after,
+    )
+
+
+redis_cache = create_redis_cache()
+
+
+class SingleFlight:
+    """
+    Run a function once for concurrent calls with the same key, in this
+    process only: the first caller runs it, and the others wait for its
+    result (or its exception). Other processes run it too.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        # key -> Future
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, func, *args, **kwargs):
+        with self._lock:
+            future = self._in_flight.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._in_flight[key] = future
+
+        if not is_leader:
+            single_flight_waits.inc(name=self.name)
+            return future.result()
+
+        try:
+            value = func(*args, **kwargs)
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+
+def jittered(ttl: float) -> float:
+    """
+    Shorten the TTL by a random part of `config.cache.ttl_jitter`,
+    so that results cached at the same time don't all expire together
+    """
+    return ttl * (1 - random.uniform(0, config.cache.ttl_jitter))
+
+
+def cached(func, ttl_seconds: int, maxsize: int = 128):
+    """
+    Cache the results of `func` for (about) `ttl_seconds`, by arguments.
+
+    Concurrent calls for a result that isn't cached wait on a single
+    computation: in this process, and through a Redis lock across
+    processes. Methods are cached per class rather than per instance
+    (`self` isn't part of the key), as our services are singletons.
+
+    The returned function also has:
+    - `invalidate(*args, **kwargs)`, to drop the result for these arguments
+      (at once in this process, within `config.cache.local_ttl` seconds
+      in the others)
+    - `cache_clear()`, to drop all the results
+    - `cache_info()`, with hits and misses in this process
+    """
+    name = f"{func.__module__}.{func.__qualname__}"
+    prefix = f"{KEY_PREFIX}{name}:"
+    parameters = list(inspect.signature(func).parameters)
+    skip_self = bool(parameters) and parameters[0] == "self"
+
+    local = LocalCache(maxsize=maxsize)
+    # With Redis, results are only kept locally for a short while,
+    # so invalidations from other processes are picked up
+    local_ttl = (
+        min(ttl_seconds, config.cache.local_ttl)
+        if redis_cache
+        else ttl_seconds
+    )
+    stats = {"hits": 0, "misses": 0}
+    in_flight = SingleFlight(name)
+
+    def make_key(args, kwargs) -> str:
+        arguments = repr((args, sorted(kwargs.items())))
+        return prefix + hashlib.sha1(arguments.encode()).hexdigest()
+
+    def hit(tier):
+        stats["hits"] += 1
+        cache_hits.inc(name=name, tier=tier)
+
+    def load(key, args, kwargs):
+        lock_token = None
+        if redis_cache:
+            value = redis_cache.get(key)
+            if value is not MISSING:
+                hit("redis")
+                local.set(key, value, local_ttl)
+                return value
+
+            lock_token = redis_cache.lock(key, config.cache.lock_timeout)
+            if lock_token is None:
+                # Another process is computing it, wait for its result
+                deadline = time.monotonic() + config.cache.lock_timeout
+                while time.monotonic() < deadline:
+                    time.sleep(0.05)
+                    value = redis_cache.get(key)
+                    if value is not MISSING:
+                        hit("redis")
+                        local.set(key, value, local_ttl)
+                        return value
+
+        stats["misses"] += 1
+        cache_misses.inc(name=name)
+        try:
+            value = func(*args, **kwargs)
+            if redis_cache:
+                redis_cache.set(key, value, jittered(ttl_seconds))
+        finally:
+            if lock_token:
+                redis_cache.unlock(key, lock_token)
+
+        local.set(key, value, jittered(local_ttl))
+        return value
+
+    @functools.wraps(func)
+    def wrapped(*args, **kwargs):
+        key = make_key(args[1:] if skip_self else args, kwargs)
+
+        value = local.get(key)
+        if value is not MISSING:
+            hit("local")
+            return value
+
+        return in_flight.do(key, load, key, args, kwargs)
+
+    def invalidate(*args, **kwargs):
+        # Other processes may keep serving their local copy of the
+        # result for up to `local_ttl` (FLASK_CACHE_LOCAL_TTL) seconds
+        key = make_key(args, kwargs)
+        local.delete(key)
+        if redis_cache:
+            redis_cache.delete(key)
+
+    def cache_clear():
+        local.clear()
+        if redis_cache:
+            redis_cache.delete_prefix(prefix)
+
+    def cache_info() -> CacheInfo:
+        return CacheInfo(stats["hits"], stats["misses"], maxsize, len(local))
+
+    wrapped.invalidate = invalidate
+    wrapped.cache_clear = cache_clear
+    wrapped.cache_info = cache_info
+    return wrapped
@@ -1,7 +1,8 @@
 # Standard library
-from datetime import datetime
-import re
+import json
+import os
 import uuid
+from datetime import timedelta
 
 # Packages
 import click
@@ -9,12 +10,16 @@ import flask
 import requests
 
 # Local
+from webapp.config import config
 from webapp.database import db_session
+from webapp.importer import CheckpointNotFound, import_assets
 from webapp.models import Asset, Redirect, Token
+from webapp.lib.transforms import InvalidTransform, parse_query, signed_query
 from webapp.services import asset_service
 
 token_group = flask.cli.AppGroup("token")
 db_group = flask.cli.AppGroup("database")
+url_group = flask.cli.AppGroup("url")
 
 
 @token_group.command("create")
@@ -55,56 +60,111 @@ def list_token():
 
 @db_group.command("import-assets-from-prod")
 @click.argument("token")
-def import_assets_from_prod(token):
+@click.option(
+    "--url",
+    default="https://assets.ubuntu.com/v1/-/export",
+    help="The export endpoint to import from",
+)
+@click.option("--chunk-size", default=1000, help="Assets per transaction")
+@click.option(
+    "--checkpoint",
+    default=".import-assets-checkpoint.json",
+    help="Where to save progress, to resume an interrupted import",
+)
+@click.option("--restart", is_flag=True, help="Ignore the saved progress")
+def import_assets_from_prod(token, url, chunk_size, checkpoint, restart):
     print("Assets in DB count (before):", db_session.query(Asset).count())
-    data = requests.get(f"https://assets.ubuntu.com/v1?token={token}").json()
-    print("Data to insert:", len(data))
-    for index in range(len(data)):
-        if index % 1000 == 0:
-            print(f"{index}/{len(data)}")
-        entry = data[index]
-        file_path = entry.get("file_path")
-        created = datetime.strptime(
-            entry.get("created"), "%a %b %d %H:%M:%S %Y"
+    if restart and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+
+    response = requests.get(
+        url, params={"token": token}, stream=True, timeout=60
+    )
+    response.raise_for_status()
+    entries = (json.loads(line) for line in response.iter_lines() if line)
+
+    try:
+        import_assets(
+            entries,
+            source=url,
+            chunk_size=chunk_size,
+            checkpoint_path=checkpoint,
         )
-        tags = entry.get("tags", "")
-        tags = re.split(",|\\s", tags)
-        entry.pop("file_path", None)
-        entry.pop("created", None)
-        entry.pop("tags", None)
-
-        # rename optimized
-        if entry.get("optimized", None):
-            entry["optimize"] = entry.get("optimized", None)
-
-        image_extensions = [
-            "jpeg",
-            "jpg",
-            "gif",
-            "png",
-            "apng",
-            "svg",
-            "bmp",
-            "webp",
-        ]
-        entry["image"] = bool(
-            re.match(
-                f".+\\.({'|'.join(image_extensions)})$",
-                file_path,
-                flags=re.IGNORECASE,
+    except CheckpointNotFound as error:
+        raise click.ClickException(f"{error}, use --restart")
+    asset_service.available_extensions.invalidate()
+    print("Assets in DB count (after):", db_session.query(Asset).count())
+
+
+@db_group.command("delete-assets")
+@click.argument("file_paths", nargs=-1)
+@click.option(
+    "--deprecated", is_flag=True, help="Delete all deprecated assets"
+)
+@click.option("--yes", is_flag=True, help="Don't ask for confirmation")
+def delete_assets(file_paths, deprecated, yes):
+    file_paths = list(file_paths)
+    if deprecated:
+        file_paths += [
+            file_path
+            for (file_path,) in db_session.query(Asset.file_path).filter(
+                Asset.deprecated.is_(True)
             )
+        ]
+
+    if not file_paths:
+        print("No assets to delete")
+        return
+    if not yes:
+        click.confirm(f"Delete {len(file_paths)} assets?", abort=True)
+
+    results = asset_service.delete_assets(file_paths)
+    for status in ["deleted", "not_found", "orphaned"]:
+        count = list(results.values()).count(status)
+        print(f"{status}: {count}")
+    for file_path, status in results.items():
+        if status == "orphaned":
+            print(f"Asset deleted, but not its file: {file_path}")
+
+
+@db_group.command("delete-files")
+@click.argument("file_paths", nargs=-1, required=True)
+@click.option(
+    "--large-object", is_flag=True, help="The files are large objects"
+)
+def delete_files(file_paths, large_object):
+    """
+    Delete files left in the storage after their assets were deleted
+    """
+    file_paths = list(file_paths)
+    assets = [
+        file_path
+        for (file_path,) in db_session.query(Asset.file_path).filter(
+            Asset.file_path.in_(file_paths)
+        )
+    ]
+    if assets:
+        raise click.ClickException(
+            f"These files still have assets: {', '.join(assets)}"
         )
 
-        asset = asset_service.find_asset(file_path)
-        # update all the fields if already exists
-        if asset:
-            asset_service.update_asset(file_path, tags)
-        else:
-            asset = Asset(file_path=file_path, data=entry, created=created)
-            db_session.add(asset)
-            asset.tags = asset_service.create_tags_if_not_exist(tags)
-            db_session.commit()
-    print("Assets in DB count (after):", db_session.query(Asset).count())
+    if large_object:
+        failed = asset_service.delete_files([], large_objects=file_paths)
+    else:
+        failed = asset_service.delete_files(file_paths)
+    print(f"deleted: {len(file_paths) - len(failed)}")
+    for file_path in failed:
+        print(f"Failed to delete: {file_path}")
+
+
+@db_group.command("delete-expired-uploads")
+@click.option("--days", default=7, help="Age of the upload sessions to delete")
+def delete_expired_uploads(days):
+    """
+    Delete the upload sessions that were never completed, and their parts
+    """
+    deleted = asset_service.delete_expired_uploads(timedelta(days=days))
+    print(f"{deleted} upload sessions deleted")
 
 
 @db_group.command("import-redirects-from-prod")
@@ -152,3 +212,26 @@ def insert_dummy_data():
             optimize=asset.get("optimize", False),
             tags=["dummy_asset"],
         )
+
+
+@url_group.command("sign")
+@click.argument("file_path")
+@click.argument("query", default="")
+def sign_url(file_path, query):
+    """
+    Print the signed URL of a transformation of an asset, e.g.
+    `flask url sign 4d7a830e-logo.png "w=300&fmt=png"`
+    """
+    signing_key = config.transforms.signing_key.get_secret_value()
+    if not signing_key:
+        print("No signing key: set FLASK_TRANSFORMS_SIGNING_KEY")
+        return
+
+    try:
+        query = parse_query(query, config.transforms.size_buckets)
+    except InvalidTransform as error:
+        print(f"Invalid transformation: {error}")
+        return
+
+    query = signed_query(file_path, query, signing_key)
+    print(f"/v1/{file_path}" + (f"?{query}" if query else ""))
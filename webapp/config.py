@@ -1,3 +1,5 @@
+from typing import List, Literal
+
 from pydantic import AliasChoices, SecretStr, Field, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from webapp.lib.python_helpers import is_pem_private_key
@@ -6,15 +8,59 @@ import base64
 ENV_FILES = (".env", ".env.local")
 
 
+class StorageConfig(BaseSettings):
+    model_config = SettingsConfigDict(
+        env_file=ENV_FILES, extra="ignore", env_prefix="flask_storage_"
+    )
+    # Where asset files are stored: "swift", "s3" or "local"
+    driver: Literal["swift", "s3", "local"] = "swift"
+    # The directory of the files, with the local driver
+    local_path: str = "storage"
+
+
 class SwiftConfig(BaseSettings):
     model_config = SettingsConfigDict(
         env_file=ENV_FILES, extra="ignore", env_prefix="flask_os_"
     )
-    auth_url: str
-    username: str
-    password: SecretStr
-    auth_version: str
+    # Only needed with the swift storage driver
+    auth_url: str = ""
+    username: str = ""
+    password: SecretStr = SecretStr("")
+    auth_version: str = "1.0"
     tenant_name: str = ""
+    # Size of the segments of large uploads (bytes)
+    segment_size: int = 104857600
+    # Connections per worker process, shared by its threads (or
+    # greenlets), and the seconds to wait for one when they're all in use
+    pool_size: int = 10
+    pool_timeout: float = 30.0
+
+
+class S3Config(BaseSettings):
+    model_config = SettingsConfigDict(
+        env_file=ENV_FILES, extra="ignore", env_prefix="flask_s3_"
+    )
+    # Set by the charm's s3 relation, or with FLASK_S3_*
+    endpoint: str = Field(
+        default="",
+        validation_alias=AliasChoices("flask_s3_endpoint", "s3_endpoint"),
+    )
+    region: str = Field(
+        default="",
+        validation_alias=AliasChoices("flask_s3_region", "s3_region"),
+    )
+    bucket: str = Field(
+        default="",
+        validation_alias=AliasChoices("flask_s3_bucket", "s3_bucket"),
+    )
+    access_key: SecretStr = Field(
+        default=SecretStr(""),
+        validation_alias=AliasChoices("flask_s3_access_key", "s3_access_key"),
+    )
+    secret_key: SecretStr = Field(
+        default=SecretStr(""),
+        validation_alias=AliasChoices("flask_s3_secret_key", "s3_secret_key"),
+    )
 
 
 class DirectoryApiConfig(BaseSettings):
@@ -23,6 +69,146 @@ class DirectoryApiConfig(BaseSettings):
     )
     url: str
     token: SecretStr
+    # Request timeout (seconds)
+    timeout: float = 3.0
+    # Search results are fresh for `cache_ttl` seconds, then served
+    # while being refreshed in the background until `stale_ttl`
+    cache_ttl: int = 300
+    stale_ttl: int = 86400
+    # Keep a local copy of the directory to search by prefix
+    local_index: bool = False
+    index_sync_interval: int = 3600
+    # The number of employees per request when syncing the local copy
+    index_page_size: int = 500
+
+
+class DatabaseConfig(BaseSettings):
+    model_config = SettingsConfigDict(
+        env_file=ENV_FILES, extra="ignore", env_prefix="flask_db_"
+    )
+    pool_size: int = 5
+    max_overflow: int = 10
+    # Seconds to wait for a connection from the pool
+    pool_timeout: int = 30
+    # Replace connections older than this (seconds)
+    pool_recycle: int = 1800
+    pool_pre_ping: bool = True
+    # Default statement timeout (milliseconds), 0 to disable it
+    statement_timeout: int = 30000
+    # Statement timeout for asset searches (milliseconds)
+    search_statement_timeout: int = 10000
+    # When running behind PgBouncer (in transaction mode), let it pool
+    # the connections and don't keep any session state on the server
+    pgbouncer: bool = False
+    # Comma separated URLs of read replicas, for read-only queries
+    replica_urls: SecretStr = SecretStr("")
+    # How long to stop using a replica after it fails (seconds)
+    replica_retry_after: int = 30
+
+
+class CacheConfig(BaseSettings):
+    model_config = SettingsConfigDict(
+        env_file=ENV_FILES, extra="ignore", env_prefix="flask_cache_"
+    )
+    # Redis, to share cached results between workers (set by the charm's
+    # redis relation). Without it, each process has its own cache.
+    redis_url: SecretStr = Field(
+        default=SecretStr(""),
+        validation_alias=AliasChoices(
+            "flask_cache_redis_url",
+            "redis_db_connect_string",
+        ),
+    )
+    # Redis socket timeout (seconds)
+    redis_timeout: float = 0.5
+    # How long to stop using Redis after it fails (seconds)
+    redis_retry_after: int = 30
+    # With Redis, how long results are also kept in each process (seconds)
+    local_ttl: int = 60
+    # Results expire up to this fraction of their TTL early, so results
+    # cached at the same time don't all expire together
+    ttl_jitter: float = 0.1
+    # How long to wait for another process computing the same result
+    # before computing it too (seconds)
+    lock_timeout: float = 10
+
+
+class DiskCacheConfig(BaseSettings):
+    model_config = SettingsConfigDict(
+        env_file=ENV_FILES, extra="ignore", env_prefix="flask_disk_cache_"
+    )
+    # Directory of the cache of original assets, empty to disable it
+    path: str = ""
+    # Size of the cache (bytes)
+    max_bytes: int = 1073741824
+    # Larger assets aren't cached (bytes)
+    max_object_bytes: int = 52428800
+    # How long the storage headers (ETag) of a cached asset are trusted
+    # before asking the storage again (seconds)
+    headers_ttl: float = 60
+    # When the web server (e.g. nginx) serves the cache directory from
+    # an internal location with this prefix, let it send cached files
+    # with X-Accel-Redirect
+    accel_redirect_prefix: str = ""
+
+
+class ObjectCacheConfig(BaseSettings):
+    model_config = SettingsConfigDict(
+        env_file=ENV_FILES, extra="ignore", env_prefix="flask_object_cache_"
+    )
+    # Size of the in-process cache of small assets (bytes), 0 to disable
+    max_bytes: int = 33554432
+    # Larger assets aren't cached (bytes)
+    max_object_bytes: int = 262144
+    # How long cached assets are served before checking their ETag
+    # (seconds)
+    ttl: float = 60
+
+
+class CompressionConfig(BaseSettings):
+    model_config = SettingsConfigDict(
+        env_file=ENV_FILES, extra="ignore", env_prefix="flask_compression_"
+    )
+    # Send compressed text assets (SVG, CSS, JS...) to clients that
+    # accept brotli or gzip
+    enabled: bool = True
+    # Size of the in-process cache of compressed assets (bytes)
+    cache_max_bytes: int = 16777216
+
+
+class TransformsConfig(BaseSettings):
+    model_config = SettingsConfigDict(
+        env_file=ENV_FILES, extra="ignore", env_prefix="flask_transforms_"
+    )
+    # Sizes that resize options are rounded down to, as a JSON list
+    # (e.g. [320, 640, 1280]), so fewer variants are rendered and cached.
+    # Sizes below the smallest one are kept as they are.
+    size_buckets: List[int] = []
+    # Redirect requests with non-canonical transformation options to the
+    # canonical URL, rather than only sending it as Content-Location
+    redirect_to_canonical: bool = False
+    # Only render transformations signed with this key (in the "sig"
+    # parameter), when set
+    signing_key: SecretStr = SecretStr("")
+    # Canonical queries that don't need a signature, as a JSON list
+    # (e.g. ["w=64", "w=128&fmt=png"])
+    unsigned_presets: List[str] = []
+    # Transformations per second per client (IP address, or API token),
+    # 0 for no limit (e.g. when all the requests come from a CDN)
+    rate_limit: float = 0
+    # Transformations a client can request at once
+    rate_limit_burst: int = 20
+    # Proxies in front of the app, trusted to add the client IP address
+    # to X-Forwarded-For
+    trusted_proxies: int = 0
+    # Transformations rendered at the same time on a host, 0 for no limit
+    max_concurrent: int = 2
+    # How long to wait for another transformation to finish, when there
+    # are already `max_concurrent`, before a 503 (seconds)
+    queue_timeout: float = 1.0
+    # Directory of the lock files that limit concurrent transformations
+    # (by default, in the temporary directory)
+    lock_dir: str = ""
 
 
 # Salesforce Trino Config
@@ -49,6 +235,9 @@ class TrinoSFConfig(BaseSettings):
     http_scheme: str = "https"
     catalog: str = "salesforce"
     schema: str = "canonical"
+    pool_size: int = 2
+    # How long campaign search results are cached for (seconds)
+    campaign_cache_ttl: int = 300
 
     @field_validator("private_key", mode="before")
     @classmethod
@@ -77,13 +266,24 @@ class Config(BaseSettings):
 
     secret_key: SecretStr
     read_only_mode: bool = False
+    # Connect to Swift and Trino in the background when a gunicorn worker
+    # starts, rather than on the first request that needs them
+    warm_up_clients: bool = True
     database_url: SecretStr = Field(
         validation_alias=AliasChoices(
             "database_url",
             "postgresql_db_connect_string",
         )
     )
-    swift: SwiftConfig = SwiftConfig()  # type: ignore
+    db: DatabaseConfig = DatabaseConfig()
+    cache: CacheConfig = CacheConfig()
+    disk_cache: DiskCacheConfig = DiskCacheConfig()
+    object_cache: ObjectCacheConfig = ObjectCacheConfig()
+    compression: CompressionConfig = CompressionConfig()
+    transforms: TransformsConfig = TransformsConfig()
+    storage: StorageConfig = StorageConfig()
+    swift: SwiftConfig = SwiftConfig()
+    s3: S3Config = S3Config()
     directory_api: DirectoryApiConfig = DirectoryApiConfig()  # type: ignore
     trino_sf: TrinoSFConfig = TrinoSFConfig()  # type: ignore
 
@@ -1,10 +1,253 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import scoped_session, sessionmaker
+import contextvars
+import functools
+import itertools
+import threading
+import time
 
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session, scoped_session, sessionmaker
+from sqlalchemy.pool import NullPool
+
+from webapp import metrics
 from webapp.config import config
 
 
-db_engine = create_engine(config.database_url.get_secret_value())
+def engine_options() -> dict:
+    if config.db.pgbouncer:
+        # PgBouncer pools the connections, so we don't keep any
+        return {"poolclass": NullPool}
+
+    connect_args = {}
+    if config.db.statement_timeout:
+        # The default statement timeout, for the whole connection
+        # (see `statement_timeout` to override it)
+        connect_args["options"] = (
+            f"-c statement_timeout={int(config.db.statement_timeout)}"
+        )
+
+    return {
+        "connect_args": connect_args,
+        "pool_size": config.db.pool_size,
+        "max_overflow": config.db.max_overflow,
+        "pool_timeout": config.db.pool_timeout,
+        "pool_recycle": config.db.pool_recycle,
+        "pool_pre_ping": config.db.pool_pre_ping,
+    }
+
+
+db_engine = create_engine(
+    config.database_url.get_secret_value(), **engine_options()
+)
+replica_engines = [
+    create_engine(url.strip(), **engine_options())
+    for url in config.db.replica_urls.get_secret_value().split(",")
+    if url.strip()
+]
+
+
+def count_checkout(dbapi_connection, connection_record, connection_proxy):
+    metrics.db_pool_checkouts.inc()
+    connection_record.info["checked_out_at"] = time.perf_counter()
+
+
+def count_checkin(dbapi_connection, connection_record):
+    metrics.db_pool_checkins.inc()
+    checked_out_at = connection_record.info.pop("checked_out_at", None)
+    if checked_out_at is not None:
+        metrics.db_pool_checkout_time.observe(
+            (time.perf_counter() - checked_out_at) * 1000
+        )
+
+
+for engine in [db_engine, *replica_engines]:
+    event.listen(engine, "checkout", count_checkout)
+    event.listen(engine, "checkin", count_checkin)
+
+
+# Read replicas
+# ===
+# Whether the current queries come from a `read_only` function
+_use_replica = contextvars.ContextVar("use_replica", default=False)
+_replicas = itertools.cycle(replica_engines)
+_replicas_lock = threading.Lock()
+# replica engine -> time until which we don't use it
+_replicas_down_until = {}
+
+
+def _is_available(replica) -> bool:
+    return _replicas_down_until.get(replica, 0) < time.monotonic()
+
+
+def _available_replica():
+    with _replicas_lock:
+        for _ in range(len(replica_engines)):
+            replica = next(_replicas)
+            if _is_available(replica):
+                return replica
+
+    return None
+
+
+class RoutingSession(Session):
+    """
+    Send the queries of `read_only` functions to a read replica, and
+    everything else to the primary.
+
+    A session keeps using the same replica while it's available.
+    Once it has written anything, it sticks to the primary until it is
+    removed (at the end of the request), so a request always reads its
+    own writes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        bind = db_engine
+
+        if (
+            _use_replica.get()
+            and not self._flushing
+            and not self.info.get("has_written")
+        ):
+            replica = self.info.get("replica")
+            if replica is None or not _is_available(replica):
+                replica = _available_replica()
+            if replica is not None:
+                self.info["replica"] = bind = replica
+
+        self.info["last_bind"] = bind
+        return bind
+
+
+# Sessions are scoped to the current thread (or greenlet, under gevent),
+# so the threaded serving modes each get their own
 db_session = scoped_session(
-    sessionmaker(autocommit=False, autoflush=False, bind=db_engine)
+    sessionmaker(
+        class_=RoutingSession,
+        autocommit=False,
+        autoflush=False,
+        bind=db_engine,
+    )
 )
+
+
+@event.listens_for(db_session.session_factory, "after_flush")
+def mark_flush_as_write(session, flush_context):
+    session.info["has_written"] = True
+
+
+@event.listens_for(db_session.session_factory, "do_orm_execute")
+def mark_dml_as_write(orm_execute_state):
+    if (
+        orm_execute_state.is_insert
+        or orm_execute_state.is_update
+        or orm_execute_state.is_delete
+    ):
+        orm_execute_state.session.info["has_written"] = True
+
+
+def read_only(func):
+    """
+    Run the queries of the decorated function on a read replica, when
+    replicas are configured.
+
+    If the replica fails, it's set aside for a while and the function
+    runs again on the primary, unless the session has pending changes
+    (which the rollback would discard).
+    """
+
+    @functools.wraps(func)
+    def wrapped(*args, **kwargs):
+        if not replica_engines:
+            return func(*args, **kwargs)
+
+        token = _use_replica.set(True)
+        try:
+            return func(*args, **kwargs)
+        except OperationalError as error:
+            session = db_session()
+            replica = session.info.get("last_bind")
+            # Statement timeouts would just as likely time out on the primary
+            query_canceled = getattr(error.orig, "pgcode", None) == "57014"
+            pending = session.new or session.dirty or session.deleted
+            if replica not in replica_engines or query_canceled or pending:
+                raise
+
+            _replicas_down_until[replica] = (
+                time.monotonic() + config.db.replica_retry_after
+            )
+            session.info.pop("replica", None)
+            session.rollback()
+        finally:
+            _use_replica.reset(token)
+
+        return func(*args, **kwargs)
+
+    return wrapped
+
+
+# Statement timeouts
+# ===
+# Statement timeout (milliseconds) of the current view, when it's
+# overridden with the `statement_timeout` decorator. Otherwise, the
+# default is set when connecting (see `engine_options`).
+_statement_timeout = contextvars.ContextVar("statement_timeout", default=None)
+
+
+def _set_local_statement_timeout(connection, milliseconds: int):
+    # SET LOCAL only lasts until the end of the transaction, so nothing
+    # leaks to the next user of the connection (and it's safe with
+    # PgBouncer in transaction mode)
+    connection.execute(
+        text(f"SET LOCAL statement_timeout = {int(milliseconds)}")
+    )
+
+
+@event.listens_for(db_session.session_factory, "after_begin")
+def track_connection(session, transaction, connection):
+    # The connections of the current transaction (the primary's and a
+    # replica's), for `statement_timeout` to override their timeout
+    session.info.setdefault("connections", []).append(connection)
+
+
+@event.listens_for(db_session.session_factory, "after_transaction_end")
+def forget_connections(session, transaction):
+    if transaction.parent is None:
+        session.info.pop("connections", None)
+
+
+@event.listens_for(db_session.session_factory, "after_begin")
+def apply_statement_timeout(session, transaction, connection):
+    milliseconds = _statement_timeout.get()
+    if milliseconds is None and config.db.pgbouncer:
+        # PgBouncer doesn't pass connection options on to the server,
+        # so the default is set in each transaction
+        milliseconds = config.db.statement_timeout or None
+    if milliseconds is not None:
+        _set_local_statement_timeout(connection, milliseconds)
+
+
+def statement_timeout(milliseconds: int):
+    """
+    Set the statement timeout for the queries run by the decorated view.
+    0 disables the timeout.
+
+    Put it outside the authentication decorators, so it covers all the
+    queries of the view.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapped(*args, **kwargs):
+            token = _statement_timeout.set(milliseconds)
+            try:
+                # A transaction may already be open, on the primary or
+                # on a replica: override the timeout on its connections
+                for connection in db_session().info.get("connections", []):
+                    _set_local_statement_timeout(connection, milliseconds)
+                return func(*args, **kwargs)
+            finally:
+                _statement_timeout.reset(token)
+
+        return wrapped
+
+    return decorator
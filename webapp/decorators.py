@@ -8,19 +8,21 @@ import flask
 from webapp.auth import authenticate
 
 
-def get_token_from_request(request):
+def get_token_from_request(request, read_body: bool = True):
     auth_header = request.headers.get("Authorization", "")
 
     if auth_header[:6].lower() == "token ":
         return auth_header[6:]
 
-    return request.values.get("token", None)
+    # request.values parses form bodies, which consumes request.stream
+    params = request.values if read_body else request.args
+    return params.get("token", None)
 
 
-def token_required(f):
+def token_required(f, read_body: bool = True):
     @functools.wraps(f)
     def wrapped(*args, **kwargs):
-        token = get_token_from_request(flask.request)
+        token = get_token_from_request(flask.request, read_body=read_body)
         if not token or not authenticate(token):
             message = "Invalid or missing token."
             flask.abort(401, message)
@@ -31,3 +33,28 @@ def token_required(f):
         return response
 
     return wrapped
+
+
+def stream_token_required(f):
+    """
+    Like `token_required`, for views that read the raw body: the token
+    is only read from the headers or the query string
+    """
+    wrapped = token_required(f, read_body=False)
+    wrapped.reads_raw_body = True
+    return wrapped
+
+
+class RawBodyRequest(flask.Request):
+    """
+    Don't parse the body as a form for views that read the raw body (see
+    `stream_token_required`), so nothing consumes request.stream before
+    them (such as Sentry, which reads the form in its before_request)
+    """
+
+    @property
+    def want_form_data_parsed(self) -> bool:
+        view = flask.current_app.view_functions.get(self.endpoint)
+        if getattr(view, "reads_raw_body", False):
+            return False
+        return super().want_form_data_parsed
@@ -0,0 +1,117 @@
+"""
+A minimal app that only serves assets and redirects (GET /v1/<path>).
+
+It leaves out everything only the manager and the write API need
+(CSRF, SSO, templates, form data, Trino and the directory API), so it
+starts faster and uses less memory than `webapp.app`. It can be served
+as its own process, e.g.:
+
+    GUNICORN_APP=webapp.delivery:app ./entrypoint 0.0.0.0:80
+"""
+
+# Packages
+import flask
+import talisker.flask
+from flask import redirect, request
+from flask_compress import Compress
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from swiftclient.exceptions import ClientException as SwiftException
+
+# Local
+from webapp import metrics
+from webapp.database import db_session
+from webapp.lib.http_helpers import os_error_status, swift_error_status
+from webapp.lib.processors import ImageProcessingError
+from webapp.serving import get_asset
+
+URL_PREFIX = "/v1"
+
+app = flask.Flask(__name__)
+talisker.flask.register(app)
+Compress(app)
+
+
+# Error pages
+# ===
+def render_error(code, message):
+    return {"code": code, "message": message}, code
+
+
+@app.errorhandler(400)
+@app.errorhandler(401)
+@app.errorhandler(403)
+def error_handler(error=None):
+    code = getattr(error, "code")
+    return render_error(code, str(error))
+
+
+@app.errorhandler(429)
+@app.errorhandler(503)
+def error_retry_later(error=None):
+    # Keep the Retry-After header, so clients know when to try again
+    body, code = render_error(error.code, str(error))
+    headers = {
+        name: value
+        for name, value in error.get_headers()
+        if name == "Retry-After"
+    }
+    return body, code, headers
+
+
+@app.errorhandler(500)
+def error_500(error=None):
+    app.extensions["sentry"].captureException()
+    return render_error(500, str(error))
+
+
+@app.errorhandler(OSError)
+def error_os(error=None):
+    app.extensions["sentry"].captureException()
+
+    status = os_error_status(error)
+    return render_error(status, str(error.strerror))
+
+
+@app.errorhandler(ImageProcessingError)
+def error_pillbox(error=None):
+    app.extensions["sentry"].captureException()
+
+    status = error.status_code
+    return render_error(status, f"Pilbox Error: {error.log_message}")
+
+
+@app.errorhandler(SwiftException)
+def error_swift(error=None):
+    app.extensions["sentry"].captureException()
+
+    status = swift_error_status(error)
+    return render_error(status, f"Swift Error: {error.msg}")
+
+
+@app.errorhandler(PoolTimeoutError)
+def error_db_pool_timeout(error=None):
+    # All the database connections of this process are in use
+    metrics.db_pool_timeouts.inc()
+    return render_error(503, "The database is busy, please try again")
+
+
+@app.errorhandler(404)
+def redirect_v1(error=None):
+    # Redirect to /v1/ if the route is not found
+    if request.path.startswith(URL_PREFIX):
+        return render_error(404, error.description if error else "Not found")
+    else:
+        return redirect(URL_PREFIX + "/" + request.path, code=302)
+
+
+# Routes
+# ===
+app.add_url_rule(f"{URL_PREFIX}/<path:file_path>", view_func=get_asset)
+
+
+# Teardown
+# ===
+@app.teardown_appcontext
+def remove_db_session(response):
+    db_session.remove()
+    return response
@@ -0,0 +1,173 @@
+"""
+A local disk cache of original asset files, so the most requested
+assets are served from the local filesystem with sendfile (or by the
+web server with X-Accel-Redirect) rather than fetched from storage.
+
+Files are named after their storage ETag: a new version of an asset
+gets a new ETag, so cached files never need to be invalidated. The
+cache is shared by the worker processes, and kept under its size limit
+by deleting the least recently used files (by modification time, which
+is updated on each hit), and the temporary files of workers that died
+while writing them.
+"""
+
+# Standard library
+import fcntl
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+# Local
+from webapp.config import config
+
+logger = logging.getLogger(__name__)
+
+
+class DiskCache:
+    """
+    Files in a directory, by ETag, limited to `max_bytes` in total
+    """
+
+    # Fraction of `max_bytes` to get down to when evicting files, so
+    # eviction doesn't run on every new file
+    low_water_mark = 0.9
+    # Don't update the modification time of files used more recently
+    touch_interval = 60
+    # Temporary files older than this were left by a worker that died
+    # while writing them (seconds)
+    stale_tmp_age = 3600
+    # How often to check if a lock is free (seconds)
+    poll_interval = 0.05
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        # Bytes in the cache, as of the last scan, plus the bytes this
+        # process has added since (the other processes add files too)
+        self._size = None
+        self._lock = threading.Lock()
+
+    def path(self, etag: str) -> str:
+        return os.path.join(self.directory, etag[:2], etag)
+
+    def get(self, etag: str) -> Optional[str]:
+        """
+        The path of the cached file for `etag`, if it's cached
+        """
+        path = self.path(etag)
+        try:
+            if os.stat(path).st_mtime < time.time() - self.touch_interval:
+                os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    @contextmanager
+    def lock(self, etag: str, timeout: float):
+        """
+        Hold the lock on caching the file for `etag`, shared by the
+        worker processes of the host, so only one of them fetches it.
+        After `timeout` seconds of waiting, go ahead without it.
+
+        Locks are lock files, one per subdirectory (so a few ETags share
+        each one), released by the system if their process dies.
+        """
+        directory = os.path.dirname(self.path(etag))
+        os.makedirs(directory, exist_ok=True)
+        deadline = time.monotonic() + timeout
+        # Closing the file releases the lock
+        with open(os.path.join(directory, ".lock"), "a") as lock_file:
+            while True:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    # Polling, as a blocking flock would block all the
+                    # greenlets of a gevent worker
+                    if time.monotonic() >= deadline:
+                        logger.warning("Timed out waiting to cache %s", etag)
+                        break
+                    time.sleep(self.poll_interval)
+            yield
+
+    def put(self, etag: str, data: bytes) -> str:
+        """
+        Cache a file, and return its path
+        """
+        path = self.path(etag)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so no one ever reads half a file
+        with tempfile.NamedTemporaryFile(
+            dir=self.directory, prefix=".tmp-", delete=False
+        ) as tmp_file:
+            tmp_file.write(data)
+        # Temporary files are only readable by their owner, but the web
+        # server may read cached files directly (with X-Accel-Redirect)
+        os.chmod(tmp_file.name, 0o644)
+        os.replace(tmp_file.name, path)
+
+        with self._lock:
+            if self._size is not None:
+                self._size += len(data)
+            evict = self._size is None or self._size > self.max_bytes
+        if evict:
+            self.evict(keep=path)
+
+        return path
+
+    def evict(self, keep: str = None):
+        """
+        Delete the least recently used files (except `keep`) until the
+        cache is under its low water mark
+        """
+        files = []
+        for subdirectory in os.scandir(self.directory):
+            if subdirectory.name.startswith(".tmp-"):
+                self._remove_stale_tmp_file(subdirectory)
+                continue
+            if not subdirectory.is_dir():
+                continue
+            for entry in os.scandir(subdirectory.path):
+                if entry.name == ".lock":
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+
+        size = sum(file_size for _, file_size, _ in files)
+        if size > self.max_bytes:
+            target = self.max_bytes * self.low_water_mark
+            for _, file_size, path in sorted(files):
+                if size <= target:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                size -= file_size
+            logger.info("Disk cache evicted down to %d bytes", size)
+
+        with self._lock:
+            self._size = size
+
+    def _remove_stale_tmp_file(self, entry: os.DirEntry):
+        try:
+            if entry.stat().st_mtime < time.time() - self.stale_tmp_age:
+                os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+
+
+disk_cache = (
+    DiskCache(config.disk_cache.path, config.disk_cache.max_bytes)
+    if config.disk_cache.path
+    else None
+)
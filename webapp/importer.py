@@ -0,0 +1,266 @@
+"""
+Import assets metadata in bulk, from the NDJSON export of another
+instance (GET /v1/-/export), e.g. to seed a development database.
+
+Assets are upserted by file path, a chunk at a time: each chunk is a
+few set-based statements and one commit, and the file path of the last
+asset imported is saved in a checkpoint file, so an interrupted import
+resumes after the last committed chunk.
+"""
+
+# Standard library
+import json
+import os
+import re
+import time
+from datetime import datetime
+from typing import Iterable, Iterator, Optional, Tuple
+
+# Packages
+from more_itertools import chunked
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+# Local
+from webapp.database import db_session
+from webapp.models import ASSET_NAME_ASSOCIATIONS, Asset
+
+CREATED_FORMATS = [
+    # Asset.as_json
+    "%a, %d %b %Y %H:%M:%S",
+    # The previous API
+    "%a %b %d %H:%M:%S %Y",
+]
+
+IMAGE_EXTENSIONS = ["jpeg", "jpg", "gif", "png", "apng", "svg", "bmp", "webp"]
+
+# Fields of the export stored in their own Asset column, rather than data
+COLUMNS = ["name", "asset_type", "language", "google_drive_link"]
+
+# Fields of the export that aren't imported
+SKIPPED = ["author", "salesforce_campaigns"]
+
+
+def parse_created(created: Optional[str]) -> datetime:
+    for date_format in CREATED_FORMATS:
+        try:
+            return datetime.strptime(created, date_format)
+        except (TypeError, ValueError):
+            continue
+    return datetime.now()
+
+
+def parse_entry(entry: dict) -> Tuple[dict, dict]:
+    """
+    Split an exported asset into the values of its Asset row,
+    and its tag, product and category names
+    """
+    entry = dict(entry)
+    file_path = entry.pop("file_path")
+    created = parse_created(entry.pop("created", None))
+    deprecated = bool(entry.pop("deprecated", False))
+    # Set from the file path, as for new assets
+    entry.pop("file_type", None)
+
+    names = {}
+    for field in ASSET_NAME_ASSOCIATIONS:
+        value = entry.pop(field, None) or ""
+        # Tags are single words, as they always were for the importer
+        separators = ",|\\s" if field == "tags" else ","
+        names[field] = sorted(
+            {
+                name.strip().lower() if field == "tags" else name.strip()
+                for name in re.split(separators, value)
+                if name.strip()
+            }
+        )
+
+    values = {column: entry.pop(column, None) for column in COLUMNS}
+    for field in SKIPPED:
+        entry.pop(field, None)
+
+    # rename optimized
+    if entry.get("optimized", None):
+        entry["optimize"] = entry.get("optimized", None)
+
+    entry["image"] = bool(
+        re.match(
+            f".+\\.({'|'.join(IMAGE_EXTENSIONS)})$",
+            file_path,
+            flags=re.IGNORECASE,
+        )
+    )
+
+    values.update(
+        file_path=file_path,
+        created=created,
+        data=entry,
+        deprecated=deprecated,
+        file_type=file_path.split(".")[-1].lower(),
+    )
+    return values, names
+
+
+def import_chunk(entries: Iterable[dict]):
+    """
+    Upsert a chunk of exported assets and replace their tags, products
+    and categories. The caller commits.
+    """
+    rows = {}
+    names_by_path = {}
+    for entry in entries:
+        values, names = parse_entry(entry)
+        rows[values["file_path"]] = values
+        names_by_path[values["file_path"]] = names
+
+    ids = dict(
+        db_session.execute(
+            select(Asset.file_path, Asset.id).where(
+                Asset.file_path.in_(list(rows))
+            )
+        ).all()
+    )
+
+    updates = [
+        {**values, "id": ids[file_path]}
+        for file_path, values in rows.items()
+        if file_path in ids
+    ]
+    if updates:
+        db_session.execute(update(Asset), updates)
+
+    inserts = [
+        values for file_path, values in rows.items() if file_path not in ids
+    ]
+    if inserts:
+        ids.update(
+            db_session.execute(
+                insert(Asset).returning(Asset.file_path, Asset.id), inserts
+            ).all()
+        )
+
+    asset_ids = list(ids.values())
+    for field, (model, table, column) in ASSET_NAME_ASSOCIATIONS.items():
+        all_names = {
+            name for names in names_by_path.values() for name in names[field]
+        }
+        if all_names:
+            db_session.execute(
+                pg_insert(model).on_conflict_do_nothing(),
+                [{"name": name} for name in all_names],
+            )
+
+        db_session.execute(
+            delete(table).where(table.c.asset_id.in_(asset_ids))
+        )
+        links = [
+            {"asset_id": ids[file_path], column: name}
+            for file_path, names in names_by_path.items()
+            for name in names[field]
+        ]
+        if links:
+            db_session.execute(insert(table), links)
+
+
+def read_checkpoint(path: str, source: str) -> Optional[dict]:
+    """
+    The progress of a previous import from `source`: the number of
+    assets imported, and the file path of the last one
+    """
+    try:
+        with open(path) as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+    except (OSError, ValueError):
+        return None
+
+    if checkpoint.get("source") != source or not checkpoint.get(
+        "last_file_path"
+    ):
+        return None
+    return checkpoint
+
+
+def write_checkpoint(
+    path: str, source: str, imported: int, last_file_path: str
+):
+    # Write then rename, so an interruption never leaves half a file
+    with open(f"{path}.tmp", "w") as checkpoint_file:
+        json.dump(
+            {
+                "source": source,
+                "imported": imported,
+                "last_file_path": last_file_path,
+            },
+            checkpoint_file,
+        )
+    os.replace(f"{path}.tmp", path)
+
+
+def entries_after(entries: Iterable[dict], file_path: str) -> Iterator[dict]:
+    """
+    The entries after the one for `file_path`.
+
+    The export is in the order assets were created, so assets added or
+    deleted since the previous run don't shift where it stopped, as
+    skipping a number of entries would.
+    """
+    entries = iter(entries)
+    for entry in entries:
+        if entry.get("file_path") == file_path:
+            return entries
+
+    raise CheckpointNotFound(
+        f"{file_path}, where the previous import stopped, is no longer "
+        "in the export"
+    )
+
+
+def import_assets(
+    entries: Iterable[dict],
+    source: str,
+    chunk_size: int = 1000,
+    checkpoint_path: Optional[str] = None,
+) -> int:
+    """
+    Import the exported assets from `source`, `chunk_size` at a time,
+    and return the number of assets imported.
+
+    With a `checkpoint_path`, the import resumes after the last asset
+    committed by a previous run from the same source.
+    """
+    checkpoint = (
+        read_checkpoint(checkpoint_path, source) if checkpoint_path else None
+    )
+    skipped = 0
+    if checkpoint:
+        skipped = checkpoint.get("imported", 0)
+        print(f"Resuming after {checkpoint['last_file_path']}")
+        entries = entries_after(entries, checkpoint["last_file_path"])
+
+    imported = skipped
+    start = time.perf_counter()
+    for chunk in chunked(entries, chunk_size):
+        try:
+            import_chunk(chunk)
+            db_session.commit()
+        except Exception:
+            db_session.rollback()
+            raise
+
+        imported += len(chunk)
+        if checkpoint_path:
+            write_checkpoint(
+                checkpoint_path, source, imported, chunk[-1]["file_path"]
+            )
+
+        rate = (imported - skipped) / (time.perf_counter() - start)
+        print(f"{imported} assets imported ({rate:.0f} assets/s)")
+
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    return imported
+
+
+class CheckpointNotFound(Exception):
+    pass
@@ -0,0 +1,297 @@
+import bisect
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import List, Optional
+
+import requests
+
+from webapp.config import config
+
+logger = logging.getLogger(__name__)
+
+EMPLOYEES_QUERY = """
+query($name: String!) {
+    employees(filter: { contains: { name: $name }}) {
+        id
+        firstName
+        surname
+        email
+        team
+        department
+        jobTitle
+    }
+}
+"""
+
+# The same query, a page at a time, to copy the whole directory
+EMPLOYEES_PAGE_QUERY = """
+query($name: String!, $limit: Int!, $offset: Int!) {
+    employees(
+        filter: { contains: { name: $name }}, limit: $limit, offset: $offset
+    ) {
+        id
+        firstName
+        surname
+        email
+        team
+        department
+        jobTitle
+    }
+}
+"""
+
+
+class DirectoryUnavailable(Exception):
+    """
+    Raised when the directory API can't be reached
+    and we have nothing cached to answer with
+    """
+
+
+def fetch_employees(
+    name: str, limit: Optional[int] = None, offset: int = 0
+) -> List[dict]:
+    """
+    Query the directory API for employees whose name contains `name`,
+    optionally a page of `limit` employees from `offset`
+    """
+    if limit is None:
+        query, variables = EMPLOYEES_QUERY, {"name": name}
+    else:
+        query = EMPLOYEES_PAGE_QUERY
+        variables = {"name": name, "limit": limit, "offset": offset}
+
+    headers = {
+        "Authorization": "token "
+        + config.directory_api.token.get_secret_value()
+    }
+    response = requests.post(
+        config.directory_api.url,
+        json={"query": query, "variables": variables},
+        headers=headers,
+        verify=False,
+        timeout=config.directory_api.timeout,
+    )
+    response.raise_for_status()
+
+    return list(response.json().get("data", {}).get("employees", []))
+
+
+def fetch_all_employees(page_size: int) -> List[dict]:
+    """
+    The whole directory, a page at a time
+    """
+    employees = []
+    ids = set()
+    while True:
+        page = fetch_employees("", limit=page_size, offset=len(employees))
+        new = [employee for employee in page if employee.get("id") not in ids]
+        employees.extend(new)
+        ids.update(employee.get("id") for employee in new)
+        # A short page is the last one. A page with nothing new, or
+        # larger than asked for, means the API didn't paginate.
+        if len(page) != page_size or not new:
+            return employees
+
+
+class EmployeeIndex:
+    """
+    A local copy of the whole directory, searchable by prefix of
+    first name, surname, full name or email.
+    It is synced in the background, every `sync_interval` seconds.
+    """
+
+    def __init__(
+        self, sync_interval: int, limit: int = 50, page_size: int = 500
+    ):
+        self.sync_interval = sync_interval
+        self.limit = limit
+        self.page_size = page_size
+        self.synced_at = None
+        self._keys = []
+        self._employees = []
+        self._syncing = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.synced_at is not None
+
+    def sync(self):
+        employees = fetch_all_employees(self.page_size)
+        keys = []
+        for position, employee in enumerate(employees):
+            first_name = (employee.get("firstName") or "").lower()
+            surname = (employee.get("surname") or "").lower()
+            for key in {
+                first_name,
+                surname,
+                f"{first_name} {surname}",
+                (employee.get("email") or "").lower(),
+            }:
+                if key.strip():
+                    keys.append((key, position))
+        keys.sort()
+
+        # Swap both at once, so searches never see a half-built index
+        self._keys, self._employees = keys, employees
+        self.synced_at = time.monotonic()
+        logger.info("Synced %s employees from the directory", len(employees))
+
+    def sync_if_stale(self):
+        """
+        Start a background sync if the index is missing or out of date
+        """
+        if self.ready and (
+            time.monotonic() - self.synced_at < self.sync_interval
+        ):
+            return
+        if not self._syncing.acquire(blocking=False):
+            return
+
+        def _sync():
+            try:
+                self.sync()
+            except Exception as error:
+                logger.warning("Unable to sync the employee index: %s", error)
+            finally:
+                self._syncing.release()
+
+        threading.Thread(target=_sync, daemon=True).start()
+
+    def search(self, prefix: str) -> List[dict]:
+        prefix = prefix.strip().lower()
+        keys, employees = self._keys, self._employees
+        positions = []
+        start = bisect.bisect_left(keys, (prefix,))
+        for key, position in keys[start:]:
+            if not key.startswith(prefix) or len(positions) >= self.limit:
+                break
+            if position not in positions:
+                positions.append(position)
+
+        return [employees[position] for position in positions]
+
+
+class DirectoryClient:
+    """
+    Employee searches against the directory API, with:
+    - a TTL cache of results
+    - coalescing of identical in-flight searches, so only one request
+      per name reaches the API at a time
+    - stale-while-revalidate: past `cache_ttl` (and up to `stale_ttl`),
+      cached results are returned straight away and refreshed in the
+      background. Older results are only used if the API fails.
+    """
+
+    def __init__(
+        self,
+        cache_ttl: int,
+        stale_ttl: int,
+        maxsize: int = 1024,
+        index: Optional[EmployeeIndex] = None,
+    ):
+        self.cache_ttl = cache_ttl
+        self.stale_ttl = stale_ttl
+        self.maxsize = maxsize
+        self.index = index
+        # name -> (fetched_at, employees)
+        self._cache = OrderedDict()
+        # name -> Future
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def search_employees(self, name: str) -> List[dict]:
+        name = name.strip()
+
+        if self.index:
+            self.index.sync_if_stale()
+            if self.index.ready:
+                return self.index.search(name)
+
+        with self._lock:
+            entry = self._cache.get(name)
+        age = time.monotonic() - entry[0] if entry else None
+
+        if entry and age < self.cache_ttl:
+            return entry[1]
+
+        if entry and age < self.stale_ttl:
+            self._refresh_in_background(name)
+            return entry[1]
+
+        try:
+            return self._fetch(name)
+        except FutureTimeoutError:
+            # The same search, started by another request, is still
+            # running: stop waiting for it
+            logger.warning("Timed out waiting for the search for '%s'", name)
+            if entry:
+                return entry[1]
+            raise DirectoryUnavailable()
+        except Exception as error:
+            logger.warning("Unable to search the directory: %s", error)
+            if entry:
+                return entry[1]
+            raise DirectoryUnavailable() from error
+
+    def _fetch(self, name: str) -> List[dict]:
+        with self._lock:
+            future = self._in_flight.get(name)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._in_flight[name] = future
+
+        if not is_leader:
+            return future.result(timeout=config.directory_api.timeout)
+
+        try:
+            employees = fetch_employees(name)
+        except Exception as error:
+            future.set_exception(error)
+            raise
+        else:
+            self._store(name, employees)
+            future.set_result(employees)
+            return employees
+        finally:
+            with self._lock:
+                self._in_flight.pop(name, None)
+
+    def _store(self, name: str, employees: List[dict]):
+        with self._lock:
+            self._cache[name] = (time.monotonic(), employees)
+            self._cache.move_to_end(name)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+
+    def _refresh_in_background(self, name: str):
+        with self._lock:
+            if name in self._in_flight:
+                return
+
+        def _refresh():
+            try:
+                self._fetch(name)
+            except Exception as error:
+                logger.warning("Unable to refresh '%s': %s", name, error)
+
+        threading.Thread(target=_refresh, daemon=True).start()
+
+
+directory_client = DirectoryClient(
+    cache_ttl=config.directory_api.cache_ttl,
+    stale_ttl=config.directory_api.stale_ttl,
+    index=(
+        EmployeeIndex(
+            sync_interval=config.directory_api.index_sync_interval,
+            page_size=config.directory_api.index_page_size,
+        )
+        if config.directory_api.local_index
+        else None
+    ),
+)
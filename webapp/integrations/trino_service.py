@@ -1,12 +1,18 @@
 # trino_client.py
 import logging
+import queue
 import sys
-from typing import Optional
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import List, Optional
 import trino.auth
 from trino.dbapi import connect
 from google.auth.transport.requests import Request
 from google.oauth2 import service_account
 from webapp.config import config
+from webapp.lib.python_helpers import sanitize_like_input
 
 logging.basicConfig(
     level=logging.INFO,
@@ -16,44 +22,204 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+CAMPAIGN_SEARCH_LIMIT = 20
+
+
+class TrinoUnavailable(Exception):
+    """
+    Raised when we can't get a token for, or connect to, Trino
+    """
+
 
 class TrinoClient:
-    def __init__(self):
+    """
+    Trino client with a small pool of connections.
+
+    The service account token is refreshed when it expires, and pooled
+    connections created with an older token are discarded.
+    """
+
+    def __init__(self, pool_size: int = 2):
         self.scopes = ["openid", "email"]
         self._request = Request()
+        self._credentials = None
+        self._credentials_lock = threading.Lock()
+        # Pairs of (token, connection)
+        self._pool = queue.LifoQueue(maxsize=pool_size)
 
     def _get_token(self) -> Optional[str]:
+        with self._credentials_lock:
+            try:
+                if self._credentials is None:
+                    service_account_dict = config.trino_sf.model_dump()
+                    self._credentials = (
+                        service_account.Credentials.from_service_account_info(
+                            service_account_dict,
+                            scopes=self.scopes,
+                        )
+                    )
+                if not self._credentials.valid:
+                    self._credentials.refresh(self._request)
+                return self._credentials.token
+            except Exception as e:
+                logger.exception(
+                    "Unable to refresh Trino account token: %s", e
+                )
+                return None
+
+    def _connect(self, token: str):
+        return connect(
+            host=config.trino_sf.host,
+            port=config.trino_sf.connection_port,
+            http_scheme=config.trino_sf.http_scheme,
+            auth=trino.auth.JWTAuthentication(token),
+            verify=True,
+            catalog=config.trino_sf.catalog,
+            schema=config.trino_sf.schema,
+        )
+
+    def _checkout(self, token: str):
+        while True:
+            try:
+                conn_token, conn = self._pool.get_nowait()
+            except queue.Empty:
+                break
+            if conn_token == token:
+                return conn
+            # Created with an expired token
+            conn.close()
+
         try:
-            service_account_dict = config.trino_sf.model_dump()
-            creds = service_account.Credentials.from_service_account_info(
-                service_account_dict,
-                scopes=self.scopes,
-            )
-            creds.refresh(self._request)
-            return creds.token
+            return self._connect(token)
         except Exception as e:
-            logger.exception("Unable to refresh Trino account token: %s", e)
+            logger.exception("Unable to connect to Trino: %s", e)
             return None
 
-    def get_cursor(self):
+    def _checkin(self, token: str, conn):
+        try:
+            self._pool.put_nowait((token, conn))
+        except queue.Full:
+            conn.close()
+
+    @contextmanager
+    def cursor(self):
+        """
+        Borrow a connection from the pool and yield a cursor on it
+        """
         token = self._get_token()
-        if not token:
-            return None
+        conn = self._checkout(token) if token else None
+        if conn is None:
+            raise TrinoUnavailable()
+
         try:
-            conn = connect(
-                host=config.trino_sf.host,
-                port=config.trino_sf.connection_port,
-                http_scheme=config.trino_sf.http_scheme,
-                auth=trino.auth.JWTAuthentication(token),
-                verify=True,
-                catalog=config.trino_sf.catalog,
-                schema=config.trino_sf.schema,
-            )
-            return conn.cursor()
-        except Exception as e:
-            logger.exception("Unable to connect to Trino: %s", e)
-            return None
+            yield conn.cursor()
+        except Exception:
+            # Don't put a possibly broken connection back in the pool
+            conn.close()
+            raise
+        else:
+            self._checkin(token, conn)
+
+    def warm_up(self) -> threading.Thread:
+        """
+        Get a token and open a first connection in the background
+        """
+
+        def _warm_up():
+            token = self._get_token()
+            conn = self._checkout(token) if token else None
+            if conn is not None:
+                self._checkin(token, conn)
+
+        thread = threading.Thread(target=_warm_up, daemon=True)
+        thread.start()
+        return thread
 
 
-trino_client = TrinoClient()
-trino_cur = trino_client.get_cursor()
+class CampaignSearchCache:
+    """
+    A TTL cache of campaign search results.
+
+    Searches are substring matches, so the complete results of a search
+    (fewer than CAMPAIGN_SEARCH_LIMIT rows) for "ubu" also answer "ubuntu",
+    which means most keystrokes in the campaign picker never reach Trino.
+    """
+
+    def __init__(self, ttl_seconds: int, maxsize: int = 256):
+        self.ttl_seconds = ttl_seconds
+        self.maxsize = maxsize
+        # query -> (expires, campaigns)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, query: str) -> Optional[List[dict]]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(query)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(query)
+                return entry[1]
+
+            for cached_query, (expires, campaigns) in self._entries.items():
+                if (
+                    expires > now
+                    and cached_query in query
+                    and len(campaigns) < CAMPAIGN_SEARCH_LIMIT
+                ):
+                    return [
+                        campaign
+                        for campaign in campaigns
+                        if query in (campaign["name"] or "")
+                    ]
+
+        return None
+
+    def set(self, query: str, campaigns: List[dict]):
+        now = time.monotonic()
+        with self._lock:
+            for cached_query, (expires, _) in list(self._entries.items()):
+                if expires <= now:
+                    del self._entries[cached_query]
+
+            self._entries[query] = (now + self.ttl_seconds, campaigns)
+            self._entries.move_to_end(query)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+def search_campaigns(query: str) -> List[dict]:
+    """
+    Search Salesforce campaigns whose name contains the query
+    """
+    query = query.strip()
+
+    campaigns = campaign_search_cache.get(query)
+    if campaigns is not None:
+        return campaigns
+
+    safe_query = sanitize_like_input(query)
+
+    # Add '%' wildcards safely
+    like_pattern = f"%{safe_query}%"
+
+    formed_query = (
+        f"SELECT Id, Name FROM Campaign "
+        f"WHERE Name LIKE '{like_pattern}' ESCAPE '\\' "
+        f"LIMIT {CAMPAIGN_SEARCH_LIMIT}"
+    )
+
+    with trino_client.cursor() as trino_cur:
+        trino_cur.execute(formed_query)
+        rows = trino_cur.fetchall()
+
+    campaigns = [{"id": row[0], "name": row[1]} for row in rows]
+    campaign_search_cache.set(query, campaigns)
+    return campaigns
+
+
+# Nothing connects to Trino until the first campaign search
+# (or the background warm-up)
+trino_client = TrinoClient(pool_size=config.trino_sf.pool_size)
+campaign_search_cache = CampaignSearchCache(
+    ttl_seconds=config.trino_sf.campaign_cache_ttl
+)
@@ -0,0 +1,57 @@
+import gzip
+
+import brotli
+
+# Types worth compressing: text, and fonts that aren't compressed
+# already (WOFF and WOFF2 are)
+COMPRESSIBLE_MIMETYPES = {
+    "application/javascript",
+    "application/json",
+    "application/ld+json",
+    "application/manifest+json",
+    "application/vnd.ms-fontobject",
+    "application/x-font-ttf",
+    "application/xml",
+    "font/otf",
+    "font/ttf",
+    "image/svg+xml",
+    "image/x-icon",
+    "image/vnd.microsoft.icon",
+}
+
+# By order of preference, when the client accepts both equally
+ENCODINGS = ["br", "gzip"]
+
+
+def is_compressible(mimetype):
+    """
+    Whether a file of this mimetype should be compressed
+    """
+
+    if not mimetype:
+        return False
+
+    return mimetype.startswith("text/") or mimetype in COMPRESSIBLE_MIMETYPES
+
+
+def best_encoding(accept_encodings):
+    """
+    The best encoding the client accepts (from `request.accept_encodings`),
+    or None
+    """
+
+    return accept_encodings.best_match(ENCODINGS)
+
+
+def compress(data, encoding):
+    """
+    Compress data as much as possible, as the result is cached
+    """
+
+    if isinstance(data, str):
+        data = data.encode()
+
+    if encoding == "br":
+        return brotli.compress(data, quality=11)
+
+    return gzip.compress(data, compresslevel=9, mtime=0)
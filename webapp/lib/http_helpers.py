@@ -1,3 +1,6 @@
+import errno
+
+
 def set_headers_for_type(response, content_type=None):
     """
     Setup all requires response headers appropriate for this file
@@ -10,3 +13,34 @@ def set_headers_for_type(response, content_type=None):
         response.headers["Access-Control-Allow-Origin"] = "*"
 
     return response
+
+
+def os_error_status(error: OSError) -> int:
+    """
+    The HTTP status code matching an OSError
+    """
+
+    if error.errno in [errno.EPERM, errno.EACCES]:
+        return 403  # Forbidden
+    if error.errno in [errno.ENOENT, errno.ENXIO]:
+        return 404  # Not found
+    if error.errno in [errno.EEXIST]:
+        return 409  # Conflict
+    if error.errno in [errno.E2BIG]:
+        return 413  # Request Entity Too Large
+
+    return 500
+
+
+def swift_error_status(error) -> int:
+    """
+    The HTTP status code matching a swiftclient ClientException
+    """
+
+    if error.http_status > 99:
+        return error.http_status
+    elif error.msg[:12] == "Unauthorised":
+        # Special case for swiftclient.exceptions.ClientException
+        return 511
+
+    return 500
@@ -0,0 +1,165 @@
+"""
+Parse the image transformation options of asset URLs (see
+`webapp.lib.processors.ImageProcessor`) into a canonical form, so that
+equivalent URLs share the same cache entries: options are validated,
+unknown options (tokens, cache-busters...) and options with no effect
+are dropped, values are normalized, and the options are sorted.
+
+Transformations can be signed, so that only the URLs generated by the
+holders of the signing key are rendered: the signature is the
+HMAC-SHA256 of "<asset path>?<canonical query>", in the `sig` parameter.
+"""
+
+# Standard library
+import hmac
+from hashlib import sha256
+from typing import Dict, Sequence
+from urllib.parse import parse_qsl, urlencode
+
+FORMATS = {"png": "png", "jpg": "jpg", "jpeg": "jpg", "gif": "gif"}
+# The options of each operation
+OPERATIONS = {
+    "region": ["rect"],
+    "rotate": ["deg", "expand"],
+    "resize": ["w", "h", "max-width", "max-height"],
+}
+SIZE_OPTIONS = ["w", "h", "max-width", "max-height"]
+
+
+class InvalidTransform(ValueError):
+    pass
+
+
+def _integer(name: str, value: str) -> int:
+    try:
+        return int(value)
+    except ValueError:
+        raise InvalidTransform(f"'{name}' must be an integer")
+
+
+def _bucket(size: int, size_buckets: Sequence[int]) -> int:
+    """
+    Round a size down to the nearest allowed size, so it's never larger
+    than requested. Sizes below the smallest one are kept: rounding them
+    up could ask for more than small originals can give.
+    """
+    smaller = [bucket for bucket in size_buckets if bucket <= size]
+    return max(smaller) if smaller else size
+
+
+def canonical_options(
+    args, size_buckets: Sequence[int] = ()
+) -> Dict[str, str]:
+    """
+    The canonical options for the query parameters of a request (a
+    MultiDict, or a dict). Raises InvalidTransform for invalid values.
+    """
+    # Only the first value of each option is used, and empty options
+    # are the same as missing options (except "opt", a flag)
+    values = {}
+    for name in ["fmt", "op", "rect", "deg", "expand", "q", *SIZE_OPTIONS]:
+        value = (args.get(name) or "").strip()
+        if value:
+            values[name] = value
+
+    options = {}
+
+    if "opt" in args:
+        options["opt"] = ""
+
+    if "fmt" in values:
+        fmt = values["fmt"].lower()
+        if fmt not in FORMATS:
+            raise InvalidTransform(f"Cannot convert to '{values['fmt']}'")
+        options["fmt"] = FORMATS[fmt]
+
+    if "op" in values:
+        operations = []
+        for operation in values["op"].split(","):
+            operation = operation.strip()
+            if operation and operation not in operations:
+                if operation not in OPERATIONS:
+                    raise InvalidTransform(f"Unknown operation '{operation}'")
+                operations.append(operation)
+    elif any(name in values for name in SIZE_OPTIONS):
+        # Resizing is the default operation
+        operations = ["resize"]
+    else:
+        operations = []
+
+    if "region" in operations:
+        if "rect" not in values:
+            raise InvalidTransform("'region' needs 'rect'")
+        rect = [_integer("rect", value) for value in values["rect"].split(",")]
+        if len(rect) != 4 or min(rect) < 0:
+            raise InvalidTransform("'rect' must be 4 positive integers")
+        options["rect"] = ",".join(map(str, rect))
+
+    if "rotate" in operations:
+        if "deg" not in values:
+            raise InvalidTransform("'rotate' needs 'deg'")
+        deg = _integer("deg", values["deg"]) % 360
+        if deg:
+            options["deg"] = str(deg)
+            if "expand" in values:
+                options["expand"] = "1"
+        else:
+            # Rotating by 0 degrees does nothing
+            operations.remove("rotate")
+
+    if "resize" in operations:
+        for name in SIZE_OPTIONS:
+            if name not in values:
+                continue
+            size = _integer(name, values[name])
+            if size < 0:
+                raise InvalidTransform(f"'{name}' must be positive")
+            # 0 is the same as not set
+            if size:
+                options[name] = str(_bucket(size, size_buckets))
+
+    if operations and "q" in values:
+        quality = _integer("q", values["q"])
+        if not 1 <= quality <= 100:
+            raise InvalidTransform("'q' must be between 1 and 100")
+        options["q"] = str(quality)
+
+    # Resizing is implied by the size options
+    implied = operations == ["resize"] and any(
+        name in options for name in SIZE_OPTIONS
+    )
+    if operations and not implied:
+        options["op"] = ",".join(operations)
+
+    return dict(sorted(options.items()))
+
+
+def canonical_query(options: Dict[str, str]) -> str:
+    # Commas (in "rect" and "op") are left as they are
+    return urlencode(list(options.items()), safe=",")
+
+
+def parse_query(query_string: str, size_buckets: Sequence[int] = ()) -> str:
+    """
+    The canonical query for a query string
+    """
+    # The first value of each parameter, as in request.args
+    args = dict(parse_qsl(query_string, keep_blank_values=True)[::-1])
+    return canonical_query(canonical_options(args, size_buckets))
+
+
+def sign(file_path: str, query: str, key: str) -> str:
+    """
+    The signature of a canonical query for an asset (128 bits, in hex)
+    """
+    message = f"{file_path}?{query}".encode()
+    return hmac.new(key.encode(), message, sha256).hexdigest()[:32]
+
+
+def signed_query(file_path: str, query: str, key: str) -> str:
+    """
+    A canonical query with its signature (originals aren't signed)
+    """
+    if not query:
+        return query
+    return f"{query}&sig={sign(file_path, query, key)}"
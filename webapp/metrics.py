@@ -0,0 +1,52 @@
+"""
+Application metrics, exported to Prometheus by talisker
+on /_status/metrics
+"""
+
+from talisker.metrics import Counter, Histogram
+
+# Database connection pool
+# ===
+db_pool_checkouts = Counter(
+    name="assets_db_pool_checkouts",
+    documentation="Connections checked out from the database pool",
+)
+db_pool_checkins = Counter(
+    name="assets_db_pool_checkins",
+    documentation="Connections returned to the database pool",
+)
+db_pool_timeouts = Counter(
+    name="assets_db_pool_timeouts",
+    documentation="Timeouts waiting for a database pool connection",
+)
+db_pool_checkout_time = Histogram(
+    name="assets_db_pool_checkout_ms",
+    documentation="Time connections are checked out of the database pool (ms)",
+    buckets=[1, 5, 10, 50, 100, 500, 1000, 5000, 30000],
+)
+
+# Cache (webapp.cache)
+# ===
+cache_hits = Counter(
+    name="assets_cache_hits",
+    documentation="Cached results found, per function and tier",
+    labelnames=["name", "tier"],
+)
+cache_misses = Counter(
+    name="assets_cache_misses",
+    documentation="Results computed because they weren't cached",
+    labelnames=["name"],
+)
+single_flight_waits = Counter(
+    name="assets_single_flight_waits",
+    documentation="Calls that waited for the result of an identical call",
+    labelnames=["name"],
+)
+
+# Image transformations (webapp.rate_limit)
+# ===
+transforms_rejected = Counter(
+    name="assets_transforms_rejected",
+    documentation="Image transformations refused, per reason",
+    labelnames=["reason"],
+)
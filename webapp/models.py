@@ -103,7 +103,7 @@ class Asset(DateTimeMixin):
         secondary=asset_category_association_table,
         back_populates="assets",
     )
-    file_type = Column(String, nullable=True)
+    file_type = Column(String, nullable=True, index=True)
     deprecated = Column(Boolean, nullable=False, default=False)
 
     def as_json(self):
@@ -218,3 +218,36 @@ class Redirect(DateTimeMixin):
             "target_url": self.target_url,
             "permanent": self.permanent,
         }
+
+
+class UploadSession(DateTimeMixin):
+    """
+    An upload in parts, stored as Swift segments under the session id
+    until it's completed
+    """
+
+    __tablename__ = "upload_session"
+
+    id = Column(String, primary_key=True)
+    # The options of the asset to create, as for a single upload
+    options = Column(JSON, nullable=False)
+
+    def as_json(self):
+        return {
+            "upload_id": self.id,
+            "options": self.options,
+            "created": self.created.strftime("%a, %d %b %Y %H:%M:%S"),
+        }
+
+
+# Relationships of assets with objects identified by their name, by field:
+# (model, association table, name column)
+ASSET_NAME_ASSOCIATIONS = {
+    "tags": (Tag, asset_tag_association_table, "tag_name"),
+    "products": (Product, asset_product_association_table, "product_name"),
+    "categories": (
+        Category,
+        asset_category_association_table,
+        "category_name",
+    ),
+}
@@ -0,0 +1,150 @@
+"""
+An in-process cache of small asset files (logos, icons, fonts...) and
+their headers, so the most requested ones don't cost a GET and a HEAD
+from storage on every request.
+
+Cached files are trusted for `ttl` seconds, then revalidated with a HEAD
+request: if the ETag hasn't changed, the file is kept for another
+`ttl`. Only files up to `max_object_bytes` are cached, and the least
+recently used ones are dropped to keep the cache under `max_bytes`.
+"""
+
+# Standard library
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from typing import Optional, Tuple
+
+# Local
+from webapp.config import config
+from webapp.metrics import cache_hits, cache_misses
+from webapp.storage_base import BaseFileManager
+from webapp.swift import file_manager
+
+CachedObject = namedtuple("CachedObject", ["data", "headers", "validated"])
+ObjectCacheInfo = namedtuple(
+    "ObjectCacheInfo", ["hits", "revalidations", "misses", "objects", "bytes"]
+)
+
+
+class ObjectCache:
+    """
+    A byte-bounded LRU of small files, by file path
+    """
+
+    name = "objects"
+
+    def __init__(
+        self,
+        file_manager: BaseFileManager,
+        max_bytes: int,
+        max_object_bytes: int,
+        ttl: float,
+    ):
+        self.file_manager = file_manager
+        self.max_bytes = max_bytes
+        self.max_object_bytes = max_object_bytes
+        self.ttl = ttl
+        # file_path -> CachedObject
+        self._objects = OrderedDict()
+        self._bytes = 0
+        self._stats = {"hits": 0, "revalidations": 0, "misses": 0}
+        self._lock = threading.Lock()
+
+    def fetch(self, file_path: str) -> Tuple[Optional[bytes], Optional[dict]]:
+        """
+        The contents and headers of a file, or (None, None) if it
+        doesn't exist
+        """
+        with self._lock:
+            cached = self._objects.get(file_path)
+            if cached:
+                self._objects.move_to_end(file_path)
+
+        if cached and time.monotonic() - cached.validated < self.ttl:
+            self._count("hits")
+            return cached.data, cached.headers
+
+        headers = self.file_manager.headers(file_path)
+        if not headers:
+            self.discard(file_path)
+            return None, None
+
+        etag = headers.get("etag")
+        if cached and etag and cached.headers.get("etag") == etag:
+            self._count("revalidations")
+            self._store(file_path, cached.data, headers)
+            return cached.data, headers
+
+        self._count("misses")
+
+        data = self.file_manager.fetch(file_path)
+        if data is None:
+            self.discard(file_path)
+            return None, None
+
+        # Without an ETag, it couldn't be revalidated
+        if etag and len(data) <= self.max_object_bytes:
+            self._store(file_path, data, headers)
+        else:
+            self.discard(file_path)
+
+        return data, headers
+
+    def discard(self, file_path: str):
+        with self._lock:
+            cached = self._objects.pop(file_path, None)
+            if cached:
+                self._bytes -= len(cached.data)
+
+    def clear(self):
+        with self._lock:
+            self._objects.clear()
+            self._bytes = 0
+
+    def info(self) -> ObjectCacheInfo:
+        with self._lock:
+            return ObjectCacheInfo(
+                hits=self._stats["hits"],
+                revalidations=self._stats["revalidations"],
+                misses=self._stats["misses"],
+                objects=len(self._objects),
+                bytes=self._bytes,
+            )
+
+    def _count(self, stat: str):
+        with self._lock:
+            self._stats[stat] += 1
+        if stat == "misses":
+            cache_misses.inc(name=self.name)
+        else:
+            cache_hits.inc(
+                name=self.name,
+                tier="revalidated" if stat == "revalidations" else "memory",
+            )
+
+    def _store(self, file_path: str, data: bytes, headers: dict):
+        with self._lock:
+            previous = self._objects.pop(file_path, None)
+            if previous:
+                self._bytes -= len(previous.data)
+
+            self._objects[file_path] = CachedObject(
+                data, headers, time.monotonic()
+            )
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._objects.popitem(last=False)
+                self._bytes -= len(evicted.data)
+
+
+object_cache = (
+    ObjectCache(
+        file_manager,
+        max_bytes=config.object_cache.max_bytes,
+        max_object_bytes=config.object_cache.max_object_bytes,
+        ttl=config.object_cache.ttl,
+    )
+    if config.object_cache.max_bytes
+    else None
+)
@@ -1,3 +1,5 @@
+from distutils.util import strtobool
+
 from flask import request
 from webapp.dataclass import AssetSearchParams
 
@@ -18,3 +20,27 @@ def parse_asset_search_params() -> AssetSearchParams:
         language=request.args.get("language", "").strip(),
         file_types=request.args.getlist("file_types") or [],
     )
+
+
+def parse_asset_search_filters() -> dict:
+    """
+    Parse the search filters of the API (listing, exporting and counting
+    assets), as arguments of `AssetService.search_conditions`.
+    """
+    search_params = parse_asset_search_params()
+    file_type = request.values.get("type", "").strip()
+
+    return {
+        "tag": search_params.tag or search_params.name,
+        "asset_type": search_params.asset_type,
+        "product_types": search_params.product_types,
+        "categories": search_params.categories,
+        "author_email": search_params.author_email,
+        "start_date": search_params.start_date,
+        "end_date": search_params.end_date,
+        "language": search_params.language,
+        "file_types": [file_type] if file_type else [],
+        "include_deprecated": (
+            strtobool(request.values.get("include_deprecated", "false")) == 1
+        ),
+    }
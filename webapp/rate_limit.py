@@ -0,0 +1,201 @@
+"""
+Admission control for image transformations, which use the CPU of the
+workers, so a burst of them doesn't stall the delivery of originals:
+
+- `TokenBucket`: each client can request up to `burst` transformations
+  at once, and then `rate` per second. With Redis, the buckets are
+  shared by all the workers and pods.
+- `ConcurrencyLimit`: at most `slots` transformations are rendered at
+  the same time by all the workers of a host.
+"""
+
+# Standard library
+import fcntl
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional
+
+# Packages
+import redis
+
+# Local
+from webapp.cache import redis_cache
+from webapp.config import config
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "assets:rate-limit:"
+
+
+class TokenBucket:
+    """
+    Token buckets by client, in this process
+    """
+
+    def __init__(self, rate: float, burst: int, max_clients: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        # client -> (tokens, updated)
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, client: str) -> float:
+        """
+        Take a token from the bucket of a client. Returns 0 if there was
+        one, or else the number of seconds until there is one.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+                retry_after = 0
+            else:
+                retry_after = (1 - tokens) / self.rate
+            self._buckets[client] = (tokens, now)
+            # Forget the least recent clients
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return retry_after
+
+
+class RedisTokenBucket(TokenBucket):
+    """
+    Token buckets by client, shared through Redis.
+
+    If Redis fails, each process limits clients on its own for
+    `retry_after` seconds.
+    """
+
+    # Refill and take a token atomically, with the time of the Redis
+    # server (the same for all the pods). Returns the seconds to wait,
+    # as a string as Lua numbers would be truncated to integers.
+    script = """
+    local rate = tonumber(ARGV[1])
+    local burst = tonumber(ARGV[2])
+    local time = redis.call("TIME")
+    local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+    local bucket = redis.call("HMGET", KEYS[1], "tokens", "updated")
+    local tokens = tonumber(bucket[1]) or burst
+    local updated = tonumber(bucket[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+    local retry_after = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+    else
+        retry_after = (1 - tokens) / rate
+    end
+    redis.call("HSET", KEYS[1], "tokens", tokens, "updated", now)
+    redis.call("PEXPIRE", KEYS[1], math.ceil(burst / rate * 1000))
+    return tostring(retry_after)
+    """
+
+    def __init__(
+        self,
+        client: redis.Redis,
+        rate: float,
+        burst: int,
+        retry_after: int = 30,
+    ):
+        super().__init__(rate, burst)
+        self.retry_after = retry_after
+        self._script = client.register_script(self.script)
+        self._down_until = 0
+
+    def take(self, client: str) -> float:
+        if time.monotonic() >= self._down_until:
+            try:
+                return float(
+                    self._script(
+                        keys=[KEY_PREFIX + client],
+                        args=[self.rate, self.burst],
+                    )
+                )
+            except redis.RedisError as error:
+                logger.warning("Unable to rate limit with Redis: %s", error)
+                self._down_until = time.monotonic() + self.retry_after
+
+        return super().take(client)
+
+
+class ConcurrencyLimit:
+    """
+    Up to `slots` holders at the same time, in all the processes of the
+    host. Each slot is a lock file, which is released by the system if
+    its process dies.
+    """
+
+    # How often to look for a free slot (seconds)
+    poll_interval = 0.05
+
+    def __init__(self, directory: str, slots: int):
+        self.directory = directory
+        self.slots = slots
+        os.makedirs(directory, exist_ok=True)
+
+    @contextmanager
+    def hold(self, timeout: float):
+        """
+        Hold a slot, waiting up to `timeout` seconds for one to be free,
+        or raise NoSlotAvailable
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            for index in range(self.slots):
+                lock_file = open(
+                    os.path.join(self.directory, f"slot-{index}.lock"), "a"
+                )
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    lock_file.close()
+                    continue
+
+                # Closing the file releases the lock
+                with lock_file:
+                    yield
+                return
+
+            if time.monotonic() >= deadline:
+                raise NoSlotAvailable()
+            time.sleep(self.poll_interval)
+
+
+def create_rate_limiter() -> Optional[TokenBucket]:
+    if not config.transforms.rate_limit:
+        return None
+    if redis_cache:
+        return RedisTokenBucket(
+            redis_cache.client,
+            config.transforms.rate_limit,
+            config.transforms.rate_limit_burst,
+            retry_after=config.cache.redis_retry_after,
+        )
+    return TokenBucket(
+        config.transforms.rate_limit, config.transforms.rate_limit_burst
+    )
+
+
+def create_transform_slots() -> Optional[ConcurrencyLimit]:
+    if not config.transforms.max_concurrent:
+        return None
+    return ConcurrencyLimit(
+        config.transforms.lock_dir
+        or os.path.join(tempfile.gettempdir(), "assets-transforms"),
+        config.transforms.max_concurrent,
+    )
+
+
+rate_limiter = create_rate_limiter()
+transform_slots = create_transform_slots()
+
+
+class NoSlotAvailable(Exception):
+    pass
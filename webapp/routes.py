@@ -13,7 +13,9 @@ from flask.globals import request
 
 # Local
 from webapp.config import config
+from webapp.database import statement_timeout
 from webapp.param_parser import parse_asset_search_params
+from webapp.serving import get_asset
 from webapp.services import (
     AssetAlreadyExistException,
     AssetNotFound,
@@ -21,27 +23,40 @@ from webapp.services import (
 )
 from webapp.sso import login_required
 from webapp.views import (
+    abort_upload,
+    bulk_delete_assets,
+    bulk_update_assets,
+    complete_upload,
     create_asset,
     create_redirect,
     create_token,
+    create_upload_session,
     delete_asset,
     delete_redirect,
     delete_token,
-    get_asset,
+    export_assets,
     get_asset_info,
     get_assets,
+    get_facets,
     get_redirect,
     get_redirects,
     get_token,
     get_tokens,
+    get_upload_session,
     get_users,
     get_salesforce_campaigns,
     update_asset,
     update_redirect,
+    upload_large_asset,
+    upload_part,
 )
 
 ui_blueprint = Blueprint("ui_blueprint", __name__, url_prefix="/manager")
 api_blueprint = Blueprint("api_blueprint", __name__, url_prefix="/v1")
+# The API endpoints added next to the assets are under "/v1/-/", as
+# asset paths can't start with "-" (see `sanitize_filename`), so they
+# never hide an asset
+ACTIONS_PREFIX = "/-"
 
 with open("form-field-data.yaml") as file:
     form_field_data = yaml.load(file, Loader=yaml.FullLoader)
@@ -92,6 +107,7 @@ ui_blueprint.add_app_template_global(
 
 
 @ui_blueprint.route("/", methods=["GET"])
+@statement_timeout(config.db.search_statement_timeout)
 @login_required
 def home():
     search_params = parse_asset_search_params()
@@ -144,6 +160,19 @@ def home():
             file_types=search_params.file_types,
         )
         is_search = True
+
+    facets = asset_service.facet_counts(
+        tag=search_params.tag,
+        asset_type=search_params.asset_type,
+        product_types=search_params.product_types,
+        categories=search_params.categories,
+        author_email=search_params.author_email,
+        start_date=search_params.start_date,
+        end_date=search_params.end_date,
+        language=search_params.language,
+        include_deprecated=include_deprecated,
+        file_types=search_params.file_types,
+    )
     return flask.render_template(
         "index.html",
         assets=assets,
@@ -160,6 +189,7 @@ def home():
         include_deprecated=include_deprecated,
         query=search_params.tag,
         form_field_data=sorted_data,
+        facets=facets,
         is_search=is_search,
     )
 
@@ -268,7 +298,7 @@ def update():
     file_path = request.args.get("file_path")
 
     if request.method == "GET":
-        asset = asset_service.find_asset(file_path)
+        asset = asset_service.find_asset_read_only(file_path)
         if not asset:
             flask.flash("Asset not found", "negative")
             return flask.render_template(
@@ -325,7 +355,7 @@ def update():
 def details():
     file_path = request.args.get("file_path")
 
-    asset = asset_service.find_asset(file_path)
+    asset = asset_service.find_asset_read_only(file_path)
     if not asset:
         flask.flash("Asset not found", "negative")
 
@@ -344,6 +374,45 @@ def campaign_operations(query):
 # Assets
 api_blueprint.add_url_rule("/", view_func=get_assets)
 api_blueprint.add_url_rule("/", view_func=create_asset, methods=["POST"])
+api_blueprint.add_url_rule(f"{ACTIONS_PREFIX}/facets", view_func=get_facets)
+api_blueprint.add_url_rule(f"{ACTIONS_PREFIX}/export", view_func=export_assets)
+api_blueprint.add_url_rule(
+    f"{ACTIONS_PREFIX}/bulk-update",
+    view_func=bulk_update_assets,
+    methods=["POST"],
+)
+api_blueprint.add_url_rule(
+    f"{ACTIONS_PREFIX}/bulk-delete",
+    view_func=bulk_delete_assets,
+    methods=["POST"],
+)
+api_blueprint.add_url_rule(
+    f"{ACTIONS_PREFIX}/upload", view_func=upload_large_asset, methods=["PUT"]
+)
+api_blueprint.add_url_rule(
+    f"{ACTIONS_PREFIX}/uploads",
+    view_func=create_upload_session,
+    methods=["POST"],
+)
+api_blueprint.add_url_rule(
+    f"{ACTIONS_PREFIX}/uploads/<string:upload_id>",
+    view_func=get_upload_session,
+)
+api_blueprint.add_url_rule(
+    f"{ACTIONS_PREFIX}/uploads/<string:upload_id>",
+    view_func=abort_upload,
+    methods=["DELETE"],
+)
+api_blueprint.add_url_rule(
+    f"{ACTIONS_PREFIX}/uploads/<string:upload_id>/<int:part_number>",
+    view_func=upload_part,
+    methods=["PUT"],
+)
+api_blueprint.add_url_rule(
+    f"{ACTIONS_PREFIX}/uploads/<string:upload_id>/complete",
+    view_func=complete_upload,
+    methods=["POST"],
+)
 api_blueprint.add_url_rule("/<path:file_path>", view_func=get_asset)
 api_blueprint.add_url_rule(
     "/<path:file_path>", view_func=update_asset, methods=["PUT"]
@@ -1,35 +1,161 @@
 # System
 import imghdr
+import logging
+import uuid
 from base64 import b64decode, b64encode
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+from hashlib import sha1
 from io import BytesIO
-from typing import List, Tuple
+from itertools import chain
+from typing import Dict, Iterator, List, Set, Tuple
 
 from PIL import Image as PillowImage
 
 # Packages
-from sqlalchemy import func, or_
+from sqlalchemy import delete, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import selectinload
 
 # Local
 from webapp.config import config
-from webapp.database import db_session
-from webapp.lib.file_helpers import is_svg
+from webapp.database import db_session, read_only
+from webapp.lib.file_helpers import get_mimetype, is_svg
 from webapp.lib.processors import ImageProcessor
 from webapp.lib.url_helpers import sanitize_filename
 from webapp.models import (
+    ASSET_NAME_ASSOCIATIONS,
     Asset,
     Author,
     Product,
     Category,
     Tag,
     Salesforce_Campaign,
+    UploadSession,
+    asset_campaign_association_table,
+    asset_category_association_table,
+    asset_product_association_table,
+    asset_tag_association_table,
 )
-from webapp.swift import file_manager
+from webapp.swift import InvalidSegments, file_manager
 from webapp.utils import lru_cache
 
+logger = logging.getLogger(__name__)
+
+# Bytes read at a time from the body of large uploads
+UPLOAD_CHUNK_SIZE = 65536
+
+# Swift's default limit of segments in a Static Large Object
+MAX_UPLOAD_PARTS = 1000
+
+
+def asset_json_query():
+    """
+    Select the columns of `Asset.as_json`, for `asset_json`
+    """
+
+    def names(table, column):
+        return (
+            select(func.array_agg(column))
+            .where(table.c.asset_id == Asset.id)
+            .scalar_subquery()
+        )
+
+    campaigns = (
+        select(
+            func.json_agg(
+                func.json_build_object(
+                    "name",
+                    Salesforce_Campaign.name,
+                    "id",
+                    Salesforce_Campaign.id,
+                )
+            )
+        )
+        .join_from(asset_campaign_association_table, Salesforce_Campaign)
+        .where(asset_campaign_association_table.c.asset_id == Asset.id)
+        .scalar_subquery()
+    )
+
+    return select(
+        Asset.data,
+        func.to_char(Asset.created, "Dy, DD Mon YYYY HH24:MI:SS"),
+        Asset.file_path,
+        names(
+            asset_tag_association_table,
+            asset_tag_association_table.c.tag_name,
+        ),
+        names(
+            asset_product_association_table,
+            asset_product_association_table.c.product_name,
+        ),
+        names(
+            asset_category_association_table,
+            asset_category_association_table.c.category_name,
+        ),
+        Asset.deprecated,
+        Asset.asset_type,
+        Asset.name,
+        Author.first_name,
+        Author.last_name,
+        Author.email,
+        Asset.google_drive_link,
+        campaigns,
+        Asset.language,
+        Asset.file_type,
+    ).outerjoin(Author, Asset.author_email == Author.email)
+
+
+def asset_json(row) -> dict:
+    """
+    Format a row of `asset_json_query` like `Asset.as_json`
+    """
+    (
+        data,
+        created,
+        file_path,
+        tags,
+        products,
+        categories,
+        deprecated,
+        asset_type,
+        name,
+        first_name,
+        last_name,
+        email,
+        google_drive_link,
+        salesforce_campaigns,
+        language,
+        file_type,
+    ) = row
+
+    return {
+        **data,
+        "created": created,
+        "file_path": file_path,
+        "tags": ", ".join(tags or []),
+        "products": ", ".join(products or []),
+        "categories": ", ".join(categories or []),
+        "deprecated": deprecated,
+        "asset_type": asset_type,
+        "name": name,
+        "author": (
+            {
+                "first_name": first_name,
+                "last_name": last_name,
+                "email": email,
+            }
+            if email
+            else None
+        ),
+        "google_drive_link": google_drive_link,
+        "salesforce_campaigns": salesforce_campaigns or [],
+        "language": language,
+        "file_type": file_type,
+    }
+
 
 class AssetService:
+    @read_only
     def find_all_assets(
         self,
         page: int = 1,
@@ -59,7 +185,7 @@ class AssetService:
         total = base_query.count()
         return assets, total
 
-    def find_assets(
+    def search_conditions(
         self,
         tag: str = "",
         asset_type: str = "",
@@ -69,15 +195,11 @@ class AssetService:
         end_date: str = "",
         language: str = "",
         categories: list = [],
-        page=1,
-        per_page=16,
-        order_by=Asset.created,
-        desc_order=True,
         include_deprecated=False,
-        file_types: list = ["a", "b"],
-    ) -> Tuple[list, int]:
+        file_types: list = [],
+    ) -> list:
         """
-        Find assets that matches the given criterions
+        Return the SQL conditions matching the given search criterions
         """
         conditions = []
         if tag:
@@ -98,12 +220,6 @@ class AssetService:
         if not include_deprecated:
             conditions.append(Asset.deprecated.is_(False))
 
-        if order_by == Asset.file_path:
-            # Example: "86293d6f-FortyCloud.png" -> "FortyCloud.png"
-            order_col = func.split_part(Asset.file_path, "-", 2)
-        else:
-            order_col = order_by
-
         if end_date and start_date:
             conditions.append(Asset.created.between(start_date, end_date))
 
@@ -120,6 +236,48 @@ class AssetService:
         if file_types:
             conditions.append(Asset.file_type.in_(file_types))
 
+        return conditions
+
+    @read_only
+    def find_assets(
+        self,
+        tag: str = "",
+        asset_type: str = "",
+        product_types: list = [],
+        author_email: str = "",
+        start_date: str = "",
+        end_date: str = "",
+        language: str = "",
+        categories: list = [],
+        page=1,
+        per_page=16,
+        order_by=Asset.created,
+        desc_order=True,
+        include_deprecated=False,
+        file_types: list = ["a", "b"],
+    ) -> Tuple[list, int]:
+        """
+        Find assets that matches the given criterions
+        """
+        conditions = self.search_conditions(
+            tag=tag,
+            asset_type=asset_type,
+            product_types=product_types,
+            author_email=author_email,
+            start_date=start_date,
+            end_date=end_date,
+            language=language,
+            categories=categories,
+            include_deprecated=include_deprecated,
+            file_types=file_types,
+        )
+
+        if order_by == Asset.file_path:
+            # Example: "86293d6f-FortyCloud.png" -> "FortyCloud.png"
+            order_col = func.split_part(Asset.file_path, "-", 2)
+        else:
+            order_col = order_by
+
         base_query = db_session.query(Asset).filter(*conditions)
         assets_query = (
             base_query.options(
@@ -139,6 +297,118 @@ class AssetService:
         total = base_query.count()
         return assets, total
 
+    @read_only
+    def find_assets_json(
+        self,
+        page: int = 1,
+        per_page: int = 20,
+        order_by=None,
+        desc_order: bool = True,
+        **search_params,
+    ) -> Tuple[list, int]:
+        """
+        Find assets that match the search, as JSON-ready dicts
+        (the same as `Asset.as_json`).
+
+        Rather than loading Asset objects and their relationships,
+        this selects the columns it needs, with the tags, products,
+        categories and campaigns aggregated and the date formatted by
+        Postgres, in a single query.
+        """
+        conditions = self.search_conditions(**search_params)
+
+        query = (
+            asset_json_query()
+            .where(*conditions)
+            .offset((page - 1) * per_page)
+            .limit(per_page)
+        )
+        if order_by is not None:
+            query = query.order_by(order_by.desc() if desc_order else order_by)
+
+        assets = [asset_json(row) for row in db_session.execute(query)]
+
+        total = db_session.query(Asset).filter(*conditions).count()
+        return assets, total
+
+    @read_only
+    def export_assets_json(
+        self, batch_size: int = 1000, **search_params
+    ) -> Iterator[dict]:
+        """
+        Iterate over all the assets that match the search, as JSON-ready
+        dicts.
+
+        Rows are read through a server-side cursor, `batch_size` at a
+        time, so memory use doesn't grow with the number of assets.
+        The query runs when this is called, rather than when iterating,
+        so it goes to a replica (read_only doesn't apply to generators).
+        """
+        conditions = self.search_conditions(**search_params)
+        query = (
+            asset_json_query()
+            .where(*conditions)
+            .order_by(Asset.id)
+            .execution_options(stream_results=True, yield_per=batch_size)
+        )
+
+        rows = db_session.execute(query)
+        return (asset_json(row) for row in rows)
+
+    @lru_cache(ttl_seconds=300)
+    @read_only
+    def facet_counts(self, top_tags: int = 50, **search_params) -> dict:
+        """
+        Count the assets matching the search, per asset type, file type,
+        category, product and tag (the `top_tags` most used).
+
+        Each facet is counted without its own filter, so the counts show
+        how many assets selecting each value would find.
+
+        This is one grouped query per facet, rather than one query
+        per facet value.
+        """
+
+        def count_by(column, table=None, limit=None, facet_filter=None):
+            conditions = self.search_conditions(
+                **{
+                    name: value
+                    for name, value in search_params.items()
+                    if name != facet_filter
+                }
+            )
+            query = select(column, func.count()).group_by(column)
+            if table is None:
+                query = query.where(*conditions, column.isnot(None))
+            else:
+                matching_ids = select(Asset.id).where(*conditions)
+                query = query.where(table.c.asset_id.in_(matching_ids))
+            if limit:
+                query = query.order_by(func.count().desc()).limit(limit)
+            return dict(db_session.execute(query).all())
+
+        return {
+            "asset_types": count_by(
+                Asset.asset_type, facet_filter="asset_type"
+            ),
+            "file_types": count_by(Asset.file_type, facet_filter="file_types"),
+            "categories": count_by(
+                asset_category_association_table.c.category_name,
+                asset_category_association_table,
+                facet_filter="categories",
+            ),
+            "products": count_by(
+                asset_product_association_table.c.product_name,
+                asset_product_association_table,
+                facet_filter="product_types",
+            ),
+            "tags": count_by(
+                asset_tag_association_table.c.tag_name,
+                asset_tag_association_table,
+                limit=top_tags,
+            ),
+        }
+
     def find_asset(self, file_path):
         """
         Find an asset that has that matches the exact give file_path or None
@@ -149,6 +419,14 @@ class AssetService:
             .one_or_none()
         )
 
+    @read_only
+    def find_asset_read_only(self, file_path):
+        """
+        Find an asset to display it, from a read replica when there are
+        any. Use `find_asset` before writing anything.
+        """
+        return self.find_asset(file_path)
+
     def create_asset(
         self,
         file_content,
@@ -279,8 +557,268 @@ class AssetService:
             db_session.rollback()
             raise
         else:
+            # It may be the first asset with this extension
+            self.available_extensions.invalidate()
+            return asset
+
+    def create_large_asset(
+        self,
+        stream,
+        friendly_name: str,
+        name: str = None,
+        url_path: str = None,
+        tags: List[str] = [],
+        products: List[str] = [],
+        categories: List[str] = [],
+        asset_type: str = "image",
+        author: dict = None,
+        language: str = "English",
+        deprecated: bool = False,
+    ):
+        """
+        Create an asset from a stream of any size, stored in Swift as
+        segments of a Static Large Object rather than read into memory.
+        It isn't optimized.
+        """
+        if config.read_only_mode:
+            raise ReadOnlyMode()
+
+        friendly_name = sanitize_filename(friendly_name)
+        url_path = sanitize_filename(url_path)
+
+        if url_path and self.find_asset(url_path):
+            raise AssetAlreadyExistException(url_path)
+
+        chunks = iter(lambda: stream.read(UPLOAD_CHUNK_SIZE), b"")
+        head = next(chunks, b"")
+        if not head:
+            raise ValueError("The body is empty")
+        data = {
+            "image": imghdr.what(None, h=head) is not None or is_svg(head),
+            "optimized": False,
+            "large_object": True,
+            "width": None,
+            "height": None,
+        }
+
+        manifest, file_hash = file_manager.upload_segments(
+            chain([head], chunks), config.swift.segment_size
+        )
+        if not url_path:
+            url_path = file_hash[:8]
+            if friendly_name:
+                url_path += "-" + friendly_name
+
+        try:
+            return self._create_large_asset(
+                manifest,
+                url_path,
+                data,
+                name=name,
+                tags=tags,
+                products=products,
+                categories=categories,
+                asset_type=asset_type,
+                author=author,
+                language=language,
+                deprecated=deprecated,
+            )
+        except AssetAlreadyExistException:
+            file_manager.delete_segments(manifest)
+            raise
+
+    def _create_large_asset(
+        self,
+        manifest: List[dict],
+        url_path: str,
+        data: dict,
+        upload_session: UploadSession = None,
+        name: str = None,
+        tags: List[str] = [],
+        products: List[str] = [],
+        categories: List[str] = [],
+        asset_type: str = "image",
+        author: dict = None,
+        language: str = "English",
+        deprecated: bool = False,
+    ):
+        """
+        Store the manifest of a large asset, and the asset itself
+        (deleting the upload session it came from, if any)
+        """
+        try:
+            if self.find_asset(url_path):
+                raise AssetAlreadyExistException(url_path)
+
+            file_manager.create_large(manifest, url_path)
+            asset = Asset(
+                file_path=url_path,
+                name=name,
+                data=data,
+                tags=self.create_tags_if_not_exist(tags),
+                created=datetime.now(tz=timezone.utc),
+                products=self.create_products_if_not_exists(products),
+                categories=self.create_categories_if_not_exists(categories),
+                asset_type=asset_type,
+                author=self.create_author_if_not_exist(author),
+                language=language,
+                deprecated=deprecated,
+                file_type=url_path.split(".")[-1].lower(),
+            )
+            db_session.add(asset)
+            if upload_session:
+                db_session.delete(upload_session)
+            db_session.commit()
+        except Exception:
+            db_session.rollback()
+            raise
+        else:
+            self.available_extensions.invalidate()
             return asset
 
+    def create_upload_session(
+        self, friendly_name: str, url_path: str = None, **options
+    ) -> UploadSession:
+        """
+        Start an upload in parts. The options are those of
+        `create_large_asset`, for the asset created on completion.
+        """
+        if config.read_only_mode:
+            raise ReadOnlyMode()
+
+        url_path = sanitize_filename(url_path)
+        if url_path and self.find_asset(url_path):
+            raise AssetAlreadyExistException(url_path)
+
+        upload_session = UploadSession(
+            id=uuid.uuid4().hex,
+            options={
+                "friendly_name": sanitize_filename(friendly_name),
+                "url_path": url_path,
+                **options,
+            },
+        )
+        try:
+            db_session.add(upload_session)
+            db_session.commit()
+        except Exception:
+            db_session.rollback()
+            raise
+
+        return upload_session
+
+    def find_upload_session(self, upload_id: str) -> UploadSession:
+        upload_session = db_session.get(UploadSession, upload_id)
+        if not upload_session:
+            raise UploadSessionNotFound(upload_id)
+        return upload_session
+
+    def upload_part(self, upload_id: str, part_number: int, stream) -> str:
+        """
+        Store a part of an upload, and return its ETag.
+        Uploading a part again replaces it.
+        """
+        if config.read_only_mode:
+            raise ReadOnlyMode()
+
+        if not 1 <= part_number <= MAX_UPLOAD_PARTS:
+            raise ValueError(f"Part numbers go from 1 to {MAX_UPLOAD_PARTS}")
+
+        upload_session = self.find_upload_session(upload_id)
+        return file_manager.put_segment(
+            f"{upload_session.id}/{part_number:08d}",
+            iter(lambda: stream.read(UPLOAD_CHUNK_SIZE), b""),
+        )
+
+    def complete_upload(self, upload_id: str, parts: List[dict]):
+        """
+        Create the asset from the uploaded parts, given as
+        {"part_number": ..., "etag": ...}, in any order
+        """
+        if config.read_only_mode:
+            raise ReadOnlyMode()
+
+        upload_session = self.find_upload_session(upload_id)
+
+        etags = {}
+        for part in parts:
+            try:
+                part_number = int(part["part_number"])
+                etags[part_number] = str(part["etag"])
+            except (KeyError, TypeError, ValueError):
+                raise ValueError("Parts need a part_number and an etag")
+        if not etags or len(etags) != len(parts):
+            raise ValueError("Each part should be listed once")
+
+        manifest = [
+            file_manager.manifest_entry(
+                f"{upload_session.id}/{part_number:08d}", etag
+            )
+            for part_number, etag in sorted(etags.items())
+        ]
+
+        options = dict(upload_session.options)
+        friendly_name = options.pop("friendly_name", None)
+        url_path = options.pop("url_path", None)
+        if not url_path:
+            # The file isn't read as a whole, so its path comes from the
+            # hashes of its parts instead
+            url_path = sha1(
+                "".join(entry["etag"] for entry in manifest).encode()
+            ).hexdigest()[:8]
+            if friendly_name:
+                url_path += "-" + friendly_name
+
+        data = {
+            "image": get_mimetype(url_path).startswith("image/"),
+            "optimized": False,
+            "large_object": True,
+            "width": None,
+            "height": None,
+        }
+
+        try:
+            return self._create_large_asset(
+                manifest,
+                url_path,
+                data,
+                upload_session=upload_session,
+                **options,
+            )
+        except AssetAlreadyExistException:
+            self.abort_upload(upload_id)
+            raise
+        except InvalidSegments as error:
+            raise ValueError(f"The parts don't match the upload: {error}")
+
+    def abort_upload(self, upload_id: str):
+        """
+        Delete an upload session and its parts
+        """
+        upload_session = self.find_upload_session(upload_id)
+        file_manager.delete_segments_with_prefix(f"{upload_session.id}/")
+
+        try:
+            db_session.delete(upload_session)
+            db_session.commit()
+        except Exception:
+            db_session.rollback()
+            raise
+
+    def delete_expired_uploads(self, max_age: timedelta) -> int:
+        """
+        Abort the upload sessions started more than `max_age` ago,
+        and return how many there were
+        """
+        upload_ids = db_session.scalars(
+            select(UploadSession.id).where(
+                UploadSession.created < datetime.now() - max_age
+            )
+        ).all()
+        for upload_id in upload_ids:
+            self.abort_upload(upload_id)
+        return len(upload_ids)
+
     def create_campaigns_if_not_exist(
         self,
         salesforce_campaigns: List[dict | None],
@@ -485,22 +1023,204 @@ class AssetService:
         db_session.commit()
         return asset
 
+    def bulk_update_assets(
+        self,
+        file_paths: List[str] = [],
+        search: dict = {},
+        add: Dict[str, List[str]] = {},
+        remove: Dict[str, List[str]] = {},
+        deprecated: bool = None,
+    ) -> Dict[str, str]:
+        """
+        Add and remove tags, products and categories of, and deprecate,
+        the given assets (or the assets matching the search), in one
+        transaction.
+
+        `add` and `remove` are keyed by field ("tags", "products" or
+        "categories"). Returns the outcome for each asset:
+        "updated", or "not_found" for the given file paths that aren't
+        assets.
+        """
+        if config.read_only_mode:
+            raise ReadOnlyMode()
+
+        if file_paths:
+            query = select(Asset.id, Asset.file_path).where(
+                Asset.file_path.in_(file_paths)
+            )
+        elif search:
+            # Deprecated assets are left out by default, which shouldn't
+            # count as a filter: an empty search would update every asset
+            if not self.search_conditions(
+                **{**search, "include_deprecated": True}
+            ):
+                raise ValueError("The search doesn't filter the assets")
+            query = select(Asset.id, Asset.file_path).where(
+                *self.search_conditions(**search)
+            )
+        else:
+            raise ValueError("Either file paths or a search are required")
+
+        try:
+            assets = db_session.execute(query).all()
+            asset_ids = [asset_id for asset_id, _ in assets]
+
+            for field, association in ASSET_NAME_ASSOCIATIONS.items():
+                model, table, column = association
+                names_to_add = self._clean_names(field, add.get(field, []))
+                names_to_remove = self._clean_names(
+                    field, remove.get(field, [])
+                )
+
+                if names_to_remove and asset_ids:
+                    db_session.execute(
+                        delete(table).where(
+                            table.c.asset_id.in_(asset_ids),
+                            table.c[column].in_(names_to_remove),
+                        )
+                    )
+
+                if names_to_add and asset_ids:
+                    db_session.execute(
+                        pg_insert(model).on_conflict_do_nothing(),
+                        [{"name": name} for name in names_to_add],
+                    )
+                    db_session.execute(
+                        pg_insert(table).on_conflict_do_nothing(),
+                        [
+                            {"asset_id": asset_id, column: name}
+                            for asset_id in asset_ids
+                            for name in names_to_add
+                        ],
+                    )
+
+            values = {"updated": datetime.now()}
+            if deprecated is not None:
+                values["deprecated"] = deprecated
+            if asset_ids:
+                db_session.execute(
+                    update(Asset)
+                    .where(Asset.id.in_(asset_ids))
+                    .values(**values)
+                )
+
+            db_session.commit()
+        except Exception:
+            db_session.rollback()
+            raise
+
+        results = {file_path: "not_found" for file_path in file_paths}
+        for _, file_path in assets:
+            results[file_path] = "updated"
+        return results
+
+    def _clean_names(self, field: str, names: List[str]) -> List[str]:
+        if field == "tags":
+            names = [self.normalize_tag_name(name) for name in names]
+        return sorted({name.strip() for name in names if name.strip()})
+
+    def delete_assets(self, file_paths: List[str]) -> Dict[str, str]:
+        """
+        Delete many assets: their rows in one transaction, then their
+        files in bulk.
+
+        Returns the outcome for each file path: "deleted", "not_found",
+        or "orphaned" if the asset was deleted but its file couldn't be
+        (it can be deleted again with `flask database delete-files`).
+        """
+        if config.read_only_mode:
+            raise ReadOnlyMode()
+
+        assets = {}
+        large_objects = []
+        for file_path, asset_id, data in db_session.execute(
+            select(Asset.file_path, Asset.id, Asset.data).where(
+                Asset.file_path.in_(file_paths)
+            )
+        ):
+            assets[file_path] = asset_id
+            if data and data.get("large_object"):
+                large_objects.append(file_path)
+
+        # The rows go first: a file left behind is only wasted space,
+        # while an asset without its file would be served as an error
+        try:
+            for table in [
+                asset_tag_association_table,
+                asset_product_association_table,
+                asset_category_association_table,
+                asset_campaign_association_table,
+            ]:
+                db_session.execute(
+                    delete(table).where(
+                        table.c.asset_id.in_(list(assets.values()))
+                    )
+                )
+            db_session.execute(
+                delete(Asset).where(Asset.id.in_(list(assets.values())))
+            )
+            db_session.commit()
+        except Exception:
+            db_session.rollback()
+            raise
+
+        self.available_extensions.invalidate()
+
+        orphaned = self.delete_files(
+            [path for path in assets if path not in large_objects],
+            large_objects,
+        )
+
+        results = {}
+        for file_path in file_paths:
+            if file_path not in assets:
+                results[file_path] = "not_found"
+            elif file_path in orphaned:
+                results[file_path] = "orphaned"
+            else:
+                results[file_path] = "deleted"
+        return results
+
+    def delete_files(
+        self, file_paths: List[str], large_objects: List[str] = []
+    ) -> Set[str]:
+        """
+        Delete files from the storage, and return the file paths
+        that couldn't be deleted
+        """
+        try:
+            failed = set(file_manager.delete_many(file_paths))
+        except Exception:
+            # Whatever the storage driver
+            logger.exception("Unable to delete the files")
+            failed = set(file_paths)
+
+        # Bulk-delete would leave the segments of large objects behind
+        for file_path in large_objects:
+            try:
+                file_manager.delete(file_path, large_object=True)
+            except Exception:
+                failed.add(file_path)
+
+        if failed:
+            logger.warning("Files that couldn't be deleted: %s", failed)
+        return failed
+
     @lru_cache(ttl_seconds=3600)
+    @read_only
     def available_extensions(self):
         """
         Return a list of available extensions
         """
-        # get distinct file_path only the 7 last characters
-        files = (
-            db_session.query(Asset.file_path).distinct(Asset.file_path).all()
+        # A grouped query on the indexed file_type column, so Postgres
+        # only reads the index rather than sending every file path over
+        file_types = (
+            db_session.query(Asset.file_type)
+            .filter(func.length(Asset.file_type).between(3, 6))
+            .group_by(Asset.file_type)
+            .all()
         )
-        extensions = set()
-        for file in files:
-            file_path = file[0]
-            extension = file_path.split(".")[-1].lower()
-            if len(extension) < 7 and len(extension) > 2:
-                extensions.add(extension)
-        return extensions
+        return {file_type for (file_type,) in file_types}
 
     @staticmethod
     def order_by_fields():
@@ -525,9 +1245,15 @@ class AssetNotFound(Exception):
     """
 
 
+class UploadSessionNotFound(Exception):
+    """
+    Raised when the requested upload session wasn't found
+    """
+
+
 class ReadOnlyMode(Exception):
     """
-    Raised when the requested asset to create already exists
+    Raised when changing assets while the manager is in read-only mode
     """
 
 
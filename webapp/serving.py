@@ -0,0 +1,425 @@
+# Standard library
+import hmac
+import math
+import os
+import re
+from contextlib import nullcontext
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from hashlib import sha1
+from typing import Optional, Tuple
+from urllib.parse import urlparse
+
+# Packages
+from flask import (
+    Response,
+    abort,
+    jsonify,
+    make_response,
+    redirect,
+    request,
+    send_file,
+)
+from werkzeug.exceptions import ServiceUnavailable, TooManyRequests
+
+# Local
+from webapp.auth import authenticate
+from webapp.cache import MISSING, BytesCache, LocalCache, SingleFlight
+from webapp.config import config
+from webapp.database import db_session, read_only
+from webapp.decorators import get_token_from_request
+from webapp.disk_cache import disk_cache
+from webapp.lib.compression import best_encoding, compress, is_compressible
+from webapp.lib.file_helpers import get_mimetype, remove_filename_hash
+from webapp.lib.http_helpers import set_headers_for_type
+from webapp.lib.processors import ImageProcessor
+from webapp.lib.transforms import (
+    InvalidTransform,
+    canonical_options,
+    canonical_query,
+    parse_query,
+    sign,
+)
+from webapp.metrics import cache_hits, cache_misses, transforms_rejected
+from webapp.object_cache import object_cache
+from webapp.models import Redirect
+from webapp.rate_limit import NoSlotAvailable, rate_limiter, transform_slots
+from webapp.swift import file_manager
+from webapp.utils import lru_cache
+
+# Fetches and image processing in progress in this process
+in_flight = SingleFlight("assets")
+
+# Compressed variants of text assets, by version and transformation
+compressed_assets = BytesCache(config.compression.cache_max_bytes)
+
+# Storage headers of the assets served from the disk cache, by file path
+disk_cache_headers = LocalCache(maxsize=10000)
+
+# Transformations served without a signature
+unsigned_presets = {
+    parse_query(preset, config.transforms.size_buckets)
+    for preset in config.transforms.unsigned_presets
+}
+
+
+@read_only
+def find_redirect(redirect_path: str):
+    return (
+        db_session.query(Redirect)
+        .filter(Redirect.redirect_path == redirect_path)
+        .one_or_none()
+    )
+
+
+def get_asset(file_path: str):
+    """
+    Get the asset content.
+    """
+
+    request_url = urlparse(request.path)
+    # remove multiple slashes
+    request_path = re.sub("//+", "/", request_url.path)
+    # remove /v1 prefix
+    request_path = re.sub(r"^\/v1", "", request_path)
+    # remove the / from the beginning
+    request_path = request_path.lstrip("/")
+
+    redirect_record = find_redirect(request_path)
+
+    if redirect_record:
+        # Cache permanent redirect longtime. Temporary, not so much.
+        max_age = (
+            "max-age=31556926" if redirect_record.permanent else "max-age=60"
+        )
+        target_url = redirect_record.target_url + "?" + request_url.query
+        response = redirect(target_url)
+        response.headers["Cache-Control"] = max_age
+
+        return set_headers_for_type(response, get_mimetype(request_path))
+
+    try:
+        options = canonical_options(
+            request.args, config.transforms.size_buckets
+        )
+    except InvalidTransform as error:
+        abort(400, str(error))
+
+    # Equivalent URLs (with other parameters, or in another order) are
+    # pointed at the same canonical URL, to share cache entries
+    query = url_query = canonical_query(options)
+
+    # Only render signed transformations, if there's a signing key
+    signing_key = config.transforms.signing_key.get_secret_value()
+    if signing_key and query and query not in unsigned_presets:
+        signature = sign(file_path, query, signing_key)
+        if not hmac.compare_digest(request.args.get("sig", ""), signature):
+            abort(403, "Transformations need a valid signature")
+        url_query = f"{query}&sig={signature}"
+
+    canonical_url = request.path + (f"?{url_query}" if url_query else "")
+    is_canonical = url_query == request.query_string.decode()
+
+    if not is_canonical and config.transforms.redirect_to_canonical:
+        response = redirect(canonical_url, code=301)
+        response.headers["Cache-Control"] = "max-age=31556926"
+        return response
+
+    # Limit the transformations each client can request
+    if options and rate_limiter:
+        retry_after = rate_limiter.take(client_key())
+        if retry_after:
+            transforms_rejected.inc(reason="rate_limit")
+            raise TooManyRequests(
+                "Too many image transformations, slow down",
+                retry_after=math.ceil(retry_after),
+            )
+
+    response = make_response(serve_asset(file_path, options, query))
+    if not is_canonical:
+        response.headers["Content-Location"] = canonical_url
+
+    return response
+
+
+def serve_asset(file_path: str, options: dict, query: str):
+    """
+    Serve an asset, transformed with the canonical `options` (encoded
+    as `query`)
+    """
+
+    # Compressible originals are sent compressed from memory rather
+    # than sent from disk
+    encoding = None
+    if config.compression.enabled:
+        encoding = best_encoding(request.accept_encodings)
+    send_from_disk = not options and not (
+        encoding and is_compressible(get_mimetype(file_path))
+    )
+
+    # Serve originals stored locally with sendfile, without reading them
+    local_path = file_manager.local_path(file_path)
+    if local_path and send_from_disk:
+        return send_original(file_path, local_path)
+
+    if disk_cache and send_from_disk:
+        response = send_cached_original(file_path)
+        if response:
+            return response
+
+    # Concurrent requests for the same asset share one fetch
+    asset_data, asset_headers = in_flight.do(
+        f"fetch:{file_path}", fetch_asset, file_path
+    )
+    if not asset_data:
+        abort(404, f"No asset found for '{file_path}'")
+
+    def make_datetime(x):
+        return datetime.strptime(x, "%a, %d %b %Y %H:%M:%S %Z")
+
+    last_modified = asset_headers["last-modified"]
+    if_modified_since = request.headers.get(
+        "HTTP_IF_MODIFIED_SINCE", "Mon, 1 Jan 1980 00:00:00 GMT"
+    )
+
+    if make_datetime(last_modified) <= make_datetime(if_modified_since):
+        return jsonify({}), 304
+
+    # Run image processor, once for concurrent identical requests
+    asset_data, converted_type = in_flight.do(
+        f"process:{file_path}?{query}",
+        process_asset,
+        asset_data,
+        options,
+    )
+
+    # Get a sensible filename, including a converted extension
+    filename = remove_filename_hash(file_path)
+    if converted_type:
+        filename = f"{filename}.{converted_type}"
+
+    mimetype = get_mimetype(filename)
+    if encoding and is_compressible(mimetype):
+        key = (
+            f"{file_path}?{query}:{asset_headers.get('etag')}:"
+            f"{last_modified}:{encoding}"
+        )
+        asset_data = compressed_assets.get(key) or in_flight.do(
+            f"compress:{key}", compress_asset, key, asset_data, encoding
+        )
+    else:
+        encoding = None
+
+    # Start response, guessing mime type
+    response = Response(asset_data, content_type=mimetype)
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    if is_compressible(mimetype):
+        response.vary.add("Accept-Encoding")
+
+    # Set download filename
+    response.headers["Content-Disposition"] = f"filename={filename}"
+    # Cache all genuine assets forever
+    response.headers["Cache-Control"] = "max-age=31556926"
+    response.headers["Last-Modified"] = last_modified
+
+    # Set headers base on mime type
+    response = set_headers_for_type(response)
+
+    return response
+
+
+def fetch_asset(file_path: str) -> Tuple[Optional[bytes], Optional[dict]]:
+    """
+    The contents and headers of an asset, or (None, None)
+    """
+    if object_cache:
+        return object_cache.fetch(file_path)
+
+    asset_data = file_manager.fetch(file_path)
+    if asset_data is None:
+        return None, None
+    return asset_data, file_manager.headers(file_path)
+
+
+def process_asset(asset_data: bytes, options) -> Tuple[bytes, Optional[str]]:
+    """
+    Run the image processor, and return the processed data and the
+    converted type, if any
+    """
+    # Leave workers for originals, by limiting concurrent transformations
+    slot = nullcontext()
+    if options and transform_slots:
+        slot = transform_slots.hold(config.transforms.queue_timeout)
+
+    try:
+        with slot:
+            image = ImageProcessor(asset_data, options)
+            converted_type = image.process()
+    except NoSlotAvailable:
+        transforms_rejected.inc(reason="busy")
+        raise ServiceUnavailable(
+            "Too many image transformations in progress", retry_after=1
+        )
+
+    return image.data, converted_type
+
+
+def client_key() -> str:
+    """
+    The client of the request, for rate limiting: its API token if it
+    has a valid one, or else its IP address
+    """
+    token = get_token_from_request(request)
+    if token and is_valid_token(token):
+        return "token:" + sha1(token.encode()).hexdigest()
+
+    # Behind proxies, the client is the address they got the request from
+    addresses = [
+        address.strip()
+        for address in request.headers.get("X-Forwarded-For", "").split(",")
+        if address.strip()
+    ] + [request.remote_addr]
+    trusted_proxies = config.transforms.trusted_proxies
+    return "ip:" + addresses[max(0, len(addresses) - 1 - trusted_proxies)]
+
+
+@lru_cache(ttl_seconds=60, maxsize=1024)
+def is_valid_token(token: str) -> bool:
+    """
+    Whether a token is valid, cached so that clients sending the same
+    token (valid or not) with every transformation don't each make a
+    database query. A deleted token is still a rate limiting key for up
+    to a minute, which is harmless.
+    """
+    return authenticate(token)
+
+
+def compress_asset(key: str, asset_data: bytes, encoding: str) -> bytes:
+    compressed_data = compress(asset_data, encoding)
+    compressed_assets.set(key, compressed_data)
+    return compressed_data
+
+
+def original_headers(file_path: str, refresh: bool = False) -> dict:
+    """
+    The storage headers of an original asset served from the disk cache,
+    trusted for `config.disk_cache.headers_ttl` seconds, so hits don't
+    need a HEAD request to the storage
+    """
+    asset_headers = MISSING if refresh else disk_cache_headers.get(file_path)
+    if asset_headers is MISSING:
+        asset_headers = file_manager.headers(file_path)
+        if not asset_headers:
+            disk_cache_headers.delete(file_path)
+            abort(404, f"No asset found for '{file_path}'")
+        disk_cache_headers.set(
+            file_path, asset_headers, config.disk_cache.headers_ttl
+        )
+    return asset_headers
+
+
+def send_cached_original(file_path: str) -> Optional[Response]:
+    """
+    Serve an original asset from the disk cache, caching it first if
+    needed. Assets too large to be cached are left to `get_asset`.
+    """
+    asset_headers = original_headers(file_path)
+    etag = asset_headers.get("etag", "").strip('"')
+    cached_path = disk_cache.get(etag) if etag else None
+
+    if cached_path:
+        cache_hits.inc(name="originals", tier="disk")
+    else:
+        # The file is about to be fetched, so make sure it's cached
+        # under its current ETag
+        asset_headers = original_headers(file_path, refresh=True)
+        etag = asset_headers.get("etag", "").strip('"')
+        size = int(asset_headers.get("content-length") or 0)
+        if not etag or size > config.disk_cache.max_object_bytes:
+            return None
+
+        cache_misses.inc(name="originals")
+        cached_path = in_flight.do(
+            f"disk_cache:{etag}", cache_original, file_path, etag
+        )
+        if not cached_path:
+            abort(404, f"No asset found for '{file_path}'")
+
+    try:
+        return send_original(
+            file_path,
+            cached_path,
+            etag=etag,
+            last_modified=parsedate_to_datetime(
+                asset_headers["last-modified"]
+            ),
+        )
+    except FileNotFoundError:
+        # Evicted by another process in the meantime
+        return None
+
+
+def cache_original(file_path: str, etag: str) -> Optional[str]:
+    """
+    Fetch an asset into the disk cache, once for all the worker processes
+    """
+    with disk_cache.lock(etag, timeout=config.cache.lock_timeout):
+        # Another process may have cached it while we were waiting
+        cached_path = disk_cache.get(etag)
+        if cached_path:
+            return cached_path
+
+        asset_data = file_manager.fetch(file_path)
+        if asset_data is None:
+            return None
+        return disk_cache.put(etag, asset_data)
+
+
+def send_original(
+    file_path: str,
+    path: str,
+    etag: Optional[str] = None,
+    last_modified: Optional[datetime] = None,
+):
+    """
+    Serve an original asset from the local filesystem: the WSGI server's
+    file wrapper sends it with sendfile, or the web server does for
+    files in the disk cache (with X-Accel-Redirect, if configured).
+    Conditional requests are answered from the ETag and modification
+    time.
+    """
+    filename = remove_filename_hash(file_path)
+    accel_redirect_prefix = config.disk_cache.accel_redirect_prefix
+
+    if (
+        accel_redirect_prefix
+        and disk_cache
+        and path.startswith(disk_cache.directory + os.sep)
+    ):
+        response = Response(content_type=get_mimetype(filename))
+        response.headers["X-Accel-Redirect"] = (
+            accel_redirect_prefix.rstrip("/")
+            + "/"
+            + os.path.relpath(path, disk_cache.directory)
+        )
+        if etag:
+            response.set_etag(etag)
+        response.last_modified = last_modified
+        response.cache_control.max_age = 31556926
+        response.make_conditional(request)
+    else:
+        response = send_file(
+            path,
+            mimetype=get_mimetype(filename),
+            conditional=True,
+            etag=etag or False,
+            last_modified=last_modified,
+            max_age=31556926,
+        )
+
+    response.headers["Content-Disposition"] = f"filename={filename}"
+    if is_compressible(response.mimetype):
+        response.vary.add("Accept-Encoding")
+
+    return set_headers_for_type(response)
@@ -0,0 +1,404 @@
+"""
+Storage drivers other than Swift, implementing the same
+`webapp.storage_base.BaseFileManager`, selected with FLASK_STORAGE_DRIVER:
+
+- `local`: files in a directory, e.g. to run or benchmark the app
+  without Swift. They can be served with sendfile.
+- `s3`: an S3-compatible bucket
+
+Both mirror the Swift containers: asset files are stored under
+`assets/`, and the segments of large objects under `assets_segments/`.
+Large objects are assembled from their segments when they're created
+(by concatenation, or with a multipart upload), rather than by Swift
+when they're read.
+"""
+
+# Standard library
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
+from hashlib import md5
+from typing import List, Optional
+
+# Packages
+import boto3
+from botocore.config import Config as BotoConfig
+from botocore.exceptions import ClientError
+
+# Local
+from webapp.config import config
+from webapp.lib.url_helpers import normalize
+from webapp.storage_base import BaseFileManager, InvalidSegments
+from webapp.utils import LazyClient
+
+# Bytes read or written at a time
+COPY_CHUNK_SIZE = 1048576
+
+
+def iter_chunks(contents):
+    """
+    Iterate over file contents given as bytes, a file object or an
+    iterator of chunks
+    """
+    if isinstance(contents, (bytes, bytearray)):
+        yield contents
+    elif isinstance(contents, str):
+        yield contents.encode()
+    elif hasattr(contents, "read"):
+        yield from iter(lambda: contents.read(COPY_CHUNK_SIZE), b"")
+    else:
+        yield from contents
+
+
+class LocalFileManager(BaseFileManager):
+    """
+    Store asset files in a local directory
+    """
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+
+    def _path(self, file_path: str, container: str = None) -> str:
+        name = normalize(file_path)
+        # Names are quoted so they can't contain "/", but could still
+        # point at a directory
+        if name in ("", ".", ".."):
+            raise FileNotFoundError(file_path)
+        return os.path.join(self.root, container or self.container_name, name)
+
+    def _write(self, path: str, contents) -> str:
+        """
+        Write a file atomically, and return the MD5 of its contents
+        (the ETag Swift and S3 would give it)
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        file_hash = md5()
+        with tempfile.NamedTemporaryFile(
+            dir=os.path.dirname(path), delete=False
+        ) as tmp_file:
+            try:
+                for chunk in iter_chunks(contents):
+                    file_hash.update(chunk)
+                    tmp_file.write(chunk)
+            except Exception:
+                os.remove(tmp_file.name)
+                raise
+        os.replace(tmp_file.name, path)
+        return file_hash.hexdigest()
+
+    def create(self, file_data, file_path):
+        self._write(self._path(file_path), file_data)
+
+    def put_segment(self, segment_name: str, contents) -> str:
+        return self._write(
+            self._path(segment_name, self.segments_container_name),
+            contents,
+        )
+
+    def create_large(self, manifest: List[dict], file_path: str):
+        """
+        Concatenate the segments into the file, checking them against
+        the manifest, then delete them
+        """
+        segment_paths = [
+            self._path(
+                entry["path"].split("/", 2)[2], self.segments_container_name
+            )
+            for entry in manifest
+        ]
+
+        def chunks():
+            for entry, segment_path in zip(manifest, segment_paths):
+                segment_hash = md5()
+                size = 0
+                try:
+                    with open(segment_path, "rb") as segment_file:
+                        for chunk in iter_chunks(segment_file):
+                            segment_hash.update(chunk)
+                            size += len(chunk)
+                            yield chunk
+                except FileNotFoundError:
+                    raise InvalidSegments(f"Missing {entry['path']}")
+
+                if entry.get("etag") not in (None, segment_hash.hexdigest()):
+                    raise InvalidSegments(f"Wrong etag for {entry['path']}")
+                if entry.get("size_bytes") not in (None, size):
+                    raise InvalidSegments(f"Wrong size for {entry['path']}")
+
+        self._write(self._path(file_path), chunks())
+        self.delete_segments(manifest)
+
+    def delete_segments_with_prefix(self, prefix: str):
+        directory = os.path.join(self.root, self.segments_container_name)
+        name_prefix = normalize(prefix)
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return
+        for name in names:
+            if name.startswith(name_prefix):
+                self._delete_object(name, self.segments_container_name)
+
+    def exists(self, file_path: str) -> bool:
+        try:
+            return os.path.isfile(self._path(file_path))
+        except FileNotFoundError:
+            return False
+
+    def fetch(self, file_path: str) -> Optional[bytes]:
+        try:
+            with open(self._path(file_path), "rb") as asset_file:
+                return asset_file.read()
+        except FileNotFoundError:
+            return None
+
+    def headers(self, file_path: str) -> Optional[dict]:
+        try:
+            stat = os.stat(self._path(file_path))
+        except FileNotFoundError:
+            return None
+        return {
+            "last-modified": formatdate(stat.st_mtime, usegmt=True),
+            "content-length": str(stat.st_size),
+            # Hashing the file on every request would defeat the point
+            "etag": f"{stat.st_mtime_ns:x}-{stat.st_size:x}",
+        }
+
+    def local_path(self, file_path: str) -> Optional[str]:
+        return self._path(file_path) if self.exists(file_path) else None
+
+    def delete(self, file_path, large_object=False):
+        if self.exists(file_path):
+            os.remove(self._path(file_path))
+            return True
+
+    def delete_many(self, file_paths: List[str]) -> List[str]:
+        return [
+            file_path
+            for file_path in file_paths
+            if not self._delete_object(file_path)
+        ]
+
+    def _delete_object(self, file_path: str, container=None) -> bool:
+        try:
+            os.remove(self._path(file_path, container))
+        except FileNotFoundError:
+            # Already deleted
+            return True
+        except OSError:
+            return False
+        return True
+
+
+class S3FileManager(BaseFileManager):
+    """
+    Store asset files in an S3 bucket
+    """
+
+    # Keys per DeleteObjects request (S3's maximum)
+    bulk_delete_size = 1000
+    # Segments kept in memory before being spooled to disk (bytes)
+    spool_size = 8388608
+
+    def __init__(self, s3_client: LazyClient, bucket: str):
+        self.s3_client = s3_client
+        self.bucket = bucket
+
+    @property
+    def s3_connection(self):
+        return self.s3_client.get()
+
+    def warm_up(self):
+        self.s3_client.warm_up()
+
+    def _key(self, file_path: str) -> str:
+        return f"{self.container_name}/{normalize(file_path)}"
+
+    def _segment_key(self, segment_name: str) -> str:
+        # As in manifest paths
+        return f"{self.segments_container_name}/{segment_name}"
+
+    def create(self, file_data, file_path):
+        self.s3_connection.put_object(
+            Bucket=self.bucket, Key=self._key(file_path), Body=file_data
+        )
+
+    def put_segment(self, segment_name: str, contents) -> str:
+        # S3 needs the length of the body up front, so the segment is
+        # spooled (to disk, past `spool_size`) rather than held in memory
+        with tempfile.SpooledTemporaryFile(self.spool_size) as segment:
+            for chunk in iter_chunks(contents):
+                segment.write(chunk)
+            segment.seek(0)
+            response = self.s3_connection.put_object(
+                Bucket=self.bucket,
+                Key=self._segment_key(segment_name),
+                Body=segment,
+            )
+        return response["ETag"].strip('"')
+
+    def create_large(self, manifest: List[dict], file_path: str):
+        """
+        Copy the segments into the parts of a multipart upload, checking
+        them against the manifest, then delete them.
+        All segments except the last should be at least 5MB.
+        """
+        key = self._key(file_path)
+        upload_id = self.s3_connection.create_multipart_upload(
+            Bucket=self.bucket, Key=key
+        )["UploadId"]
+
+        try:
+            parts = []
+            for part_number, entry in enumerate(manifest, start=1):
+                copy_options = {}
+                if entry.get("etag"):
+                    copy_options["CopySourceIfMatch"] = entry["etag"]
+                response = self.s3_connection.upload_part_copy(
+                    Bucket=self.bucket,
+                    Key=key,
+                    UploadId=upload_id,
+                    PartNumber=part_number,
+                    CopySource={
+                        "Bucket": self.bucket,
+                        "Key": entry["path"].lstrip("/"),
+                    },
+                    **copy_options,
+                )
+                parts.append(
+                    {
+                        "PartNumber": part_number,
+                        "ETag": response["CopyPartResult"]["ETag"],
+                    }
+                )
+
+            self.s3_connection.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": parts},
+            )
+        except ClientError as error:
+            self.s3_connection.abort_multipart_upload(
+                Bucket=self.bucket, Key=key, UploadId=upload_id
+            )
+            if error.response["Error"]["Code"] in (
+                "PreconditionFailed",
+                "NoSuchKey",
+                "EntityTooSmall",
+                "InvalidPart",
+            ):
+                raise InvalidSegments(error.response["Error"]["Message"])
+            raise error
+
+        self.delete_segments(manifest)
+
+    def delete_segments(self, manifest: List[dict]):
+        self._delete_keys([entry["path"].lstrip("/") for entry in manifest])
+
+    def delete_segments_with_prefix(self, prefix: str):
+        paginator = self.s3_connection.get_paginator("list_objects_v2")
+        for page in paginator.paginate(
+            Bucket=self.bucket,
+            Prefix=self._segment_key(prefix),
+        ):
+            self._delete_keys(
+                [item["Key"] for item in page.get("Contents", [])]
+            )
+
+    def exists(self, file_path: str) -> bool:
+        try:
+            self.s3_connection.head_object(
+                Bucket=self.bucket, Key=self._key(file_path)
+            )
+        except ClientError as error:
+            if error.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                return False
+            raise error
+        return True
+
+    def fetch(self, file_path: str) -> Optional[bytes]:
+        try:
+            response = self.s3_connection.get_object(
+                Bucket=self.bucket, Key=self._key(file_path)
+            )
+        except ClientError as error:
+            if error.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                return None
+            raise error
+        return response["Body"].read()
+
+    def headers(self, file_path: str) -> Optional[dict]:
+        try:
+            response = self.s3_connection.head_object(
+                Bucket=self.bucket, Key=self._key(file_path)
+            )
+        except ClientError as error:
+            if error.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                return None
+            raise error
+        # The raw headers are named as Swift's, but S3 quotes ETags
+        headers = dict(response["ResponseMetadata"]["HTTPHeaders"])
+        if "etag" in headers:
+            headers["etag"] = headers["etag"].strip('"')
+        return headers
+
+    def delete(self, file_path, large_object=False):
+        if self.exists(file_path):
+            self.s3_connection.delete_object(
+                Bucket=self.bucket, Key=self._key(file_path)
+            )
+            return True
+
+    def delete_many(self, file_paths: List[str]) -> List[str]:
+        keys = {self._key(file_path): file_path for file_path in file_paths}
+        return [keys.get(key, key) for key in self._delete_keys(list(keys))]
+
+    def _delete_object(self, file_path: str, container=None) -> bool:
+        key = f"{container or self.container_name}/{normalize(file_path)}"
+        return not self._delete_keys([key])
+
+    def _delete_keys(self, keys: List[str]) -> List[str]:
+        """
+        Delete objects in batches, and return the keys that couldn't
+        be deleted (S3 doesn't report missing keys)
+        """
+        batches = [
+            keys[start : start + self.bulk_delete_size]
+            for start in range(0, len(keys), self.bulk_delete_size)
+        ]
+
+        def delete_batch(batch):
+            response = self.s3_connection.delete_objects(
+                Bucket=self.bucket,
+                Delete={
+                    "Objects": [{"Key": key} for key in batch],
+                    "Quiet": True,
+                },
+            )
+            return [error["Key"] for error in response.get("Errors", [])]
+
+        with ThreadPoolExecutor(self.delete_concurrency) as executor:
+            return [
+                key
+                for failed in executor.map(delete_batch, batches)
+                for key in failed
+            ]
+
+
+def create_s3_client():
+    return boto3.client(
+        "s3",
+        endpoint_url=config.s3.endpoint or None,
+        region_name=config.s3.region or None,
+        aws_access_key_id=config.s3.access_key.get_secret_value() or None,
+        aws_secret_access_key=(
+            config.s3.secret_key.get_secret_value() or None
+        ),
+        config=BotoConfig(retries={"mode": "standard"}),
+    )
+
+
+# boto3 clients are thread-safe, so all the threads share one
+s3_client = LazyClient(create_s3_client)
@@ -0,0 +1,216 @@
+"""
+The interface of the storage drivers (`webapp.swift.FileManager`, and
+those of `webapp.storage`), and what they share.
+"""
+
+# Standard library
+import uuid
+from abc import ABC, abstractmethod
+from hashlib import sha1
+from typing import Iterator, List, Optional, Tuple
+
+
+class StreamedFile:
+    """
+    Read an iterator of chunks of bytes in slices of a given size,
+    hashing them on the way, so a file of any size can be stored in
+    segments without being held in memory.
+    """
+
+    def __init__(self, chunks: Iterator[bytes]):
+        self.chunks = iter(chunks)
+        self.sha1 = sha1()
+        self._pending = b""
+
+    def has_more(self) -> bool:
+        while not self._pending:
+            self._pending = next(self.chunks, None)
+            if self._pending is None:
+                self._pending = b""
+                return False
+        return True
+
+    def read_slice(self, size: int) -> Iterator[bytes]:
+        """
+        Yield the next `size` bytes (or fewer, at the end of the file)
+        """
+        remaining = size
+        while remaining > 0 and self.has_more():
+            chunk = self._pending[:remaining]
+            self._pending = self._pending[remaining:]
+            self.sha1.update(chunk)
+            remaining -= len(chunk)
+            yield chunk
+
+
+class BaseFileManager(ABC):
+    """
+    Manage asset files:
+    - creation
+    - retrieval
+    - searching
+    - deletion
+
+    Drivers mirror the Swift containers: asset files are in
+    `container_name`, and the segments of large objects in
+    `segments_container_name`.
+    """
+
+    container_name = "assets"
+    # Segments of Static Large Objects
+    segments_container_name = "assets_segments"
+    # Objects per bulk-delete request
+    bulk_delete_size = 1000
+    # Concurrent DELETE requests
+    delete_concurrency = 8
+
+    def warm_up(self):
+        """
+        Connect to the storage in the background
+        """
+
+    def local_path(self, file_path: str) -> Optional[str]:
+        """
+        The path of the file on the local filesystem, to serve it with
+        sendfile, if the storage is local
+        """
+        return None
+
+    @abstractmethod
+    def create(self, file_data, file_path):
+        """
+        Store a file, replacing it if it already exists
+        """
+
+    def upload_segments(
+        self, chunks: Iterator[bytes], segment_size: int
+    ) -> Tuple[List[dict], str]:
+        """
+        Store a stream of chunks of bytes in segments of `segment_size`,
+        to be assembled by a Static Large Object manifest.
+
+        Return the manifest and the SHA1 of the whole file.
+        """
+        streamed_file = StreamedFile(chunks)
+        prefix = uuid.uuid4().hex
+        manifest = []
+
+        try:
+            while streamed_file.has_more():
+                segment_name = f"{prefix}/{len(manifest):08d}"
+                size = 0
+
+                def segment():
+                    nonlocal size
+                    for chunk in streamed_file.read_slice(segment_size):
+                        size += len(chunk)
+                        yield chunk
+
+                etag = self.put_segment(segment_name, segment())
+                manifest.append(self.manifest_entry(segment_name, etag, size))
+        except Exception:
+            self.delete_segments(manifest)
+            raise
+
+        return manifest, streamed_file.sha1.hexdigest()
+
+    @abstractmethod
+    def put_segment(self, segment_name: str, contents) -> str:
+        """
+        Store a segment of a large object, and return its ETag
+        """
+
+    def manifest_entry(
+        self, segment_name: str, etag: str, size_bytes: Optional[int] = None
+    ) -> dict:
+        """
+        The entry of a segment in a Static Large Object manifest.
+        The ETag and size of each segment are checked (unless they're
+        None) when the large object is created.
+        """
+        return {
+            "path": f"/{self.segments_container_name}/{segment_name}",
+            "etag": etag,
+            "size_bytes": size_bytes,
+        }
+
+    @abstractmethod
+    def create_large(self, manifest: List[dict], file_path: str):
+        """
+        Create an asset from the segments of a manifest, or raise
+        InvalidSegments if they don't match it
+        """
+
+    def delete_segments(self, manifest: List[dict]):
+        """
+        Delete segments that won't be part of an asset
+        """
+        for segment in manifest:
+            self._delete_object(
+                segment["path"].split("/", 2)[2],
+                container=self.segments_container_name,
+            )
+
+    @abstractmethod
+    def delete_segments_with_prefix(self, prefix: str):
+        """
+        Delete the segments stored under a prefix, such as the parts
+        of an abandoned upload
+        """
+
+    @abstractmethod
+    def exists(self, file_path: str) -> bool:
+        pass
+
+    @abstractmethod
+    def fetch(self, file_path: str) -> Optional[bytes]:
+        """
+        The contents of the file, or None if it doesn't exist
+        """
+
+    @abstractmethod
+    def headers(self, file_path: str) -> Optional[dict]:
+        """
+        The headers of the file, named as Swift's (lowercase, with
+        "last-modified", "content-length" and an unquoted "etag"),
+        or None if it doesn't exist
+        """
+
+    @abstractmethod
+    def delete(self, file_path, large_object=False):
+        """
+        Delete the file (and its segments, for a large object),
+        and return True if it existed
+        """
+
+    @abstractmethod
+    def delete_many(self, file_paths: List[str]) -> List[str]:
+        """
+        Delete many files, ignoring those that don't exist.
+        Return the file paths that couldn't be deleted.
+        """
+
+    @abstractmethod
+    def _delete_object(self, file_path: str, container=None) -> bool:
+        """
+        Delete an object from a container (the assets by default), and
+        return whether it's gone
+        """
+
+    def generate_asset_path(self, file_data, friendly_name):
+        """
+        Generate a unique asset file_path
+        based on a friendly name
+        """
+
+        path = sha1(file_data).hexdigest()[:8]
+        if friendly_name:
+            path += "-" + friendly_name
+
+        return path
+
+
+class InvalidSegments(Exception):
+    """
+    Raised when the segments of a large object don't match its manifest
+    """
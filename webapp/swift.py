@@ -1,6 +1,8 @@
 # Standard library
-from hashlib import sha1
-from typing import Optional
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import ContextManager, List, Optional, Union
+from urllib.parse import quote, unquote
 
 # Packages
 import swiftclient
@@ -10,22 +12,40 @@ from swiftclient.exceptions import ClientException as SwiftException
 # Local
 from webapp.config import config
 from webapp.lib.url_helpers import normalize
+from webapp.storage_base import BaseFileManager, InvalidSegments
+from webapp.utils import ClientPool, LazyClient
 
 
-class FileManager:
+class FileManager(BaseFileManager):
     """
-    Manage asset files:
-    - creation
-    - retrieval
-    - searching
-    - deletion
+    Store asset files in Swift. Other storage drivers (`webapp.storage`)
+    implement the same `BaseFileManager`.
     """
 
-    container_name = "assets"
-    swift_connection: swiftclient.client.Connection
+    # Objects per bulk-delete request, if Swift doesn't say otherwise
+    bulk_delete_size = 1000
+    # Concurrent DELETE requests, when bulk-delete isn't available
+    delete_concurrency = 8
 
-    def __init__(self, swift_connection):
-        self.swift_connection = swift_connection
+    def __init__(self, swift_client: Union[ClientPool, LazyClient]):
+        self.swift_client = swift_client
+        self._bulk_delete = None
+        self._segments_container_exists = False
+
+    def swift_connection(
+        self,
+    ) -> ContextManager[swiftclient.client.Connection]:
+        """
+        A Swift connection, checked out of the pool for the duration of
+        the `with` block
+        """
+        return self.swift_client.connection()
+
+    def warm_up(self):
+        """
+        Connect to the storage in the background
+        """
+        self.swift_client.warm_up()
 
     def create(self, file_data, file_path):
         """
@@ -35,30 +55,84 @@ class FileManager:
         (don't create it again)
         """
 
-        try:
-            # Create object
-            self.swift_connection.put_object(
-                self.container_name, normalize(file_path), file_data
-            )
-        except SwiftException as swift_error:
-            if swift_error.http_status != 404:
-                raise swift_error
+        with self.swift_connection() as connection:
+            try:
+                # Create object
+                connection.put_object(
+                    self.container_name, normalize(file_path), file_data
+                )
+            except SwiftException as swift_error:
+                if swift_error.http_status != 404:
+                    raise swift_error
+
+                # Not found, assuming container doesn't exist
+                connection.put_container(self.container_name)
 
-            # Not found, assuming container doesn't exist
-            self.swift_connection.put_container(self.container_name)
+                # And try to create again
+                connection.put_object(
+                    self.container_name, normalize(file_path), file_data
+                )
 
-            # And try to create again
-            self.swift_connection.put_object(
-                self.container_name, normalize(file_path), file_data
+    def put_segment(self, segment_name: str, contents) -> str:
+        """
+        Store a segment of a large object, and return its ETag
+        """
+        with self.swift_connection() as connection:
+            if not self._segments_container_exists:
+                connection.put_container(self.segments_container_name)
+                self._segments_container_exists = True
+
+            return connection.put_object(
+                self.segments_container_name, segment_name, contents
             )
 
+    def create_large(self, manifest: List[dict], file_path: str):
+        """
+        Create an asset from segments, with a Static Large Object manifest
+        """
+        try:
+            with self.swift_connection() as connection:
+                connection.put_object(
+                    self.container_name,
+                    normalize(file_path),
+                    json.dumps(manifest),
+                    query_string="multipart-manifest=put",
+                )
+        except SwiftException as error:
+            # Swift checks the segments against the manifest
+            if error.http_status == 400:
+                raise InvalidSegments(error.http_response_content)
+            raise error
+
+    def delete_segments_with_prefix(self, prefix: str):
+        """
+        Delete the segments stored under a prefix, such as the parts
+        of an abandoned upload
+        """
+        try:
+            with self.swift_connection() as connection:
+                _, objects = connection.get_container(
+                    self.segments_container_name,
+                    prefix=prefix,
+                    full_listing=True,
+                )
+        except SwiftException as error:
+            if error.http_status == 404:
+                return
+            raise error
+
+        self.delete_segments(
+            [self.manifest_entry(item["name"], None) for item in objects]
+        )
+
     def exists(self, file_path: str) -> bool:
         file_exists = True
 
         try:
-            self.swift_connection.head_object(
-                self.container_name, normalize(file_path)
-            )
+            with self.swift_connection() as connection:
+                connection.head_object(
+                    self.container_name, normalize(file_path)
+                )
         except SwiftException as error:
             if error.http_status == 404:
                 file_exists = False
@@ -67,46 +141,189 @@ class FileManager:
 
     def fetch(self, file_path: str) -> Optional[bytes]:
         try:
-            asset = self.swift_connection.get_object(
-                self.container_name, normalize(file_path)
-            )
+            with self.swift_connection() as connection:
+                asset = connection.get_object(
+                    self.container_name, normalize(file_path)
+                )
             return asset[1]
         except swiftclient.exceptions.ClientException as error:
             if error.http_status == 404:
                 return None
             raise error
 
-    def headers(self, file_path: str) -> dict:
-        return self.swift_connection.head_object(
-            self.container_name, normalize(file_path)
-        )
+    def headers(self, file_path: str) -> Optional[dict]:
+        try:
+            with self.swift_connection() as connection:
+                return connection.head_object(
+                    self.container_name, normalize(file_path)
+                )
+        except SwiftException as error:
+            if error.http_status == 404:
+                return None
+            raise error
 
-    def delete(self, file_path):
+    def delete(self, file_path, large_object=False):
         if self.exists(file_path):
-            self.swift_connection.delete_object(
-                self.container_name, normalize(file_path)
-            )
+            with self.swift_connection() as connection:
+                connection.delete_object(
+                    self.container_name,
+                    normalize(file_path),
+                    # Delete the segments along with the manifest
+                    query_string=(
+                        "multipart-manifest=delete" if large_object else None
+                    ),
+                )
             return True
 
-    def generate_asset_path(self, file_data, friendly_name):
+    def delete_many(self, file_paths: List[str]) -> List[str]:
         """
-        Generate a unique asset file_path
-        based on a friendly name
+        Delete many files, with Swift's bulk-delete middleware when it's
+        enabled, or with concurrent DELETE requests otherwise.
+        Files that don't exist are ignored.
+
+        Return the file paths that couldn't be deleted.
         """
+        if self._bulk_delete is None:
+            with self.swift_connection() as connection:
+                capabilities = connection.get_capabilities()
+            self._bulk_delete = capabilities.get("bulk_delete", False)
+
+        if self._bulk_delete is False:
+            # Each thread checks a connection out of the pool, so more
+            # threads than pooled connections would only wait for one
+            workers = min(self.delete_concurrency, config.swift.pool_size)
+            with ThreadPoolExecutor(workers) as executor:
+                deleted = executor.map(self._delete_object, file_paths)
+                return [
+                    file_path
+                    for file_path, ok in zip(file_paths, deleted)
+                    if not ok
+                ]
+
+        batch_size = min(
+            self.bulk_delete_size,
+            self._bulk_delete.get("max_deletes_per_request", 10000),
+        )
+        failed = []
+        for start in range(0, len(file_paths), batch_size):
+            batch = file_paths[start : start + batch_size]
+            objects = {normalize(file_path): file_path for file_path in batch}
+            with self.swift_connection() as connection:
+                _, body = connection.post_account(
+                    headers={
+                        "Accept": "application/json",
+                        "Content-Type": "text/plain",
+                    },
+                    query_string="bulk-delete",
+                    data="\n".join(
+                        quote(f"/{self.container_name}/{name}")
+                        for name in objects
+                    ),
+                )
+            result = json.loads(body)
+            if not result.get("Response Status", "").startswith("2"):
+                errors = result.get("Errors") or []
+                if not errors:
+                    # The whole request failed
+                    failed.extend(batch)
+                for name, _ in errors:
+                    name = unquote(name).split(f"/{self.container_name}/")[-1]
+                    failed.append(objects.get(name, name))
+
+        return failed
+
+    def _delete_object(self, file_path: str, container=None) -> bool:
+        # Segments are stored under their raw names (see `put_segment`),
+        # only asset file paths are normalized
+        name = file_path if container else normalize(file_path)
+        try:
+            with self.swift_connection() as connection:
+                connection.delete_object(
+                    container or self.container_name, name
+                )
+        except SwiftException as error:
+            # Already deleted
+            return error.http_status == 404
+        return True
+
+
+# The storage URL and token of the last connection to authenticate,
+# shared with the connections created afterwards
+swift_auth = {}
+
+
+def create_swift_connection() -> swiftclient.client.Connection:
+    return swiftclient.client.Connection(
+        config.swift.auth_url,
+        config.swift.username,
+        config.swift.password.get_secret_value(),
+        auth_version=config.swift.auth_version,
+        os_options={"tenant_name": config.swift.tenant_name},
+        preauthurl=swift_auth.get("url"),
+        preauthtoken=swift_auth.get("token"),
+    )
+
+
+def authenticate_swift_connection(connection: swiftclient.client.Connection):
+    swift_auth["url"], swift_auth["token"] = connection.get_auth()
+
 
-        path = sha1(file_data).hexdigest()[:8]
-        if friendly_name:
-            path += "-" + friendly_name
+def use_swift_auth(connection: swiftclient.client.Connection):
+    """
+    Give a connection checked out of the pool the latest shared token
+    """
+    if swift_auth.get("token"):
+        connection.url, connection.token = (
+            swift_auth["url"],
+            swift_auth["token"],
+        )
+    connection.checked_out_token = connection.token
 
-        return path
+
+def share_swift_auth(connection: swiftclient.client.Connection):
+    """
+    Share the token of a connection that authenticated again while it was
+    checked out (e.g. when its token expired), so that the other
+    connections don't have to
+    """
+    if connection.token and connection.token != connection.checked_out_token:
+        swift_auth["url"], swift_auth["token"] = (
+            connection.url,
+            connection.token,
+        )
 
 
-swift_connection = swiftclient.client.Connection(
-    config.swift.auth_url,
-    config.swift.username,
-    config.swift.password.get_secret_value(),
-    auth_version=config.swift.auth_version,
-    os_options={"tenant_name": config.swift.tenant_name},
+# Swift connections aren't thread-safe, so the worker threads (or
+# greenlets) of a process share a bounded pool of them, created on first
+# use. The app warms up the authentication in the background when it
+# starts.
+swift_client = ClientPool(
+    create_swift_connection,
+    size=config.swift.pool_size,
+    warm_up=authenticate_swift_connection,
+    on_checkout=use_swift_auth,
+    on_checkin=share_swift_auth,
+    timeout=config.swift.pool_timeout,
 )
 
-file_manager = FileManager(swift_connection)
+
+def create_file_manager(driver: str = None) -> BaseFileManager:
+    """
+    The file manager for the configured storage driver
+    """
+    driver = driver or config.storage.driver
+
+    if driver == "local":
+        from webapp.storage import LocalFileManager
+
+        return LocalFileManager(config.storage.local_path)
+
+    if driver == "s3":
+        from webapp.storage import S3FileManager, s3_client
+
+        return S3FileManager(s3_client, config.s3.bucket)
+
+    return FileManager(swift_client)
+
+
+file_manager = create_file_manager()
@@ -1,18 +1,163 @@
-import time
-from functools import lru_cache as _lru_cache
+import logging
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+from webapp.cache import cached
+
+logger = logging.getLogger(__name__)
 
 
 def lru_cache(*, ttl_seconds, maxsize=128):
+    """
+    Cache the results of the decorated function for about `ttl_seconds`,
+    in this process and in Redis when it's configured (see webapp.cache)
+    """
+
     def deco(foo):
-        @_lru_cache(maxsize=maxsize)
-        def cached_with_ttl(*args, ttl_hash, **kwargs):
-            return foo(*args, **kwargs)
+        return cached(foo, ttl_seconds=ttl_seconds, maxsize=maxsize)
+
+    return deco
+
+
+def serving_with_gunicorn() -> bool:
+    """
+    Whether the app was imported by a gunicorn worker, rather than by a
+    flask command or the tests
+    """
+    # Set by the gunicorn arbiter, and inherited by the workers it forks
+    return os.environ.get("SERVER_SOFTWARE", "").startswith("gunicorn/")
+
+
+class LazyClient:
+    """
+    Build a client on first use rather than at import time, so that
+    importing the app (gunicorn workers, flask commands, tests) never
+    waits on the network.
+
+    If the factory returns None (e.g. the service is unreachable), nothing
+    is stored and the next call to `get` will try again.
+
+    Clients that aren't thread-safe should use a `ClientPool` instead.
+    """
+
+    def __init__(self, factory, warm_up=None):
+        self._factory = factory
+        self._warm_up = warm_up
+        self._client = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        client = self._client
+        if client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._factory()
+                client = self._client
+        return client
 
-        def inner(*args, **kwargs):
-            return cached_with_ttl(
-                *args, ttl_hash=round(time.time() / ttl_seconds), **kwargs
+    def reset(self):
+        """
+        Drop the current client, the next `get` will build a new one
+        """
+        with self._lock:
+            self._client = None
+
+    @contextmanager
+    def connection(self):
+        """
+        The client, with the same interface as `ClientPool`
+        """
+        yield self.get()
+
+    def warm_up(self) -> threading.Thread:
+        """
+        Build the client (and run the optional warm-up hook, e.g. to
+        authenticate) in a background thread
+        """
+        thread = threading.Thread(target=self._run_warm_up, daemon=True)
+        thread.start()
+        return thread
+
+    def _run_warm_up(self):
+        try:
+            client = self.get()
+            if client is not None and self._warm_up:
+                self._warm_up(client)
+        except Exception as error:
+            logger.warning("Unable to warm up client: %s", error)
+
+
+class ClientPool:
+    """
+    A bounded pool of clients that aren't thread-safe, shared by the
+    worker threads (or greenlets, under gevent) of a process: each use
+    checks a client out, so that at most `size` clients are open, and
+    the others wait for one up to `timeout` seconds.
+
+    Clients are built on first use, and are expected to recover from
+    errors themselves (as Swift connections do). The optional hooks are
+    called with each client checked out of, and back into, the pool.
+    """
+
+    def __init__(
+        self,
+        factory,
+        size: int,
+        warm_up=None,
+        on_checkout=None,
+        on_checkin=None,
+        timeout: float = 30.0,
+    ):
+        self._factory = factory
+        self._warm_up = warm_up
+        self._on_checkout = on_checkout
+        self._on_checkin = on_checkin
+        self.timeout = timeout
+        # The most recently used clients first, and None for each client
+        # that hasn't been built yet
+        self._pool = queue.LifoQueue()
+        for _ in range(size):
+            self._pool.put(None)
+
+    @contextmanager
+    def connection(self):
+        try:
+            client = self._pool.get(timeout=self.timeout)
+        except queue.Empty:
+            raise NoClientAvailable(
+                f"No client available after {self.timeout} seconds"
             )
 
-        return inner
+        try:
+            if client is None:
+                client = self._factory()
+            if client is not None and self._on_checkout:
+                self._on_checkout(client)
+            yield client
+        finally:
+            if client is not None and self._on_checkin:
+                self._on_checkin(client)
+            self._pool.put(client)
 
-    return deco
+    def warm_up(self) -> threading.Thread:
+        """
+        Build a client (and run the optional warm-up hook) in a
+        background thread
+        """
+        thread = threading.Thread(target=self._run_warm_up, daemon=True)
+        thread.start()
+        return thread
+
+    def _run_warm_up(self):
+        try:
+            with self.connection() as client:
+                if client is not None and self._warm_up:
+                    self._warm_up(client)
+        except Exception as error:
+            logger.warning("Unable to warm up client: %s", error)
+
+
+class NoClientAvailable(Exception):
+    pass
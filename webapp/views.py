@@ -1,107 +1,69 @@
 import math
 import re
 import uuid
-from datetime import datetime
 from distutils.util import strtobool
-from urllib.parse import unquote, urlparse
+from urllib.parse import unquote
 
-from webapp.config import config
-import requests
 import json
+import zlib
 
 # Packages
-from flask import Response, abort, jsonify, redirect, request
-
-from webapp.database import db_session
-from webapp.decorators import token_required
-from webapp.lib.python_helpers import sanitize_like_input
-from webapp.integrations.trino_service import trino_cur
-from webapp.param_parser import parse_asset_search_params
-from webapp.lib.file_helpers import get_mimetype, remove_filename_hash
-from webapp.lib.http_helpers import set_headers_for_type
-from webapp.lib.processors import ImageProcessor
+import orjson
+from flask import Response, abort, jsonify, request, stream_with_context
+from more_itertools import chunked
+
+from webapp.config import config
+from webapp.database import db_session, statement_timeout
+from webapp.decorators import stream_token_required, token_required
+from webapp.integrations.directory_service import (
+    DirectoryUnavailable,
+    directory_client,
+)
+from webapp.integrations.trino_service import (
+    TrinoUnavailable,
+    search_campaigns,
+)
+from webapp.param_parser import parse_asset_search_filters
 from webapp.models import Asset, Redirect, Token
 from webapp.services import (
     AssetAlreadyExistException,
     AssetNotFound,
+    ReadOnlyMode,
+    UploadSessionNotFound,
     asset_service,
 )
-from webapp.swift import file_manager
-
-# Assets
-# ===
-
-
-def get_asset(file_path: str):
-    """
-    Get the asset content.
-    """
-
-    request_url = urlparse(request.path)
-    # remove multiple slashes
-    request_path = re.sub("//+", "/", request_url.path)
-    # remove /v1 prefix
-    request_path = re.sub(r"^\/v1", "", request_path)
-    # remove the / from the beginning
-    request_path = request_path.lstrip("/")
-
-    redirect_record = (
-        db_session.query(Redirect)
-        .filter(Redirect.redirect_path == request_path)
-        .one_or_none()
+from webapp.swift import InvalidSegments, file_manager
+
+# Rows read from the database, and written to the response, at a time
+EXPORT_BATCH_SIZE = 1000
+
+# Fields that can be changed by a bulk update, with add_<field>
+# and remove_<field>
+BULK_UPDATE_FIELDS = ["tags", "products", "categories"]
+# The search fields of a bulk update, with the type of their values
+BULK_UPDATE_SEARCH_FIELDS = {
+    "tag": str,
+    "asset_type": str,
+    "product_types": list,
+    "author_email": str,
+    "start_date": str,
+    "end_date": str,
+    "language": str,
+    "categories": list,
+    "include_deprecated": bool,
+    "file_types": list,
+}
+TYPE_NAMES = {str: "a string", list: "a list of strings", bool: "a boolean"}
+
+
+def is_list_of_strings(value) -> bool:
+    return isinstance(value, list) and all(
+        isinstance(item, str) for item in value
     )
 
-    if redirect_record:
-        # Cache permanent redirect longtime. Temporary, not so much.
-        max_age = (
-            "max-age=31556926" if redirect_record.permanent else "max-age=60"
-        )
-        target_url = redirect_record.target_url + "?" + request_url.query
-        response = redirect(target_url)
-        response.headers["Cache-Control"] = max_age
-
-        return set_headers_for_type(response, get_mimetype(request_path))
 
-    asset_data = file_manager.fetch(file_path)
-    if not asset_data:
-        abort(404, f"No asset found for '{file_path}'")
-
-    asset_headers = file_manager.headers(file_path)
-
-    def make_datetime(x):
-        return datetime.strptime(x, "%a, %d %b %Y %H:%M:%S %Z")
-
-    last_modified = asset_headers["last-modified"]
-    if_modified_since = request.headers.get(
-        "HTTP_IF_MODIFIED_SINCE", "Mon, 1 Jan 1980 00:00:00 GMT"
-    )
-
-    if make_datetime(last_modified) <= make_datetime(if_modified_since):
-        return jsonify({}), 304
-
-    # Run image processor
-    image = ImageProcessor(asset_data, request.args)
-    converted_type = image.process()
-    asset_data = image.data
-
-    # Get a sensible filename, including a converted extension
-    filename = remove_filename_hash(file_path)
-    if converted_type:
-        filename = f"{filename}.{converted_type}"
-
-    # Start response, guessing mime type
-    response = Response(asset_data, content_type=get_mimetype(filename))
-
-    # Set download filename
-    response.headers["Content-Disposition"] = f"filename={filename}"
-    # Cache all genuine assets forever
-    response.headers["Cache-Control"] = "max-age=31556926"
-    response.headers["Last-Modified"] = last_modified
-
-    # Set headers base on mime type
-    response = set_headers_for_type(response)
-
-    return response
+# Assets
+# ===
 
 
 @token_required
@@ -136,6 +98,106 @@ def update_asset(file_path):
         abort(404)
 
 
+@token_required
+def bulk_update_assets():
+    """
+    Add and remove tags, products and categories of, or deprecate,
+    many assets at once
+    """
+    body = request.get_json(silent=True) or {}
+    if not isinstance(body, dict):
+        abort(400, "The body must be a JSON object")
+    file_paths = body.get("file_paths") or []
+    search = body.get("search") or {}
+    deprecated = body.get("deprecated")
+
+    if not is_list_of_strings(file_paths) or not isinstance(search, dict):
+        abort(
+            400, "file_paths must be a list of strings, and search an object"
+        )
+    if not file_paths and not search:
+        abort(400, "Either file_paths or search is required")
+    if set(search) - set(BULK_UPDATE_SEARCH_FIELDS):
+        abort(400, f"search only accepts: {list(BULK_UPDATE_SEARCH_FIELDS)}")
+    for name, value in search.items():
+        value_type = BULK_UPDATE_SEARCH_FIELDS[name]
+        if not (
+            is_list_of_strings(value)
+            if value_type is list
+            else isinstance(value, value_type)
+        ):
+            abort(400, f"search.{name} must be {TYPE_NAMES[value_type]}")
+    if deprecated is not None and not isinstance(deprecated, bool):
+        abort(400, "deprecated must be true or false")
+
+    add = {
+        field: body.get(f"add_{field}") or [] for field in BULK_UPDATE_FIELDS
+    }
+    remove = {
+        field: body.get(f"remove_{field}") or []
+        for field in BULK_UPDATE_FIELDS
+    }
+    for field in BULK_UPDATE_FIELDS:
+        if not is_list_of_strings(add[field]) or not is_list_of_strings(
+            remove[field]
+        ):
+            abort(
+                400, f"add_{field} and remove_{field} must be lists of strings"
+            )
+
+    try:
+        results = asset_service.bulk_update_assets(
+            file_paths=file_paths,
+            search=search,
+            add=add,
+            remove=remove,
+            deprecated=deprecated,
+        )
+    except ValueError as error:
+        abort(400, str(error))
+    except ReadOnlyMode:
+        abort(403, "The assets manager is in read-only mode")
+
+    return jsonify(
+        {
+            "updated": list(results.values()).count("updated"),
+            "results": [
+                {"file_path": file_path, "status": status}
+                for file_path, status in results.items()
+            ],
+        }
+    )
+
+
+@token_required
+def bulk_delete_assets():
+    """
+    Delete many assets at once
+    """
+    body = request.get_json(silent=True) or {}
+    file_paths = body.get("file_paths")
+
+    if not file_paths:
+        abort(400, "file_paths is required")
+    if not is_list_of_strings(file_paths):
+        abort(400, "file_paths must be a list of strings")
+
+    try:
+        results = asset_service.delete_assets(file_paths)
+    except ReadOnlyMode:
+        abort(403, "The assets manager is in read-only mode")
+
+    return jsonify(
+        {
+            "deleted": list(results.values()).count("deleted"),
+            "results": [
+                {"file_path": file_path, "status": status}
+                for file_path, status in results.items()
+            ],
+        }
+    )
+
+
 @token_required
 def delete_asset(file_path):
     asset = (
@@ -147,9 +209,12 @@ def delete_asset(file_path):
     if not asset:
         abort(404)
 
-    file_manager.delete(file_path)
+    file_manager.delete(
+        file_path, large_object=bool(asset.data.get("large_object"))
+    )
     db_session.delete(asset)
     db_session.commit()
+    asset_service.available_extensions.invalidate()
 
     return jsonify({"message": f"Deleted {file_path}"})
 
@@ -173,71 +238,96 @@ def get_asset_info(file_path):
     return response
 
 
+@statement_timeout(config.db.search_statement_timeout)
 @token_required
 def get_assets():
     """
     Get a list of assets metadata.
     """
-    search_params = parse_asset_search_params()
+    filters = parse_asset_search_filters()
 
-    file_type = request.values.get("type", "").strip()
     page = request.values.get("page", type=int)
     per_page = request.values.get("per_page", type=int)
-    include_deprecated = (
-        strtobool(request.values.get("include_deprecated", "false")) == 1
-    )
     page = 1 if not page or page < 1 else page
     per_page = (
         20 if not per_page or per_page < 1 or per_page > 100 else per_page
     )
-    file_types = [file_type] if file_type else []
-
-    if any(
-        [
-            search_params.tag,
-            search_params.asset_type,
-            search_params.author_email,
-            search_params.name,
-            search_params.start_date,
-            search_params.end_date,
-            search_params.language,
-            search_params.product_types,
-            search_params.categories,
-        ]
-    ):
-        assets, total = asset_service.find_assets(
-            tag=search_params.tag or search_params.name,
-            asset_type=search_params.asset_type,
-            product_types=search_params.product_types,
-            categories=search_params.categories,
-            author_email=search_params.author_email,
-            start_date=search_params.start_date,
-            end_date=search_params.end_date,
-            language=search_params.language,
-            file_types=file_types,
-            page=page,
-            per_page=per_page,
-            include_deprecated=include_deprecated,
-        )
-    else:
-        assets, total = asset_service.find_all_assets(
-            page=page,
-            per_page=per_page,
-            include_deprecated=include_deprecated,
-            file_types=file_types,
-        )
+    # Searches are sorted by creation date
+    is_search = any(
+        value
+        for name, value in filters.items()
+        if name not in ["file_types", "include_deprecated"]
+    )
 
-    return jsonify(
-        {
-            "assets": [asset.as_json() for asset in assets],
-            "total": total,
-            "page": page,
-            "per_page": per_page,
-            "total_pages": math.ceil(total / per_page),
-        }
+    assets, total = asset_service.find_assets_json(
+        page=page,
+        per_page=per_page,
+        order_by=Asset.created if is_search else None,
+        **filters,
+    )
+
+    return Response(
+        orjson.dumps(
+            {
+                "assets": assets,
+                "total": total,
+                "page": page,
+                "per_page": per_page,
+                "total_pages": math.ceil(total / per_page),
+            }
+        ),
+        mimetype="application/json",
     )
 
 
+@token_required
+def export_assets():
+    """
+    Stream the metadata of all the assets that match the search, as one
+    JSON object per line (NDJSON), gzipped if the client accepts it.
+    """
+    # A quality of 0 means the client doesn't accept it
+    use_gzip = request.accept_encodings["gzip"] > 0
+
+    assets = asset_service.export_assets_json(
+        batch_size=EXPORT_BATCH_SIZE, **parse_asset_search_filters()
+    )
+
+    def generate():
+        compressor = zlib.compressobj(wbits=31) if use_gzip else None
+        for batch in chunked(assets, EXPORT_BATCH_SIZE):
+            lines = b"".join(
+                orjson.dumps(asset, option=orjson.OPT_APPEND_NEWLINE)
+                for asset in batch
+            )
+            if compressor:
+                lines = compressor.compress(lines)
+            if lines:
+                yield lines
+        if compressor:
+            yield compressor.flush()
+
+    response = Response(
+        stream_with_context(generate()), mimetype="application/x-ndjson"
+    )
+    response.vary.add("Accept-Encoding")
+    if use_gzip:
+        response.content_encoding = "gzip"
+    return response
+
+
+@statement_timeout(config.db.search_statement_timeout)
+@token_required
+def get_facets():
+    """
+    Count the assets matching the search, per asset type, file type,
+    category, product and tag.
+    """
+    facets = asset_service.facet_counts(**parse_asset_search_filters())
+
+    return jsonify(facets)
+
+
 @token_required
 def create_asset():
     """
@@ -304,6 +394,125 @@ def create_asset():
     return jsonify(created_assets), 201
 
 
+def large_asset_options(values) -> dict:
+    """
+    The options of a large asset, from the query string
+    (the body of the request being the file)
+    """
+    return {
+        "friendly_name": values.get("friendly-name", ""),
+        "url_path": values.get("url-path", "").strip("/"),
+        "tags": values.get("tags", "").split(","),
+        "products": values.get("products", "").split(","),
+        "categories": values.get("categories", "").split(","),
+        "asset_type": values.get("asset-type", ""),
+        "author": {"email": values.get("author", "")},
+        "language": values.get("language", ""),
+        "deprecated": values.get("deprecated", "false").lower() == "true",
+    }
+
+
+@stream_token_required
+def upload_large_asset():
+    """
+    Create an asset from the raw request body, of any size.
+    Options are in the query string, as the body is the file.
+    """
+    try:
+        asset = asset_service.create_large_asset(
+            request.stream, **large_asset_options(request.args)
+        )
+    except AssetAlreadyExistException as error:
+        abort(409, f"Asset already exists: {error}")
+    except (ValueError, InvalidSegments) as error:
+        abort(400, str(error))
+    except ReadOnlyMode:
+        abort(403, "The assets manager is in read-only mode")
+
+    return jsonify(asset.as_json()), 201
+
+
+@token_required
+def create_upload_session():
+    """
+    Start an upload in parts, with the options of the asset
+    """
+    try:
+        upload_session = asset_service.create_upload_session(
+            **large_asset_options(request.args)
+        )
+    except AssetAlreadyExistException as error:
+        abort(409, f"Asset already exists: {error}")
+    except ReadOnlyMode:
+        abort(403, "The assets manager is in read-only mode")
+
+    return jsonify(upload_session.as_json()), 201
+
+
+@token_required
+def get_upload_session(upload_id):
+    try:
+        upload_session = asset_service.find_upload_session(upload_id)
+    except UploadSessionNotFound:
+        abort(404, f"No upload found for '{upload_id}'")
+
+    return jsonify(upload_session.as_json())
+
+
+@stream_token_required
+def upload_part(upload_id, part_number):
+    """
+    Store a part of an upload, from the raw request body
+    """
+    try:
+        etag = asset_service.upload_part(
+            upload_id, part_number, request.stream
+        )
+    except UploadSessionNotFound:
+        abort(404, f"No upload found for '{upload_id}'")
+    except ValueError as error:
+        abort(400, str(error))
+    except ReadOnlyMode:
+        abort(403, "The assets manager is in read-only mode")
+
+    return jsonify({"part_number": part_number, "etag": etag})
+
+
+@token_required
+def complete_upload(upload_id):
+    """
+    Create the asset from the parts of an upload
+    """
+    body = request.get_json(silent=True) or {}
+    parts = body.get("parts")
+
+    if not parts or not isinstance(parts, list):
+        abort(400, "parts is required")
+
+    try:
+        asset = asset_service.complete_upload(upload_id, parts)
+    except UploadSessionNotFound:
+        abort(404, f"No upload found for '{upload_id}'")
+    except AssetAlreadyExistException as error:
+        abort(409, f"Asset already exists: {error}")
+    except (ValueError, InvalidSegments) as error:
+        abort(400, str(error))
+    except ReadOnlyMode:
+        abort(403, "The assets manager is in read-only mode")
+
+    return jsonify(asset.as_json()), 201
+
+
+@token_required
+def abort_upload(upload_id):
+    try:
+        asset_service.abort_upload(upload_id)
+    except UploadSessionNotFound:
+        abort(404, f"No upload found for '{upload_id}'")
+
+    return jsonify({"message": f"Deleted upload {upload_id}"})
+
+
 # Tokens
 # ===
 @token_required
@@ -475,59 +684,20 @@ def delete_redirect(redirect_path):
 
 
 def get_users(username: str):
-    query = """
-    query($name: String!) {
-        employees(filter: { contains: { name: $name }}) {
-            id
-            firstName
-            surname
-            email
-            team
-            department
-            jobTitle
-        }
-    }
-    """
-
-    headers = {
-        "Authorization": "token "
-        + config.directory_api.token.get_secret_value()
-    }
-    response = requests.post(
-        config.directory_api.url,
-        json={
-            "query": query,
-            "variables": {"name": username.strip()},
-        },
-        headers=headers,
-        verify=False,
-        timeout=10,
-    )
+    try:
+        users = directory_client.search_employees(username)
+    except DirectoryUnavailable:
+        return jsonify({"error": "Failed to fetch users"}), 500
 
-    if response.status_code == 200:
-        users = response.json().get("data", {}).get("employees", [])
-        return jsonify(list(users))
-    return jsonify({"error": "Failed to fetch users"}), 500
+    return jsonify(list(users))
 
 
 def get_salesforce_campaigns(query: str):
-    safe_query = sanitize_like_input(query.strip())
-
-    # Add '%' wildcards safely
-    like_pattern = f"%{safe_query}%"
-
-    formed_query = (
-        f"SELECT Id, Name FROM Campaign "
-        f"WHERE Name LIKE '{like_pattern}' ESCAPE '\\' "
-        f"LIMIT 20"
-    )
-    if trino_cur is None:
-        return jsonify({"error": "Failed to connect to service"}), 503
     try:
-        trino_cur.execute(formed_query)
-        rows = trino_cur.fetchall()
-        campaigns = [{"id": row[0], "name": row[1]} for row in rows]
-
-        return jsonify({"campaigns": campaigns}), 200
+        campaigns = search_campaigns(query)
+    except TrinoUnavailable:
+        return jsonify({"error": "Failed to connect to service"}), 503
     except Exception:
         return jsonify({"error": "Failed to fetch campaigns"}), 500
+
+    return jsonify({"campaigns": campaigns}), 200